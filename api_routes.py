@@ -1,18 +1,18 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi import APIRouter, Form, HTTPException, Request
 from fastapi.responses import JSONResponse
-from typing import Optional
+from pathlib import Path
 from datetime import datetime
 from openai import OpenAI
 import os
 from dotenv import load_dotenv
 
-from services.conversation_service import ConversationService
-from services.report_service import ReportService
-from services.personality_service import PersonalityService
-from services.reference_service import ReferenceService
-from services.embedding_service import EmbeddingService
-from utils.file_processor import FileProcessor
-import asyncio
+from services.conversation_service import AsyncConversationService
+from services.report_service import AsyncReportService
+from services.personality_service import AsyncPersonalityService
+from services.reference_service import AsyncReferenceService
+from services.ingestion_service import ingestion_service, IngestionQueueFull, IngestionInProgress
+from services.telemetry_service import latency_telemetry
+from utils.upload_stream import receive_upload, UploadTooLarge, InvalidUpload
 
 load_dotenv()
 
@@ -20,32 +20,36 @@ client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 router = APIRouter(prefix="/api")
 
+# SQLSTATE PostgREST reports when idx_report_files_first_version_hash
+# rejects a second report for the same file.
+UNIQUE_VIOLATION = "23505"
+
 @router.get("/conversations")
 async def get_conversations(limit: int = 20, include_archived: bool = False):
-    conversations = ConversationService.get_recent_conversations(limit, include_archived)
+    conversations = await AsyncConversationService.get_recent_conversations(limit, include_archived)
     return JSONResponse(content={"conversations": conversations})
 
 @router.get("/conversations/{conversation_id}")
 async def get_conversation(conversation_id: str):
-    conversation = ConversationService.get_conversation_by_thread_id(conversation_id)
+    conversation = await AsyncConversationService.get_conversation_by_thread_id(conversation_id)
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
-    messages = ConversationService.get_conversation_messages(conversation["id"])
+    messages = await AsyncConversationService.get_conversation_messages(conversation["id"])
     return JSONResponse(content={"conversation": conversation, "messages": messages})
 
 @router.post("/conversations/{conversation_id}/archive")
 async def archive_conversation(conversation_id: str):
-    result = ConversationService.archive_conversation(conversation_id)
+    result = await AsyncConversationService.archive_conversation(conversation_id)
     return JSONResponse(content={"success": True, "conversation": result})
 
 @router.delete("/conversations/{conversation_id}")
 async def delete_conversation(conversation_id: str):
-    success = ConversationService.delete_conversation(conversation_id)
+    success = await AsyncConversationService.delete_conversation(conversation_id)
     return JSONResponse(content={"success": success})
 
 @router.put("/conversations/{conversation_id}/title")
 async def update_conversation_title(conversation_id: str, title: str = Form(...)):
-    result = ConversationService.update_conversation_title(conversation_id, title)
+    result = await AsyncConversationService.update_conversation_title(conversation_id, title)
     return JSONResponse(content={"success": True, "conversation": result})
 
 @router.post("/conversations/import")
@@ -56,7 +60,7 @@ async def import_conversation(data: dict):
         messages = data.get("messages", [])
         started_at = data.get("started_at")
 
-        conversation = ConversationService.import_conversation(
+        conversation = await AsyncConversationService.import_conversation(
             thread_id=thread_id,
             title=title,
             messages=messages,
@@ -69,83 +73,182 @@ async def import_conversation(data: dict):
 
 @router.get("/reports")
 async def get_reports(limit: int = 50):
-    reports = ReportService.get_all_reports(limit)
+    reports = await AsyncReportService.get_all_reports(limit)
     return JSONResponse(content={"reports": reports})
 
 @router.get("/reports/{report_id}")
 async def get_report(report_id: str):
-    report = ReportService.get_report_by_id(report_id)
+    report = await AsyncReportService.get_report_by_id(report_id)
     if not report:
         raise HTTPException(status_code=404, detail="Report not found")
-    files = ReportService.get_report_files(report_id)
+    files = await AsyncReportService.get_report_files(report_id)
     return JSONResponse(content={"report": report, "files": files})
 
 @router.post("/reports/upload")
-async def upload_report(
-    file: UploadFile = File(...),
-    title: str = Form(...),
-    description: Optional[str] = Form(None),
-    tags: Optional[str] = Form(None)
-):
-    try:
-        file_data = await file.read()
-        file_path = FileProcessor.save_uploaded_file(file_data, file.filename)
-
-        processed = FileProcessor.process_file(file_path)
-
-        if not processed["success"]:
-            raise HTTPException(status_code=400, detail=processed.get("error", "Failed to process file"))
+async def upload_report(request: Request):
+    if ingestion_service.is_full():
+        raise HTTPException(status_code=503, detail="Report ingestion queue is full, try again shortly")
 
+    try:
+        # The body is parsed as it arrives and the file goes straight to disk,
+        # so a large report never sits in memory.
+        try:
+            upload = await receive_upload(request)
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except InvalidUpload as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        title = upload.fields.get("title", "").strip()
+        description = upload.fields.get("description") or None
+        tags = upload.fields.get("tags")
+        file_path = upload.file_path
+
+        if not title:
+            raise HTTPException(status_code=400, detail="A title is required")
+
+        # An identical file was uploaded before: hand back that report rather
+        # than extracting and embedding the same bytes again.
+        existing_file = await AsyncReportService.get_report_file_by_hash(upload.sha256)
+        if existing_file:
+            existing_report = await AsyncReportService.get_report_by_id(existing_file["report_id"])
+            if existing_report:
+                # Restart it unless it finished or a job is still on it.
+                try:
+                    await ingestion_service.resume(existing_report, file_path, existing_file["id"])
+                except IngestionQueueFull as e:
+                    raise HTTPException(status_code=503, detail=str(e))
+                return JSONResponse(content={"success": True, "report": existing_report, "duplicate": True})
+
+        # Text extraction runs in the ingestion job, page by page, so the
+        # request returns as soon as the file is on disk.
         tags_list = [t.strip() for t in tags.split(",")] if tags else []
 
-        report = ReportService.create_report(
+        report = await AsyncReportService.create_report(
             title=title,
-            file_type=processed["file_type"],
-            file_size_bytes=processed["file_size_bytes"],
+            file_type=Path(upload.filename).suffix.lower().lstrip("."),
+            file_size_bytes=upload.size_bytes,
             description=description,
             tags=tags_list,
             openai_file_id=None
         )
 
-        ReportService.create_report_file(
-            report_id=report["id"],
-            file_path=file_path,
-            content_text=processed["content_text"]
-        )
-
-        ReportService.update_report_status(report["id"], "processing")
-
-        asyncio.create_task(
-            asyncio.to_thread(
-                EmbeddingService.process_and_store_chunks,
-                report["id"],
-                processed["content_text"],
-                title
+        try:
+            report_file = await AsyncReportService.create_report_file(
+                report_id=report["id"],
+                file_path=file_path,
+                content_hash=upload.sha256
             )
-        )
-
-        ReportService.update_report_status(report["id"], "completed")
+        except Exception as e:
+            if getattr(e, "code", None) != UNIQUE_VIOLATION:
+                raise
+            # An identical upload created its report first; drop ours and
+            # return that one.
+            await AsyncReportService.delete_report(report["id"])
+            existing_file = await AsyncReportService.get_report_file_by_hash(upload.sha256)
+            existing_report = await AsyncReportService.get_report_by_id(existing_file["report_id"]) if existing_file else None
+            if not existing_report:
+                raise
+            return JSONResponse(content={"success": True, "report": existing_report, "duplicate": True})
+
+        try:
+            ingestion_service.submit(report["id"], file_path, title, report_file["id"])
+        except IngestionQueueFull as e:
+            await AsyncReportService.update_report_status(report["id"], "failed")
+            raise HTTPException(status_code=503, detail=str(e))
 
         return JSONResponse(content={"success": True, "report": report})
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/reports/{report_id}/versions")
+async def upload_report_version(report_id: str, request: Request):
+    report = await AsyncReportService.get_report_by_id(report_id)
+    if not report:
+        raise HTTPException(status_code=404, detail="Report not found")
+
+    if ingestion_service.is_active(report_id):
+        raise HTTPException(status_code=409, detail="This report is still being ingested, try again when it finishes")
+
+    if ingestion_service.is_full():
+        raise HTTPException(status_code=503, detail="Report ingestion queue is full, try again shortly")
+
+    try:
+        upload = await receive_upload(request)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except InvalidUpload as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    files = await AsyncReportService.get_report_files(report_id)
+    latest = files[0] if files else None
+    if latest and latest.get("content_hash") == upload.sha256:
+        return JSONResponse(content={"success": True, "report": report, "file": latest, "unchanged": True})
+
+    report_file = await AsyncReportService.create_report_file(
+        report_id=report_id,
+        file_path=upload.file_path,
+        version=(latest["version"] or 0) + 1 if latest else 1,
+        content_hash=upload.sha256
+    )
+    if not report_file:
+        raise HTTPException(status_code=500, detail="Could not store the report file")
+
+    # Only chunks whose text changed since the previous version are embedded;
+    # unchanged chunks keep their rows and ids. A rejected submit removes the
+    # new version again so a retry of the same file is not taken as unchanged.
+    try:
+        ingestion_service.submit(report_id, upload.file_path, report["title"], report_file["id"], incremental=True)
+    except (IngestionQueueFull, IngestionInProgress) as e:
+        await AsyncReportService.delete_report_file(report_file["id"])
+        status_code = 409 if isinstance(e, IngestionInProgress) else 503
+        raise HTTPException(status_code=status_code, detail=str(e))
+
+    updated = await AsyncReportService.update_report(report_id, {
+        "file_type": Path(upload.filename).suffix.lower().lstrip("."),
+        "file_size_bytes": upload.size_bytes
+    })
+    if not updated:
+        # Deleted while the upload was in flight; the job fails on its own.
+        raise HTTPException(status_code=404, detail="Report not found")
+
+    return JSONResponse(content={"success": True, "report": updated, "file": report_file})
+
+@router.get("/reports/{report_id}/progress")
+async def get_report_progress(report_id: str):
+    progress = ingestion_service.get_progress(report_id)
+    if progress:
+        return JSONResponse(content={"progress": progress})
+
+    report = await AsyncReportService.get_report_by_id(report_id)
+    if not report:
+        raise HTTPException(status_code=404, detail="Report not found")
+
+    return JSONResponse(content={"progress": {
+        "report_id": report_id,
+        "status": report.get("processing_status"),
+        "chunks_embedded": report.get("chunks_embedded"),
+        "chunks_total": report.get("chunks_total")
+    }})
+
 @router.delete("/reports/{report_id}")
 async def delete_report(report_id: str):
-    success = ReportService.delete_report(report_id)
+    success = await AsyncReportService.delete_report(report_id)
     return JSONResponse(content={"success": success})
 
 @router.get("/personality")
 async def get_personality():
-    active = PersonalityService.get_active_personality()
-    all_personalities = PersonalityService.get_all_personalities()
+    active = await AsyncPersonalityService.get_active_personality()
+    all_personalities = await AsyncPersonalityService.get_all_personalities()
     return JSONResponse(content={"active": active, "all": all_personalities})
 
 @router.post("/personality")
 async def create_personality(data: dict):
     try:
-        personality = PersonalityService.create_personality(
+        personality = await AsyncPersonalityService.create_personality(
             name=data.get("name"),
             instructions=data.get("instructions"),
             speaking_style=data.get("speaking_style"),
@@ -159,21 +262,21 @@ async def create_personality(data: dict):
 @router.put("/personality/{personality_id}")
 async def update_personality(personality_id: str, data: dict):
     try:
-        personality = PersonalityService.update_personality(personality_id, data)
+        personality = await AsyncPersonalityService.update_personality(personality_id, data)
         return JSONResponse(content={"success": True, "personality": personality})
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.put("/personality/{personality_id}/activate")
 async def activate_personality(personality_id: str):
-    personality = PersonalityService.activate_personality(personality_id)
+    personality = await AsyncPersonalityService.activate_personality(personality_id)
     return JSONResponse(content={"success": True, "personality": personality})
 
 @router.get("/settings")
 async def get_settings():
-    reference_freq = ReferenceService.get_reference_frequency_setting()
-    max_context = ReferenceService.get_max_context_conversations()
-    reference_stats = ReferenceService.get_reference_stats()
+    reference_freq = await AsyncReferenceService.get_reference_frequency_setting()
+    max_context = await AsyncReferenceService.get_max_context_conversations()
+    reference_stats = await AsyncReferenceService.get_reference_stats()
 
     return JSONResponse(content={
         "reference_frequency": reference_freq,
@@ -186,11 +289,15 @@ async def update_reference_frequency(data: dict):
     level = data.get("level")
     weight = data.get("weight")
 
-    result = ReferenceService.update_reference_frequency(level, weight)
+    result = await AsyncReferenceService.update_reference_frequency(level, weight)
     return JSONResponse(content={"success": True, "settings": result})
 
 @router.put("/settings/max-context")
 async def update_max_context(data: dict):
     count = data.get("count")
-    result = ReferenceService.update_max_context_conversations(count)
+    result = await AsyncReferenceService.update_max_context_conversations(count)
     return JSONResponse(content={"success": True, "settings": result})
+
+@router.get("/metrics/latency")
+async def get_latency_metrics():
+    return JSONResponse(content=latency_telemetry.summary())
@@ -0,0 +1,131 @@
+"""PDF extraction time against page count: serial vs page-range workers.
+
+Builds text PDFs of increasing length and times the old serial
+extraction (every page on one thread, joined before chunking could
+start) against FileProcessor.iter_pages, which parses page ranges in a
+process pool and yields pages in order. Reports total time and time to
+the first page, i.e. when chunking can start. Run from the repo root:
+
+    python benchmarks/extract_pdf.py --pages 10 50 200 500 --workers 4
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+WORDS = (
+    "revenue margin guidance quarter growth outlook segment capital expenditure "
+    "operating income free cash flow demand pricing inventory backlog forecast"
+).split()
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: Path, page_count: int, lines_per_page: int = 45, seed: int = 7):
+    rng = random.Random(seed)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+
+    for _ in range(page_count):
+        lines = [" ".join(rng.choice(WORDS) for _ in range(12)) for _ in range(lines_per_page)]
+        stream = "BT /F1 10 Tf 12 TL 50 790 Td " + " ".join(f"({_escape(line)}) '" for line in lines) + " ET"
+        stream = stream.encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids).encode()
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, page_count)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    path.write_bytes(bytes(out))
+
+
+def time_serial(path: Path):
+    from PyPDF2 import PdfReader
+
+    started = time.perf_counter()
+    reader = PdfReader(str(path))
+    text = "\n\n".join(page.extract_text() or "" for page in reader.pages)
+    elapsed = time.perf_counter() - started
+    return elapsed, elapsed, len(text)
+
+
+def time_streaming(path: Path):
+    from utils.file_processor import FileProcessor
+
+    started = time.perf_counter()
+    first_page = None
+    size = 0
+    for page in FileProcessor.iter_pages(str(path)):
+        if first_page is None:
+            first_page = time.perf_counter() - started
+        size += len(page) + 2
+    return time.perf_counter() - started, first_page, size - 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 50, 200, 500])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--pages-per-task", type=int, default=16)
+    args = parser.parse_args()
+
+    # Read by utils.file_processor at import time.
+    os.environ["EXTRACTION_WORKERS"] = str(args.workers)
+    os.environ["EXTRACTION_PAGES_PER_TASK"] = str(args.pages_per_task)
+    from utils.file_processor import FileProcessor
+
+    print(f"workers={args.workers} pages_per_task={args.pages_per_task} cpus={os.cpu_count()}")
+    print(f"{'pages':>6} {'serial s':>9} {'streaming s':>11} {'speedup':>8} {'first page s':>13}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Warm the worker pool so process start-up is not billed to the
+        # first document.
+        warmup = Path(tmp) / "warmup.pdf"
+        write_pdf(warmup, args.pages_per_task * 2)
+        time_streaming(warmup)
+
+        for page_count in args.pages:
+            path = Path(tmp) / f"report_{page_count}.pdf"
+            write_pdf(path, page_count)
+
+            serial_total, _, serial_size = time_serial(path)
+            streaming_total, first_page, streaming_size = time_streaming(path)
+            assert serial_size == streaming_size, "extracted text differs"
+
+            print(
+                f"{page_count:>6} {serial_total:>9.2f} {streaming_total:>11.2f} "
+                f"{serial_total / streaming_total:>7.2f}x {first_page:>13.3f}"
+            )
+
+    FileProcessor.shutdown_pool()
+
+
+if __name__ == "__main__":
+    main()
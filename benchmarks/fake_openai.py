@@ -0,0 +1,150 @@
+"""Local stand-in for the OpenAI endpoints the app calls.
+
+Serves whisper transcriptions, streamed and plain chat completions, TTS
+byte streams and embeddings with configurable latencies, so load tests
+measure the app rather than the network. Run with:
+
+    python -m uvicorn benchmarks.fake_openai:app --port 9101
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import random
+import struct
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+FAKE_STT_MS = float(os.getenv("FAKE_STT_MS", "300"))
+FAKE_TRANSCRIPT = os.getenv("FAKE_TRANSCRIPT", "What did the quarterly report say about revenue growth?")
+FAKE_LLM_TTFT_MS = float(os.getenv("FAKE_LLM_TTFT_MS", "350"))
+FAKE_LLM_TOKENS_PER_SECOND = float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "80"))
+FAKE_LLM_TOKENS = int(os.getenv("FAKE_LLM_TOKENS", "120"))
+FAKE_TTS_TTFB_MS = float(os.getenv("FAKE_TTS_TTFB_MS", "200"))
+FAKE_TTS_BYTES_PER_SECOND = int(os.getenv("FAKE_TTS_BYTES_PER_SECOND", "48000"))
+FAKE_TTS_BYTES_PER_CHAR = int(os.getenv("FAKE_TTS_BYTES_PER_CHAR", "200"))
+FAKE_EMBEDDING_MS = float(os.getenv("FAKE_EMBEDDING_MS", "60"))
+FAKE_EMBEDDING_DIMENSIONS = 1536
+
+WORDS = (
+    "revenue grew steadily while margins held up and the team expects the next quarter "
+    "to benefit from lower input costs, although guidance remains cautious."
+).split()
+
+app = FastAPI()
+
+
+def _embedding(text: str):
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+    rng = random.Random(seed)
+    vector = [rng.uniform(-1, 1) for _ in range(FAKE_EMBEDDING_DIMENSIONS)]
+    norm = sum(v * v for v in vector) ** 0.5
+    return [v / norm for v in vector]
+
+
+def _answer_tokens():
+    for i in range(FAKE_LLM_TOKENS):
+        word = WORDS[i % len(WORDS)]
+        yield (" " if i else "") + word + ("." if i % 18 == 17 else "")
+
+
+@app.post("/v1/audio/transcriptions")
+async def transcriptions(request: Request):
+    form = await request.form()
+    await form["file"].read()
+    await asyncio.sleep(FAKE_STT_MS / 1000)
+
+    if form.get("response_format") == "text":
+        return PlainTextResponse(FAKE_TRANSCRIPT)
+    return JSONResponse({"text": FAKE_TRANSCRIPT})
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model", "gpt-4o-mini")
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+
+    if not body.get("stream"):
+        await asyncio.sleep((FAKE_LLM_TTFT_MS + FAKE_LLM_TOKENS * 1000 / FAKE_LLM_TOKENS_PER_SECOND) / 1000)
+        return JSONResponse({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "".join(_answer_tokens())},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": FAKE_LLM_TOKENS, "total_tokens": FAKE_LLM_TOKENS}
+        })
+
+    async def events():
+        def chunk(delta, finish_reason=None):
+            return "data: " + json.dumps({
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }) + "\n\n"
+
+        await asyncio.sleep(FAKE_LLM_TTFT_MS / 1000)
+        yield chunk({"role": "assistant", "content": ""})
+
+        interval = 1 / FAKE_LLM_TOKENS_PER_SECOND
+        for token in _answer_tokens():
+            yield chunk({"content": token})
+            await asyncio.sleep(interval)
+
+        yield chunk({}, "stop")
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.post("/v1/audio/speech")
+async def speech(request: Request):
+    body = await request.json()
+    total = max(1024, len(body.get("input", "")) * FAKE_TTS_BYTES_PER_CHAR)
+
+    async def audio():
+        await asyncio.sleep(FAKE_TTS_TTFB_MS / 1000)
+        chunk_size = 4096
+        interval = chunk_size / FAKE_TTS_BYTES_PER_SECOND
+        sent = 0
+        while sent < total:
+            size = min(chunk_size, total - sent)
+            yield b"\xff\xf3" + os.urandom(size - 2)
+            sent += size
+            await asyncio.sleep(interval)
+
+    return StreamingResponse(audio(), media_type="audio/mpeg")
+
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request):
+    body = await request.json()
+    inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+    await asyncio.sleep(FAKE_EMBEDDING_MS / 1000)
+
+    data = []
+    for index, text in enumerate(inputs):
+        vector = _embedding(str(text))
+        if body.get("encoding_format") == "base64":
+            vector = base64.b64encode(struct.pack(f"<{len(vector)}f", *vector)).decode("ascii")
+        data.append({"object": "embedding", "index": index, "embedding": vector})
+
+    tokens = sum(len(str(text)) // 4 for text in inputs)
+    return JSONResponse({
+        "object": "list",
+        "data": data,
+        "model": body.get("model", "text-embedding-3-small"),
+        "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+    })
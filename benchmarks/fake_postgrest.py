@@ -0,0 +1,202 @@
+"""In-memory stand-in for the Supabase PostgREST API.
+
+Implements the subset of PostgREST the app uses: selects with eq/neq/gt/
+gte/lt/lte/in/is filters, order, limit/offset and single-object responses,
+inserts and upserts (return=minimal or representation), updates, deletes
+and the RPCs the services call. Tables start empty and live in memory.
+Run with:
+
+    python -m uvicorn benchmarks.fake_postgrest:app --port 9102
+"""
+import asyncio
+import os
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+
+FAKE_DB_MS = float(os.getenv("FAKE_DB_MS", "5"))
+
+RESERVED_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+
+app = FastAPI()
+tables: Dict[str, List[Dict]] = defaultdict(list)
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _parse_value(raw: str):
+    if raw == "null":
+        return None
+    if raw in ("true", "false"):
+        return raw == "true"
+    return raw
+
+
+def _compare(value, operator: str, raw: str) -> bool:
+    if operator == "is":
+        return value is _parse_value(raw) or value == _parse_value(raw)
+    if operator == "in":
+        return str(value) in [item.strip('"') for item in raw.strip("()").split(",")]
+
+    expected = _parse_value(raw)
+    if operator == "eq":
+        return value == expected or str(value) == str(expected)
+    if operator == "neq":
+        return not (value == expected or str(value) == str(expected))
+    if value is None:
+        return False
+
+    try:
+        left, right = float(value), float(expected)
+    except (TypeError, ValueError):
+        left, right = str(value), str(expected)
+
+    return {
+        "gt": left > right,
+        "gte": left >= right,
+        "lt": left < right,
+        "lte": left <= right
+    }.get(operator, True)
+
+
+def _sort_key(value):
+    if value is None:
+        return (2, 0, "")
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return (0, value, "")
+    return (1, 0, str(value))
+
+
+def _filtered(table: str, request: Request) -> List[Dict]:
+    rows = tables[table]
+
+    for column, condition in request.query_params.multi_items():
+        if column in RESERVED_PARAMS or "." not in condition:
+            continue
+        negate = condition.startswith("not.")
+        if negate:
+            condition = condition[4:]
+        operator, _, raw = condition.partition(".")
+        rows = [row for row in rows if _compare(row.get(column), operator, raw) != negate]
+
+    return rows
+
+
+def _prefers(request: Request, value: str) -> bool:
+    return value in request.headers.get("prefer", "")
+
+
+def _respond(request: Request, rows: List[Dict], status_code: int = 200) -> Response:
+    if _prefers(request, "return=minimal"):
+        return Response(status_code=204 if status_code == 200 else status_code)
+
+    if "vnd.pgrst.object" in request.headers.get("accept", ""):
+        if len(rows) != 1:
+            return JSONResponse({
+                "code": "PGRST116",
+                "details": f"The result contains {len(rows)} rows",
+                "hint": None,
+                "message": "JSON object requested, multiple (or no) rows returned"
+            }, status_code=406)
+        return JSONResponse(rows[0], status_code=status_code)
+
+    return JSONResponse(rows, status_code=status_code, headers={"content-range": f"0-{max(0, len(rows) - 1)}/*"})
+
+
+@app.get("/rest/v1/{table}")
+async def select(table: str, request: Request):
+    await asyncio.sleep(FAKE_DB_MS / 1000)
+    rows = list(_filtered(table, request))
+
+    order = request.query_params.get("order")
+    if order:
+        for clause in reversed(order.split(",")):
+            column, _, direction = clause.partition(".")
+            rows.sort(key=lambda row: _sort_key(row.get(column)), reverse=direction.startswith("desc"))
+
+    offset = int(request.query_params.get("offset", 0))
+    limit = request.query_params.get("limit")
+    rows = rows[offset:offset + int(limit)] if limit else rows[offset:]
+
+    return _respond(request, rows)
+
+
+@app.post("/rest/v1/{table}")
+async def insert(table: str, request: Request):
+    await asyncio.sleep(FAKE_DB_MS / 1000)
+    payload = await request.json()
+    payload = payload if isinstance(payload, list) else [payload]
+
+    conflict_columns = [c for c in request.query_params.get("on_conflict", "").split(",") if c]
+    if not conflict_columns and _prefers(request, "resolution="):
+        conflict_columns = ["id"]
+
+    written = []
+    for item in payload:
+        existing = None
+        if conflict_columns:
+            existing = next(
+                (row for row in tables[table] if all(row.get(c) == item.get(c) for c in conflict_columns)),
+                None
+            )
+
+        if existing is not None:
+            existing.update(item)
+            existing["updated_at"] = _now()
+            written.append(existing)
+            continue
+
+        row = {"id": str(uuid.uuid4()), "created_at": _now(), **item}
+        tables[table].append(row)
+        written.append(row)
+
+    return _respond(request, written, status_code=201)
+
+
+@app.patch("/rest/v1/{table}")
+async def update(table: str, request: Request):
+    await asyncio.sleep(FAKE_DB_MS / 1000)
+    changes = await request.json()
+    rows = _filtered(table, request)
+    for row in rows:
+        row.update(changes)
+    return _respond(request, rows)
+
+
+@app.delete("/rest/v1/{table}")
+async def delete(table: str, request: Request):
+    await asyncio.sleep(FAKE_DB_MS / 1000)
+    rows = _filtered(table, request)
+    doomed = {id(row) for row in rows}
+    tables[table] = [row for row in tables[table] if id(row) not in doomed]
+    return _respond(request, rows)
+
+
+@app.post("/rest/v1/rpc/{function}")
+async def rpc(function: str, request: Request):
+    await asyncio.sleep(FAKE_DB_MS / 1000)
+    body = await request.json() if await request.body() else {}
+
+    if function == "get_recent_messages_for_conversations":
+        ids = set(body.get("conversation_ids") or [])
+        per_conversation = body.get("messages_per_conversation", 4)
+        grouped = defaultdict(list)
+        for message in sorted(tables["messages"], key=lambda m: m.get("timestamp", ""), reverse=True):
+            if message.get("conversation_id") in ids and len(grouped[message["conversation_id"]]) < per_conversation:
+                grouped[message["conversation_id"]].append(message)
+        return JSONResponse([message for messages in grouped.values() for message in messages])
+
+    if function == "cleanup_expired_sessions":
+        now = _now()
+        tables["session_state"] = [row for row in tables["session_state"] if row.get("expires_at", now) > now]
+        return Response(status_code=204)
+
+    # Vector searches (match_document_chunks, match_conversations) find
+    # nothing in an empty in-memory database.
+    return JSONResponse([])
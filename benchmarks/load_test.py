@@ -0,0 +1,277 @@
+"""Concurrent /ws load test against local stand-ins for OpenAI and Supabase.
+
+Starts benchmarks.fake_openai, benchmarks.fake_postgrest and the app
+(uvicorn main:app) as subprocesses, opens N WebSocket sessions that each
+send recorded audio for a number of turns, and reports turn latency
+percentiles, throughput and app memory per session. Run from the repo
+root:
+
+    python benchmarks/load_test.py --sessions 20 --turns 5
+    python benchmarks/load_test.py --sessions 20 --mode stream
+    python benchmarks/load_test.py --target ws://127.0.0.1:8000/ws --sessions 5
+
+--audio takes a recorded utterance (webm/ogg/wav); the fake STT does not
+decode it, so any recording exercises the same upload path. With --target
+no processes are started and memory is not reported.
+"""
+import argparse
+import array
+import asyncio
+import json
+import math
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import websockets
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Any JWT-shaped key satisfies the Supabase client; the fake never checks it.
+FAKE_SUPABASE_KEY = (
+    "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9."
+    "eyJyb2xlIjoiYW5vbiIsImlzcyI6InN1cGFiYXNlIn0."
+    "bG9hZC10ZXN0LXNpZ25hdHVyZQ"
+)
+
+STREAM_SAMPLE_RATE = 16000
+STREAM_FRAME_MS = 20
+
+
+def synthetic_webm(size_kb: int) -> bytes:
+    return b"\x1a\x45\xdf\xa3" + os.urandom(size_kb * 1024 - 4)
+
+
+def synthetic_pcm_utterance(speech_seconds: float, silence_seconds: float = 0.4) -> bytes:
+    # Trailing silence stays under VAD_END_OF_UTTERANCE_MS so the client's
+    # stream_stop, not the server's VAD, ends the utterance.
+    speech = array.array("h", (
+        int(4000 * math.sin(2 * math.pi * 220 * i / STREAM_SAMPLE_RATE))
+        for i in range(int(speech_seconds * STREAM_SAMPLE_RATE))
+    ))
+    silence = array.array("h", [0] * int(silence_seconds * STREAM_SAMPLE_RATE))
+    return speech.tobytes() + silence.tobytes()
+
+
+def rss_kb(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def percentile(values, fraction):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+async def wait_for_http(url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def spawn(module: str, port: int, env: dict, log_path: Path) -> subprocess.Popen:
+    log = open(log_path, "w")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", module, "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=REPO_ROOT,
+        env=env,
+        stdout=log,
+        stderr=subprocess.STDOUT
+    )
+
+
+class SessionResult:
+
+    def __init__(self):
+        self.first_audio_ms = []
+        self.turn_ms = []
+        self.errors = 0
+
+
+async def receive_turn(ws, started: float, result: SessionResult):
+    first_audio = None
+
+    while True:
+        message = await ws.recv()
+        if isinstance(message, bytes):
+            if first_audio is None:
+                first_audio = time.perf_counter()
+            continue
+
+        event = json.loads(message)
+        if event.get("type") in ("error", "turn_cancelled"):
+            result.errors += 1
+            return
+        if event.get("type") == "status" and event.get("message") == "Ready":
+            break
+
+    if first_audio is not None:
+        result.first_audio_ms.append((first_audio - started) * 1000)
+    result.turn_ms.append((time.perf_counter() - started) * 1000)
+
+
+async def run_session(url: str, args, audio: bytes, result: SessionResult, start_delay: float):
+    await asyncio.sleep(start_delay)
+
+    try:
+        async with websockets.connect(url, max_size=None) as ws:
+            json.loads(await ws.recv())
+
+            for _ in range(args.turns):
+                if args.mode == "stream":
+                    await ws.send(json.dumps({"type": "stream_start", "sample_rate": STREAM_SAMPLE_RATE}))
+                    frame_bytes = STREAM_SAMPLE_RATE * 2 * STREAM_FRAME_MS // 1000
+                    for offset in range(0, len(audio), frame_bytes):
+                        await ws.send(audio[offset:offset + frame_bytes])
+                        await asyncio.sleep(STREAM_FRAME_MS / 1000)
+                    # Latency counts from the end of the utterance.
+                    started = time.perf_counter()
+                    await ws.send(json.dumps({"type": "stream_stop"}))
+                else:
+                    started = time.perf_counter()
+                    await ws.send(audio)
+
+                await asyncio.wait_for(receive_turn(ws, started, result), timeout=args.turn_timeout)
+                await asyncio.sleep(args.think_time)
+    except Exception as e:
+        print(f"Session failed: {e!r}")
+        result.errors += 1
+
+
+async def sample_memory(pid: int, samples: list, stop: asyncio.Event):
+    while not stop.is_set():
+        samples.append(rss_kb(pid))
+        await asyncio.sleep(0.25)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--ramp-seconds", type=float, default=2.0, help="Spread session starts over this window")
+    parser.add_argument("--think-time", type=float, default=0.5, help="Pause between turns in a session")
+    parser.add_argument("--turn-timeout", type=float, default=60)
+    parser.add_argument("--mode", choices=["blob", "stream"], default="blob")
+    parser.add_argument("--audio", type=Path, help="Recorded utterance to send in blob mode")
+    parser.add_argument("--speech-seconds", type=float, default=2.0, help="Synthetic utterance length in stream mode")
+    parser.add_argument("--target", help="Existing ws:// endpoint; skips starting processes")
+    parser.add_argument("--app-port", type=int, default=9100)
+    parser.add_argument("--openai-port", type=int, default=9101)
+    parser.add_argument("--postgrest-port", type=int, default=9102)
+    parser.add_argument("--llm-ttft-ms", type=float, default=350)
+    parser.add_argument("--llm-tokens-per-second", type=float, default=80)
+    parser.add_argument("--llm-tokens", type=int, default=120)
+    parser.add_argument("--stt-ms", type=float, default=300)
+    parser.add_argument("--tts-ttfb-ms", type=float, default=200)
+    parser.add_argument("--db-ms", type=float, default=5)
+    parser.add_argument("--log-dir", type=Path, default=Path("/tmp"))
+    args = parser.parse_args()
+
+    if args.mode == "stream":
+        audio = synthetic_pcm_utterance(args.speech_seconds)
+    elif args.audio:
+        audio = args.audio.read_bytes()
+    else:
+        audio = synthetic_webm(64)
+
+    processes = []
+    app_pid = None
+    url = args.target
+
+    if not url:
+        env = {
+            **os.environ,
+            "FAKE_LLM_TTFT_MS": str(args.llm_ttft_ms),
+            "FAKE_LLM_TOKENS_PER_SECOND": str(args.llm_tokens_per_second),
+            "FAKE_LLM_TOKENS": str(args.llm_tokens),
+            "FAKE_STT_MS": str(args.stt_ms),
+            "FAKE_TTS_TTFB_MS": str(args.tts_ttfb_ms),
+            "FAKE_DB_MS": str(args.db_ms)
+        }
+        app_env = {
+            **env,
+            "OPENAI_API_KEY": "sk-load-test",
+            "OPENAI_BASE_URL": f"http://127.0.0.1:{args.openai_port}/v1",
+            "VITE_SUPABASE_URL": f"http://127.0.0.1:{args.postgrest_port}",
+            "VITE_SUPABASE_ANON_KEY": FAKE_SUPABASE_KEY,
+            "VECTOR_INDEX_ENABLED": "false"
+        }
+
+        processes.append(spawn("benchmarks.fake_openai:app", args.openai_port, env, args.log_dir / "fake_openai.log"))
+        processes.append(spawn("benchmarks.fake_postgrest:app", args.postgrest_port, env, args.log_dir / "fake_postgrest.log"))
+        await wait_for_http(f"http://127.0.0.1:{args.openai_port}/docs")
+        await wait_for_http(f"http://127.0.0.1:{args.postgrest_port}/docs")
+
+        app = spawn("main:app", args.app_port, app_env, args.log_dir / "load_test_app.log")
+        processes.append(app)
+        app_pid = app.pid
+        await wait_for_http(f"http://127.0.0.1:{args.app_port}/metrics")
+        url = f"ws://127.0.0.1:{args.app_port}/ws"
+
+    try:
+        baseline_kb = rss_kb(app_pid) if app_pid else 0
+        memory_samples = []
+        stop_sampling = asyncio.Event()
+        sampler = asyncio.create_task(sample_memory(app_pid, memory_samples, stop_sampling)) if app_pid else None
+
+        results = [SessionResult() for _ in range(args.sessions)]
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            run_session(url, args, audio, result, args.ramp_seconds * i / max(1, args.sessions))
+            for i, result in enumerate(results)
+        ))
+        elapsed = time.perf_counter() - started
+
+        stop_sampling.set()
+        if sampler:
+            await sampler
+
+        first_audio = [v for r in results for v in r.first_audio_ms]
+        turns = [v for r in results for v in r.turn_ms]
+        errors = sum(r.errors for r in results)
+
+        print(f"\nsessions={args.sessions} turns/session={args.turns} mode={args.mode} elapsed={elapsed:.1f}s")
+        print(f"completed turns: {len(turns)}  errors: {errors}  throughput: {len(turns) / elapsed:.2f} turns/s")
+        for name, values in [("first audio", first_audio), ("turn total", turns)]:
+            if values:
+                print(
+                    f"{name:>12}: p50 {percentile(values, 0.5):.0f} ms  p95 {percentile(values, 0.95):.0f} ms  "
+                    f"p99 {percentile(values, 0.99):.0f} ms  mean {statistics.mean(values):.0f} ms"
+                )
+
+        if app_pid and memory_samples:
+            peak_kb = max(memory_samples)
+            print(
+                f"app RSS: baseline {baseline_kb / 1024:.1f} MB  peak {peak_kb / 1024:.1f} MB  "
+                f"per session {(peak_kb - baseline_kb) / max(1, args.sessions):.0f} KB"
+            )
+    finally:
+        # The app goes first so its shutdown flushes still reach the fakes.
+        for process in reversed(processes):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,105 @@
+"""Compare the temp-file and in-memory Whisper upload paths.
+
+Both variants go through the real AsyncOpenAI client (multipart encoding
+included) against a mock transport, so the numbers are the per-turn cost
+on our side of the network. Run from the repo root:
+
+    python benchmarks/transcribe_upload.py --turns 200 --concurrency 8 --size-kb 96
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+from openai import AsyncOpenAI
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.audio_format import detect_audio_format  # noqa: E402
+
+
+def make_client() -> AsyncOpenAI:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        return httpx.Response(200, text="hello", headers={"content-type": "text/plain"})
+
+    return AsyncOpenAI(
+        api_key="benchmark",
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    )
+
+
+async def upload_via_temp_file(client: AsyncOpenAI, audio_data: bytes, directory: str):
+    with tempfile.NamedTemporaryFile(suffix=".webm", delete=False, dir=directory) as temp_audio:
+        temp_audio.write(audio_data)
+        temp_audio_path = temp_audio.name
+
+    try:
+        with open(temp_audio_path, "rb") as audio_file:
+            await client.audio.transcriptions.create(model="whisper-1", file=audio_file, response_format="text")
+    finally:
+        Path(temp_audio_path).unlink(missing_ok=True)
+
+
+async def upload_in_memory(client: AsyncOpenAI, audio_data: bytes, directory: str):
+    extension, content_type = detect_audio_format(audio_data)
+    await client.audio.transcriptions.create(
+        model="whisper-1",
+        file=(f"audio.{extension}", audio_data, content_type),
+        response_format="text"
+    )
+
+
+async def run(variant, client: AsyncOpenAI, audio_data: bytes, turns: int, concurrency: int, directory: str):
+    semaphore = asyncio.Semaphore(concurrency)
+    durations = []
+
+    async def one_turn():
+        async with semaphore:
+            started = time.perf_counter()
+            await variant(client, audio_data, directory)
+            durations.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one_turn() for _ in range(turns)))
+    elapsed = time.perf_counter() - started
+
+    durations.sort()
+    return {
+        "mean_ms": statistics.mean(durations),
+        "p50_ms": durations[len(durations) // 2],
+        "p95_ms": durations[int(len(durations) * 0.95) - 1],
+        "turns_per_s": turns / elapsed
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--size-kb", type=int, default=96, help="Size of one utterance upload")
+    parser.add_argument("--tmp-dir", default=tempfile.gettempdir(), help="Directory for the temp-file variant")
+    args = parser.parse_args()
+
+    # WebM/EBML magic followed by noise, roughly one 6 s Opus utterance at the default size.
+    audio_data = b"\x1a\x45\xdf\xa3" + os.urandom(args.size_kb * 1024 - 4)
+    client = make_client()
+
+    for name, variant in [("temp file", upload_via_temp_file), ("in memory", upload_in_memory)]:
+        await run(variant, client, audio_data, min(20, args.turns), args.concurrency, args.tmp_dir)
+        result = await run(variant, client, audio_data, args.turns, args.concurrency, args.tmp_dir)
+        print(
+            f"{name:>10}: mean {result['mean_ms']:.2f} ms  p50 {result['p50_ms']:.2f} ms  "
+            f"p95 {result['p95_ms']:.2f} ms  {result['turns_per_s']:.0f} turns/s"
+        )
+
+    await client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,16 +1,60 @@
 import os
+import httpx
 from supabase import create_client, Client
+from postgrest import AsyncPostgrestClient
+from postgrest.constants import DEFAULT_POSTGREST_CLIENT_HEADERS
 from dotenv import load_dotenv
 
 load_dotenv()
 
-def get_supabase_client() -> Client:
+SUPABASE_POOL_SIZE = int(os.getenv("SUPABASE_POOL_SIZE", "20"))
+SUPABASE_TIMEOUT_SECONDS = float(os.getenv("SUPABASE_TIMEOUT_SECONDS", "10"))
+SUPABASE_CONNECT_TIMEOUT_SECONDS = float(os.getenv("SUPABASE_CONNECT_TIMEOUT_SECONDS", "5"))
+
+def _get_supabase_credentials():
     supabase_url = os.getenv("VITE_SUPABASE_URL")
     supabase_key = os.getenv("VITE_SUPABASE_ANON_KEY")
 
     if not supabase_url or not supabase_key:
         raise ValueError("Supabase credentials not found in environment variables")
 
+    return supabase_url, supabase_key
+
+def get_supabase_client() -> Client:
+    supabase_url, supabase_key = _get_supabase_credentials()
     return create_client(supabase_url, supabase_key)
 
+class PooledAsyncPostgrestClient(AsyncPostgrestClient):
+
+    def create_session(self, base_url, headers, timeout, verify=True, proxy=None) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            verify=verify,
+            proxy=proxy,
+            follow_redirects=True,
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=SUPABASE_POOL_SIZE,
+                max_keepalive_connections=SUPABASE_POOL_SIZE
+            )
+        )
+
+def get_async_supabase_client() -> PooledAsyncPostgrestClient:
+    supabase_url, supabase_key = _get_supabase_credentials()
+
+    headers = {
+        **DEFAULT_POSTGREST_CLIENT_HEADERS,
+        "apiKey": supabase_key,
+        "Authorization": f"Bearer {supabase_key}"
+    }
+
+    return PooledAsyncPostgrestClient(
+        f"{supabase_url.rstrip('/')}/rest/v1",
+        headers=headers,
+        timeout=httpx.Timeout(SUPABASE_TIMEOUT_SECONDS, connect=SUPABASE_CONNECT_TIMEOUT_SECONDS)
+    )
+
 supabase = get_supabase_client()
+async_supabase = get_async_supabase_client()
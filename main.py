@@ -2,31 +2,42 @@ import os
 import asyncio
 import base64
 import json
+import uuid
 from pathlib import Path
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Union
 from datetime import datetime
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, UploadFile, File, Form, HTTPException
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from openai import AsyncOpenAI
+from openai import AsyncOpenAI, NOT_GIVEN
 from dotenv import load_dotenv
-import tempfile
-from collections import deque
-
-from services.conversation_service import ConversationService
-from services.report_service import ReportService
-from services.personality_service import PersonalityService
-from services.reference_service import ReferenceService
-from utils.context_builder import ContextBuilder
+
+from services.conversation_service import AsyncConversationService
+from services.personality_service import AsyncPersonalityService
+from services.reference_service import AsyncReferenceService
+from utils.context_builder import AsyncContextBuilder
 from utils.file_processor import FileProcessor
+from utils.tts_scheduler import TTSScheduler
+from utils.context_cache import context_cache
+from utils.config_cache import config_cache
+from utils.streaming_stt import StreamingTranscriber, STREAM_SAMPLE_RATE, SUPPORTED_SAMPLE_RATES, is_supported_sample_rate
+from utils.audio_format import detect_audio_format
+from utils.speculative_response import Speculation, SpeculativeResponder, UtteranceSpeculation
+from utils.turn_state import TurnState
+from utils.conversation_history import ConversationHistory, HISTORY_SUMMARY_MAX_TOKENS
+from utils.metrics import metrics, openai_request, monitor_event_loop_lag, METRICS_ENABLED
 from api_routes import router as api_router
+from db_client import supabase, async_supabase
+from services.ingestion_service import ingestion_service
+from services.telemetry_service import latency_telemetry, TurnTimer
+from services.session_store import session_store, SESSION_STORE
+from services.message_writer import message_writer
+from utils.vector_index import vector_index, VECTOR_INDEX_ENABLED, VECTOR_INDEX_REFRESH_SECONDS
 from auto_init import auto_initialize
 
 load_dotenv()
 
-auto_initialize()
-
 app = FastAPI()
 
 app.add_middleware(
@@ -39,49 +50,183 @@ app.add_middleware(
 
 app.include_router(api_router)
 
+async def load_vector_index():
+    try:
+        await asyncio.to_thread(vector_index.load, supabase)
+    except Exception as e:
+        print(f"Vector index unavailable, falling back to match_document_chunks: {e}")
+        return
+
+    # Pick up chunks other workers ingested and published to the snapshot.
+    while True:
+        await asyncio.sleep(VECTOR_INDEX_REFRESH_SECONDS)
+        try:
+            await asyncio.to_thread(vector_index.refresh)
+        except Exception as e:
+            print(f"Error refreshing vector index: {e}")
+
+background_tasks = []
+
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+MULTI_WORKER_CACHE_TTL_SECONDS = float(os.getenv("MULTI_WORKER_CACHE_TTL_SECONDS", "5"))
+
+def check_worker_config():
+    # Only WEB_CONCURRENCY is checked. uvicorn uses it as the --workers
+    # default, so start several workers by setting it; an explicit
+    # `uvicorn --workers N` is not seen here and bypasses these checks.
+    if WEB_CONCURRENCY <= 1:
+        return
+
+    problems = []
+    if SESSION_STORE == "memory":
+        problems.append("SESSION_STORE=memory keeps sessions per worker; use sqlite or supabase")
+    if METRICS_ENABLED:
+        problems.append("/metrics counters are per worker; set METRICS_ENABLED=false or run one worker per container")
+    if problems:
+        raise RuntimeError(f"WEB_CONCURRENCY={WEB_CONCURRENCY} is not supported: " + "; ".join(problems))
+
+    # Invalidations only reach the worker that made the change; the others
+    # serve stale personality, settings and context until entries expire.
+    config_cache.limit_ttl(MULTI_WORKER_CACHE_TTL_SECONDS)
+    context_cache.limit_ttl(MULTI_WORKER_CACHE_TTL_SECONDS)
+
+@app.on_event("startup")
+async def start_background_services():
+    check_worker_config()
+    # Runs here rather than at import: spawned extraction workers re-import
+    # this module and must not repeat the network calls or create assistants.
+    # `python main.py` already ran it once before starting the workers.
+    if not os.getenv("ELIAS_AUTO_INITIALIZED"):
+        await asyncio.to_thread(auto_initialize)
+    ingestion_service.start()
+    message_writer.start()
+    latency_telemetry.start()
+    session_store.start()
+    background_tasks.append(asyncio.create_task(monitor_event_loop_lag()))
+
+    if VECTOR_INDEX_ENABLED:
+        background_tasks.append(asyncio.create_task(load_vector_index()))
+
+@app.on_event("shutdown")
+async def stop_background_services():
+    await ingestion_service.stop()
+    await message_writer.stop()
+    await latency_telemetry.stop()
+    await session_store.stop()
+    for task in background_tasks:
+        task.cancel()
+    await async_supabase.aclose()
+
 client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 active_conversations = {}
 conversation_history = {}
-context_cache = {}
-
-async def transcribe_audio(audio_data: bytes) -> str:
-    with tempfile.NamedTemporaryFile(suffix=".webm", delete=False) as temp_audio:
-        temp_audio.write(audio_data)
-        temp_audio_path = temp_audio.name
 
-    try:
-        with open(temp_audio_path, "rb") as audio_file:
-            transcript = await client.audio.transcriptions.create(
-                model="whisper-1",
-                file=audio_file,
-                response_format="text"
-            )
-        return transcript
-    finally:
-        Path(temp_audio_path).unlink(missing_ok=True)
-
-def get_cached_context(conversation_id: str, user_message: str) -> str:
-    cache_key = f"{conversation_id}_{hash(user_message) % 10000}"
-
-    if cache_key in context_cache:
-        return context_cache[cache_key]
+TTS_MAX_PARALLEL = int(os.getenv("TTS_MAX_PARALLEL", "3"))
+TTS_MAX_PENDING = int(os.getenv("TTS_MAX_PENDING", "6"))
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "5"))
+RAG_MATCH_THRESHOLD = float(os.getenv("RAG_MATCH_THRESHOLD", "0.7"))
+RAG_TOKEN_BUDGET = int(os.getenv("RAG_TOKEN_BUDGET", "600"))
+RAG_TIMEOUT_SECONDS = float(os.getenv("RAG_TIMEOUT_SECONDS", "0.5"))
+CONVERSATION_EMBEDDING_INTERVAL = int(os.getenv("CONVERSATION_EMBEDDING_INTERVAL", "5"))
+
+metrics.callback(
+    "elias_websocket_connections",
+    "Open /ws voice connections.",
+    lambda: len(active_conversations)
+)
+metrics.callback(
+    "elias_message_writer_pending",
+    "Messages waiting to be written by the write-behind message writer.",
+    lambda: message_writer.pending()
+)
+metrics.callback(
+    "elias_ingestion_queue_depth",
+    "Reports waiting for the ingestion workers.",
+    ingestion_service.queue_depth
+)
+metrics.callback(
+    "elias_context_cache_hit_ratio",
+    "Conversation context cache hit ratio since startup.",
+    lambda: context_cache.stats()["hit_ratio"]
+)
+metrics.callback(
+    "elias_context_cache_requests_total",
+    "Conversation context cache lookups by result.",
+    lambda: {("hit",): context_cache.stats()["hits"], ("miss",): context_cache.stats()["misses"]},
+    label_names=("result",),
+    kind="counter"
+)
+metrics.callback(
+    "elias_context_cache_entries",
+    "Entries held in the conversation context cache.",
+    lambda: context_cache.stats()["size"]
+)
 
-    max_context = ReferenceService.get_max_context_conversations()
-    context = ContextBuilder.build_conversation_context(
+if METRICS_ENABLED:
+    @app.get("/metrics")
+    async def get_metrics():
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+async def transcribe_audio(audio_data: Union[bytes, memoryview], prompt: Optional[str] = None) -> str:
+    if isinstance(audio_data, memoryview):
+        audio_data = audio_data.tobytes()
+
+    # Upload straight from memory; the container header decides the file
+    # name Whisper uses to pick a decoder.
+    extension, content_type = detect_audio_format(audio_data)
+
+    with openai_request("whisper-1"):
+        transcript = await client.audio.transcriptions.create(
+            model="whisper-1",
+            file=(f"audio.{extension}", audio_data, content_type),
+            response_format="text",
+            prompt=prompt or NOT_GIVEN
+        )
+    return transcript
+
+async def get_cached_context(conversation_id: Optional[str], user_message: str) -> str:
+    if not conversation_id:
+        return ""
+
+    context = context_cache.get(conversation_id, user_message)
+    if context is not None:
+        return context
+
+    max_context = await AsyncReferenceService.get_max_context_conversations()
+    context, source_ids = await AsyncContextBuilder.build_conversation_context_with_sources(
         current_conversation_id=conversation_id,
         user_message=user_message,
         max_conversations=max_context
     )
 
-    context_cache[cache_key] = context
-    if len(context_cache) > 100:
-        context_cache.pop(next(iter(context_cache)))
+    context_cache.set(conversation_id, user_message, context, source_ids)
 
     return context
 
-async def stream_assistant_response(connection_id: str, user_message: str, conversation_id: Optional[str] = None):
-    personality_config = PersonalityService.get_active_personality()
+async def get_report_context(user_message: str) -> str:
+    try:
+        return await asyncio.wait_for(
+            AsyncContextBuilder.build_report_context(
+                user_message,
+                top_k=RAG_TOP_K,
+                match_threshold=RAG_MATCH_THRESHOLD,
+                token_budget=RAG_TOKEN_BUDGET
+            ),
+            timeout=RAG_TIMEOUT_SECONDS
+        )
+    except asyncio.TimeoutError:
+        print("Report retrieval timed out, answering without report context")
+    except Exception as e:
+        print(f"Error retrieving report context: {e}")
+    return ""
+
+async def build_chat_messages(connection_id: str, user_message: str, conversation_id: Optional[str] = None):
+    personality_config, context, report_context = await asyncio.gather(
+        AsyncPersonalityService.get_active_personality(),
+        get_cached_context(conversation_id, user_message),
+        get_report_context(user_message)
+    )
 
     if not personality_config:
         with open("personality/default_elias.json", "r") as f:
@@ -90,189 +235,519 @@ async def stream_assistant_response(connection_id: str, user_message: str, conve
     system_message = personality_config.get("instructions", "You are Elias, a helpful AI assistant.")
 
     if connection_id not in conversation_history:
-        conversation_history[connection_id] = deque(maxlen=20)
+        conversation_history[connection_id] = create_conversation_history()
 
-    context = ""
-    if conversation_id:
-        context = get_cached_context(conversation_id, user_message)
+    context = "\n".join(part for part in [context, report_context] if part)
 
-    full_message = user_message
-    if context:
-        full_message = f"{context}\n\nCurrent question: {user_message}"
+    return conversation_history[connection_id].build_messages(system_message, user_message, context)
 
-    conversation_history[connection_id].append({"role": "user", "content": full_message})
+async def summarize_history(summary: str, messages: List[dict]) -> str:
+    transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+    prompt = (
+        "Update the running summary of this podcast conversation with the new turns. "
+        "Keep names, facts, figures, open questions and anything either speaker promised to come back to. "
+        "Write compact prose, no preamble.\n\n"
+        f"Current summary:\n{summary or '(none)'}\n\nNew turns:\n{transcript}"
+    )
 
-    messages = [
-        {"role": "system", "content": system_message}
-    ] + list(conversation_history[connection_id])
+    with openai_request("gpt-4o-mini"):
+        response = await client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=HISTORY_SUMMARY_MAX_TOKENS,
+            temperature=0.2
+        )
+    return response.choices[0].message.content or ""
+
+def create_conversation_history() -> ConversationHistory:
+    return ConversationHistory(summarize=summarize_history)
+
+async def stream_completion(messages: List[dict]):
+    with openai_request("gpt-4o-mini"):
+        stream = await client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=messages,
+            stream=True,
+            max_tokens=500,
+            temperature=0.7
+        )
+
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            await stream.close()
 
-    stream = await client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=messages,
-        stream=True,
-        max_tokens=500,
-        temperature=0.7
+async def stream_assistant_response(connection_id: str, user_message: str, conversation_id: Optional[str] = None):
+    messages = await build_chat_messages(connection_id, user_message, conversation_id)
+    conversation_history[connection_id].add_user(user_message)
+    return stream_completion(messages)
+
+def create_speculative_responder(connection_id: str) -> SpeculativeResponder:
+    async def start(partial: str):
+        messages = await build_chat_messages(
+            connection_id, partial, active_conversations.get(connection_id)
+        )
+        # Remember the history revision this answer was generated against; it
+        # is only reused if nothing else was appended in the meantime.
+        return conversation_history[connection_id].revision, stream_completion(messages)
+
+    async def prefetch(partial: str):
+        await get_cached_context(active_conversations.get(connection_id), partial)
+
+    return SpeculativeResponder(start, prefetch=prefetch)
+
+async def refresh_conversation_embedding(conversation_id: str):
+    # The embedding is built from stored messages, so write out the buffer first.
+    await message_writer.flush()
+    try:
+        await AsyncConversationService.refresh_conversation_embedding(conversation_id)
+    except Exception as e:
+        print(f"Error refreshing conversation embedding: {e}")
+
+async def persist_turn(conversation_id: str, user_text: str, assistant_text: str, turn_number: int):
+    message_writer.enqueue(conversation_id, "user", user_text)
+    if assistant_text:
+        message_writer.enqueue(conversation_id, "assistant", assistant_text)
+
+    if turn_number % CONVERSATION_EMBEDDING_INTERVAL == 0:
+        await refresh_conversation_embedding(conversation_id)
+
+async def synthesize_speech(text: str):
+    with openai_request("tts-1"):
+        async with client.audio.speech.with_streaming_response.create(
+            model="tts-1",
+            voice="onyx",
+            input=text,
+            response_format="mp3"
+        ) as response:
+            async for chunk in response.iter_bytes(chunk_size=1024):
+                yield chunk
+
+async def respond_to_transcript(
+    websocket: WebSocket,
+    connection_id: str,
+    conversation_id: Optional[str],
+    turn: TurnState,
+    transcript: str,
+    timer: TurnTimer,
+    speculation: Optional[Speculation] = None
+) -> str:
+    print(f"User: {transcript}")
+
+    await websocket.send_json({
+        "type": "transcript",
+        "text": transcript
+    })
+
+    await websocket.send_json({
+        "type": "status",
+        "message": "Elias is thinking..."
+    })
+
+    stream = None
+    if speculation:
+        history = conversation_history[connection_id]
+        if history.revision == speculation.payload:
+            history.add_user(transcript)
+            stream = speculation.stream()
+        else:
+            speculation.cancel()
+
+    if stream is None:
+        stream = await stream_assistant_response(connection_id, transcript, conversation_id)
+
+    timer.mark("context_built")
+
+    tts_scheduler = TTSScheduler(
+        websocket,
+        synthesize_speech,
+        max_parallel=TTS_MAX_PARALLEL,
+        max_pending=TTS_MAX_PENDING
     )
 
-    return stream
+    response_text = ""
+    response_buffer = ""
+    sentence_delimiters = ['.', '!', '?', '\n']
+
+    try:
+        async for content in stream:
+            timer.mark("llm_first_token")
+            response_text += content
+            response_buffer += content
+
+            if any(delim in response_buffer for delim in sentence_delimiters) and len(response_buffer) > 50:
+                await websocket.send_json({
+                    "type": "response_chunk",
+                    "text": response_buffer
+                })
+                turn.spoken_text += response_buffer
+
+                await tts_scheduler.submit(response_buffer)
+                response_buffer = ""
+
+        if response_buffer:
+            await websocket.send_json({
+                "type": "response_chunk",
+                "text": response_buffer
+            })
+            turn.spoken_text += response_buffer
+            await tts_scheduler.submit(response_buffer)
+
+        await tts_scheduler.finish()
+        timer.mark("turn_complete")
+        if tts_scheduler.first_audio_sent_at is not None:
+            timer.mark("tts_first_byte", tts_scheduler.first_audio_sent_at)
+    except BaseException:
+        await tts_scheduler.cancel()
+        if speculation:
+            speculation.cancel()
+        raise
+    finally:
+        await stream.aclose()
+
+    print(f"Elias: {response_text}")
+
+    conversation_history[connection_id].add_assistant(response_text)
+
+    await websocket.send_json({
+        "type": "response",
+        "text": response_text
+    })
+
+    await websocket.send_json({
+        "type": "status",
+        "message": "Ready"
+    })
+
+    return response_text
+
+def start_streaming_transcriber(
+    websocket: WebSocket,
+    utterance: UtteranceSpeculation,
+    sample_rate: Optional[int] = None
+) -> StreamingTranscriber:
+    async def send_partial(text: str):
+        utterance.on_partial(text)
+        await websocket.send_json({"type": "transcript_partial", "text": text})
+
+    async def transcribe_segment(wav_data: bytes, prompt: str) -> str:
+        return await transcribe_audio(wav_data, prompt=prompt)
+
+    if sample_rate:
+        return StreamingTranscriber(transcribe_segment, send_partial, sample_rate=sample_rate)
+    return StreamingTranscriber(transcribe_segment, send_partial)
+
+async def save_session(session_id: str, conversation_id: Optional[str], history: Optional[ConversationHistory]):
+    if history is None:
+        return
+
+    await session_store.save(session_id, {
+        "session_id": session_id,
+        "conversation_id": conversation_id,
+        **history.snapshot()
+    })
+
+def release_session(connection_id: str, history: ConversationHistory):
+    # A client that reconnected to this worker before the old socket closed
+    # already owns the entries; leave them alone.
+    if conversation_history.get(connection_id) is history:
+        del conversation_history[connection_id]
+        active_conversations.pop(connection_id, None)
+    history.cancel()
+
+async def run_turn(
+    websocket: WebSocket,
+    connection_id: str,
+    conversation_id: Optional[str],
+    turn: TurnState,
+    transcript: str,
+    timer: TurnTimer,
+    speculation: Optional[Speculation] = None
+):
+    try:
+        response_text = await respond_to_transcript(
+            websocket, connection_id, conversation_id, turn, transcript, timer, speculation
+        )
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        print(f"Error processing audio: {e}")
+        import traceback
+        traceback.print_exc()
+        await websocket.send_json({
+            "type": "error",
+            "message": f"Error: {str(e)}"
+        })
+        return
 
-async def stream_tts_audio(text: str, websocket: WebSocket):
-    response = await client.audio.speech.create(
-        model="tts-1",
-        voice="onyx",
-        input=text,
-        response_format="mp3"
+    turn.count += 1
+
+    timer.turn_number = turn.count
+    latency_telemetry.record(timer)
+
+    turn.track(asyncio.create_task(
+        save_session(connection_id, conversation_id, conversation_history.get(connection_id))
+    ))
+
+    if conversation_id:
+        turn.track(asyncio.create_task(
+            persist_turn(conversation_id, transcript, response_text, turn.count)
+        ))
+
+async def interrupt_turn(websocket: WebSocket, connection_id: str, conversation_id: Optional[str], turn: TurnState):
+    if not await turn.cancel():
+        return
+
+    truncated_text = turn.spoken_text
+    print(f"Turn interrupted after: {truncated_text!r}")
+
+    if connection_id in conversation_history:
+        conversation_history[connection_id].add_assistant(truncated_text)
+
+    turn.count += 1
+
+    if conversation_id:
+        turn.track(asyncio.create_task(
+            persist_turn(conversation_id, turn.transcript, truncated_text, turn.count)
+        ))
+
+    turn.track(asyncio.create_task(
+        save_session(connection_id, conversation_id, conversation_history.get(connection_id))
+    ))
+
+    await websocket.send_json({
+        "type": "turn_cancelled",
+        "text": truncated_text
+    })
+
+async def begin_turn(
+    websocket: WebSocket,
+    connection_id: str,
+    turn: TurnState,
+    utterance: Optional[UtteranceSpeculation],
+    transcript: Optional[str],
+    timer: TurnTimer
+):
+    if not transcript or transcript.strip() == "":
+        if utterance:
+            utterance.cancel()
+        await websocket.send_json({
+            "type": "error",
+            "message": "No speech detected. Please try again."
+        })
+        return
+
+    timer.mark("stt_done")
+
+    conversation_id = active_conversations.get(connection_id)
+    await interrupt_turn(websocket, connection_id, conversation_id, turn)
+
+    speculation = await utterance.take(transcript) if utterance else None
+    turn.start(
+        transcript,
+        run_turn(websocket, connection_id, conversation_id, turn, transcript, timer, speculation)
     )
 
-    chunk_size = 1024
-    async for chunk in response.iter_bytes(chunk_size=chunk_size):
-        if chunk:
-            await websocket.send_bytes(chunk)
+async def finish_utterance(
+    websocket: WebSocket,
+    connection_id: str,
+    turn: TurnState,
+    utterance: UtteranceSpeculation,
+    transcriber: StreamingTranscriber,
+    timer: TurnTimer,
+    previous: Optional[asyncio.Task] = None
+):
+    # Runs off the receive loop so frames of the next utterance keep being
+    # read while the last segments are transcribed; utterances still start
+    # their turns in the order they were spoken.
+    if previous:
+        await asyncio.gather(previous, return_exceptions=True)
+
+    try:
+        transcript = await transcriber.finish()
+    except asyncio.CancelledError:
+        transcriber.cancel()
+        utterance.cancel()
+        raise
+    except Exception as e:
+        print(f"Error transcribing audio: {e}")
+        utterance.cancel()
+        await websocket.send_json({
+            "type": "error",
+            "message": f"Error: {str(e)}"
+        })
+        return
 
-    await websocket.send_json({"type": "audio_end"})
+    await begin_turn(websocket, connection_id, turn, utterance, transcript, timer)
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
 
-    connection_id = id(websocket)
-    session_id = f"session_{connection_id}_{int(datetime.now().timestamp())}"
+    requested_session_id = websocket.query_params.get("session_id")
+    state = await session_store.load(requested_session_id, fresh=True) if requested_session_id else None
 
-    conversation = ConversationService.create_conversation(
-        thread_id=session_id,
-        title=f"Conversation {datetime.now().strftime('%Y-%m-%d %H:%M')}"
-    )
-    conversation_id = conversation["id"] if conversation else None
+    history = create_conversation_history()
+
+    if state:
+        session_id = requested_session_id
+        conversation_id = state.get("conversation_id")
+        history.restore(state)
+    else:
+        session_id = f"session_{uuid.uuid4().hex}"
+        conversation = await AsyncConversationService.create_conversation(
+            thread_id=session_id,
+            title=f"Conversation {datetime.now().strftime('%Y-%m-%d %H:%M')}"
+        )
+        conversation_id = conversation["id"] if conversation else None
+
+    connection_id = session_id
     active_conversations[connection_id] = conversation_id
-    conversation_history[connection_id] = deque(maxlen=20)
+    conversation_history[connection_id] = history
 
-    print(f"Client connected. Session ID: {session_id}, Conversation ID: {conversation_id}")
+    turn = TurnState()
+    streaming: Optional[StreamingTranscriber] = None
+    utterance: Optional[UtteranceSpeculation] = None
+    utterance_task: Optional[asyncio.Task] = None
+    responder = create_speculative_responder(connection_id)
+
+    print(f"Client {'resumed' if state else 'connected'}. Session ID: {session_id}, Conversation ID: {conversation_id}")
 
     await websocket.send_json({
         "type": "connected",
         "thread_id": session_id,
-        "conversation_id": conversation_id
+        "conversation_id": conversation_id,
+        "resumed": bool(state)
     })
 
+    def end_utterance(timer: TurnTimer):
+        nonlocal utterance_task
+        timer.mark("audio_received")
+        utterance_task = asyncio.create_task(finish_utterance(
+            websocket, connection_id, turn, utterance, streaming, timer, utterance_task
+        ))
+
     try:
         while True:
             message = await websocket.receive()
 
-            if "bytes" in message:
-                audio_data = message["bytes"]
+            if message.get("type") == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
 
-                await websocket.send_json({
-                    "type": "status",
-                    "message": "Transcribing..."
-                })
+            transcript = None
+            timer = TurnTimer(session_id, conversation_id)
 
+            if message.get("text"):
                 try:
-                    transcript = await transcribe_audio(audio_data)
+                    control = json.loads(message["text"])
+                except ValueError:
+                    continue
+
+                if control.get("type") == "interrupt":
+                    await interrupt_turn(websocket, connection_id, conversation_id, turn)
+                    continue
 
-                    if not transcript or transcript.strip() == "":
+                if control.get("type") == "stream_start":
+                    sample_rate = control.get("sample_rate", STREAM_SAMPLE_RATE)
+                    if not is_supported_sample_rate(sample_rate):
                         await websocket.send_json({
                             "type": "error",
-                            "message": "No speech detected. Please try again."
+                            "message": f"Unsupported sample_rate {sample_rate!r}, expected one of {list(SUPPORTED_SAMPLE_RATES)}"
                         })
                         continue
 
-                    print(f"User: {transcript}")
-
-                    conversation_id = active_conversations.get(connection_id)
-
-                    await websocket.send_json({
-                        "type": "transcript",
-                        "text": transcript
-                    })
-
+                    if streaming:
+                        streaming.cancel()
+                        utterance.cancel()
+                    utterance = responder.utterance()
+                    streaming = start_streaming_transcriber(websocket, utterance, sample_rate)
                     await websocket.send_json({
                         "type": "status",
-                        "message": "Elias is thinking..."
-                    })
-
-                    stream = await stream_assistant_response(connection_id, transcript, conversation_id)
-
-                    response_text = ""
-                    response_buffer = ""
-                    sentence_delimiters = ['.', '!', '?', '\n']
-
-                    async for chunk in stream:
-                        if chunk.choices[0].delta.content:
-                            content = chunk.choices[0].delta.content
-                            response_text += content
-                            response_buffer += content
-
-                            if any(delim in response_buffer for delim in sentence_delimiters) and len(response_buffer) > 50:
-                                await websocket.send_json({
-                                    "type": "response_chunk",
-                                    "text": response_buffer
-                                })
-
-                                asyncio.create_task(stream_tts_audio(response_buffer, websocket))
-                                response_buffer = ""
-
-                    if response_buffer:
-                        await websocket.send_json({
-                            "type": "response_chunk",
-                            "text": response_buffer
-                        })
-                        asyncio.create_task(stream_tts_audio(response_buffer, websocket))
-
-                    print(f"Elias: {response_text}")
-
-                    conversation_history[connection_id].append({"role": "assistant", "content": response_text})
-
-                    if conversation_id:
-                        asyncio.create_task(
-                            asyncio.to_thread(
-                                ConversationService.add_message,
-                                conversation_id=conversation_id,
-                                role="user",
-                                content=transcript
-                            )
-                        )
-                        asyncio.create_task(
-                            asyncio.to_thread(
-                                ConversationService.add_message,
-                                conversation_id=conversation_id,
-                                role="assistant",
-                                content=response_text
-                            )
-                        )
-
-                    await websocket.send_json({
-                        "type": "response",
-                        "text": response_text
+                        "message": "Listening..."
                     })
+                    continue
 
+                if control.get("type") == "stream_stop" and streaming:
                     await websocket.send_json({
                         "type": "status",
-                        "message": "Ready"
+                        "message": "Transcribing..."
                     })
+                    end_utterance(timer)
+                    streaming = None
+                    utterance = None
+                continue
+
+            elif message.get("bytes") is not None and streaming:
+                streaming.feed(message["bytes"])
+
+                # Barge-in: the host started talking over the current answer.
+                if streaming.heard_speech and turn.active:
+                    await interrupt_turn(websocket, connection_id, conversation_id, turn)
+
+                if streaming.end_of_utterance:
+                    # Stay in streaming mode: the next frames belong to the
+                    # next utterance, not to the legacy blob path.
+                    end_utterance(timer)
+                    utterance = responder.utterance()
+                    streaming = start_streaming_transcriber(websocket, utterance, streaming.sample_rate)
+                continue
+
+            elif message.get("bytes") is not None:
+                # Only a recorded container counts as an utterance; stray raw
+                # PCM (e.g. frames that arrive after stream_stop) must not
+                # cancel the answer that is playing.
+                if detect_audio_format(message["bytes"], default=None) is None:
+                    continue
+
+                timer.mark("audio_received")
+                await interrupt_turn(websocket, connection_id, conversation_id, turn)
+
+                await websocket.send_json({
+                    "type": "status",
+                    "message": "Transcribing..."
+                })
 
+                try:
+                    transcript = await transcribe_audio(message["bytes"])
                 except Exception as e:
-                    print(f"Error processing audio: {e}")
-                    import traceback
-                    traceback.print_exc()
+                    print(f"Error transcribing audio: {e}")
                     await websocket.send_json({
                         "type": "error",
                         "message": f"Error: {str(e)}"
                     })
+                    continue
+
+            else:
+                continue
+
+            await begin_turn(websocket, connection_id, turn, None, transcript, timer)
 
     except WebSocketDisconnect:
         print(f"Client disconnected. Session ID: {session_id}")
-        if connection_id in active_conversations:
-            del active_conversations[connection_id]
-        if connection_id in conversation_history:
-            del conversation_history[connection_id]
+        release_session(connection_id, history)
     except Exception as e:
         print(f"WebSocket error: {e}")
         import traceback
         traceback.print_exc()
-        if connection_id in active_conversations:
-            del active_conversations[connection_id]
-        if connection_id in conversation_history:
-            del conversation_history[connection_id]
+        release_session(connection_id, history)
+    finally:
+        if utterance_task:
+            utterance_task.cancel()
+            await asyncio.gather(utterance_task, return_exceptions=True)
+        await turn.cancel()
+        if streaming:
+            streaming.cancel()
+        responder.cancel()
+        await asyncio.gather(*turn.background_tasks, return_exceptions=True)
+        if conversation_id and turn.count % CONVERSATION_EMBEDDING_INTERVAL:
+            # Awaited rather than spawned so the refresh can't be garbage
+            # collected or cut off by shutdown; it flushes the writer first.
+            await refresh_conversation_embedding(conversation_id)
+        else:
+            await message_writer.flush()
+        await save_session(session_id, conversation_id, history)
 
 dist_path = Path("dist")
 if dist_path.exists():
@@ -297,4 +772,13 @@ else:
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    check_worker_config()
+    auto_initialize()
+    os.environ["ELIAS_AUTO_INITIALIZED"] = "1"
+
+    if WEB_CONCURRENCY <= 1:
+        # Passing the app object keeps uvicorn from importing this file a
+        # second time as the module "main".
+        uvicorn.run(app, host="0.0.0.0", port=8000)
+    else:
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=WEB_CONCURRENCY)
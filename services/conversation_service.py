@@ -1,7 +1,36 @@
 from typing import List, Optional, Dict
 from datetime import datetime
-from db_client import supabase
+from postgrest.types import ReturnMethod
+from db_client import supabase, async_supabase
+from services.embedding_service import EmbeddingService, AsyncEmbeddingService
+from utils.context_cache import context_cache
+import os
+from utils.metrics import instrument_service
 
+# Listed explicitly so reads never pull the 1536-d embedding column.
+CONVERSATION_COLUMNS = "id,title,description,started_at,ended_at,duration_seconds,thread_id,is_archived,tags,created_at,updated_at"
+CONVERSATION_EMBEDDING_MESSAGES = int(os.getenv("CONVERSATION_EMBEDDING_MESSAGES", "20"))
+CONVERSATION_EMBEDDING_MAX_CHARS = 6000
+
+@instrument_service(methods=[
+    "create_conversation",
+    "end_conversation",
+    "add_message",
+    "add_messages",
+    "get_conversation_by_thread_id",
+    "get_conversation_messages",
+    "get_recent_messages_for_conversations",
+    "refresh_conversation_embedding",
+    "match_conversations",
+    "get_recent_conversations",
+    "search_conversations",
+    "archive_conversation",
+    "delete_conversation",
+    "update_conversation_title",
+    "add_conversation_tags",
+    "get_conversations_by_tags",
+    "import_conversation"
+])
 class ConversationService:
 
     @staticmethod
@@ -37,11 +66,21 @@ class ConversationService:
         }
 
         result = supabase.table("messages").insert(data).execute()
+        context_cache.invalidate_conversation(conversation_id)
         return result.data[0] if result.data else None
 
+    @staticmethod
+    def add_messages(messages: List[Dict]):
+        if not messages:
+            return
+
+        supabase.table("messages").insert(messages, returning=ReturnMethod.minimal).execute()
+        for conversation_id in {message["conversation_id"] for message in messages}:
+            context_cache.invalidate_conversation(conversation_id)
+
     @staticmethod
     def get_conversation_by_thread_id(thread_id: str) -> Optional[Dict]:
-        result = supabase.table("conversations").select("*").eq("thread_id", thread_id).maybeSingle().execute()
+        result = supabase.table("conversations").select(CONVERSATION_COLUMNS).eq("thread_id", thread_id).maybeSingle().execute()
         return result.data
 
     @staticmethod
@@ -49,9 +88,79 @@ class ConversationService:
         result = supabase.table("messages").select("*").eq("conversation_id", conversation_id).order("timestamp").execute()
         return result.data if result.data else []
 
+    @staticmethod
+    def get_recent_messages_for_conversations(conversation_ids: List[str], messages_per_conversation: int = 4) -> Dict[str, List[Dict]]:
+        if not conversation_ids:
+            return {}
+
+        result = supabase.rpc("get_recent_messages_for_conversations", {
+            "conversation_ids": conversation_ids,
+            "messages_per_conversation": messages_per_conversation
+        }).execute()
+        return ConversationService._group_by_conversation(result.data)
+
+    @staticmethod
+    def _group_by_conversation(messages: Optional[List[Dict]]) -> Dict[str, List[Dict]]:
+        grouped = {}
+        for msg in messages or []:
+            grouped.setdefault(msg["conversation_id"], []).append(msg)
+        return grouped
+
+    @staticmethod
+    def build_embedding_text(conversation: Dict, messages: List[Dict]) -> str:
+        parts = [conversation.get("title") or ""]
+
+        if conversation.get("description"):
+            parts.append(conversation["description"])
+        if conversation.get("tags"):
+            parts.append("Topics: " + ", ".join(conversation["tags"]))
+
+        for msg in messages:
+            speaker = "Host" if msg.get("role") == "user" else "Elias"
+            parts.append(f"{speaker}: {msg.get('content', '')}")
+
+        return "\n".join(parts)[:CONVERSATION_EMBEDDING_MAX_CHARS]
+
+    @staticmethod
+    def refresh_conversation_embedding(conversation_id: str) -> bool:
+        result = supabase.table("conversations").select(CONVERSATION_COLUMNS).eq("id", conversation_id).maybe_single().execute()
+        conversation = result.data if result else None
+        if not conversation:
+            return False
+
+        messages = ConversationService.get_recent_messages_for_conversations(
+            [conversation_id],
+            messages_per_conversation=CONVERSATION_EMBEDDING_MESSAGES
+        ).get(conversation_id, [])
+
+        embedding = EmbeddingService.generate_embedding(
+            ConversationService.build_embedding_text(conversation, messages)
+        )
+
+        supabase.table("conversations").update({
+            "embedding": embedding,
+            "embedding_message_count": len(messages)
+        }, returning=ReturnMethod.minimal).eq("id", conversation_id).execute()
+        return True
+
+    @staticmethod
+    def match_conversations(
+        query_embedding: List[float],
+        match_count: int = 5,
+        match_threshold: float = 0.3,
+        exclude_conversation_id: Optional[str] = None
+    ) -> List[Dict]:
+        result = supabase.rpc("match_conversations", {
+            "query_embedding": query_embedding,
+            "match_count": match_count,
+            "match_threshold": match_threshold,
+            "exclude_conversation_id": exclude_conversation_id
+        }).execute()
+        return result.data if result.data else []
+
     @staticmethod
     def get_recent_conversations(limit: int = 10, include_archived: bool = False) -> List[Dict]:
-        query = supabase.table("conversations").select("*")
+        query = supabase.table("conversations").select(CONVERSATION_COLUMNS)
 
         if not include_archived:
             query = query.eq("is_archived", False)
@@ -61,22 +170,25 @@ class ConversationService:
 
     @staticmethod
     def search_conversations(query: str, limit: int = 20) -> List[Dict]:
-        result = supabase.table("conversations").select("*").ilike("title", f"%{query}%").eq("is_archived", False).order("started_at", desc=True).limit(limit).execute()
+        result = supabase.table("conversations").select(CONVERSATION_COLUMNS).ilike("title", f"%{query}%").eq("is_archived", False).order("started_at", desc=True).limit(limit).execute()
         return result.data if result.data else []
 
     @staticmethod
     def archive_conversation(conversation_id: str) -> Dict:
         result = supabase.table("conversations").update({"is_archived": True}).eq("id", conversation_id).execute()
+        context_cache.invalidate_conversation(conversation_id)
         return result.data[0] if result.data else None
 
     @staticmethod
     def delete_conversation(conversation_id: str) -> bool:
         result = supabase.table("conversations").delete().eq("id", conversation_id).execute()
+        context_cache.invalidate_conversation(conversation_id)
         return len(result.data) > 0 if result.data else False
 
     @staticmethod
     def update_conversation_title(conversation_id: str, title: str) -> Dict:
         result = supabase.table("conversations").update({"title": title}).eq("id", conversation_id).execute()
+        context_cache.invalidate_conversation(conversation_id)
         return result.data[0] if result.data else None
 
     @staticmethod
@@ -86,7 +198,7 @@ class ConversationService:
 
     @staticmethod
     def get_conversations_by_tags(tags: List[str], limit: int = 20) -> List[Dict]:
-        result = supabase.table("conversations").select("*").contains("tags", tags).eq("is_archived", False).order("started_at", desc=True).limit(limit).execute()
+        result = supabase.table("conversations").select(CONVERSATION_COLUMNS).contains("tags", tags).eq("is_archived", False).order("started_at", desc=True).limit(limit).execute()
         return result.data if result.data else []
 
     @staticmethod
@@ -113,3 +225,179 @@ class ConversationService:
         supabase.table("messages").insert(messages).execute()
 
         return conversation
+
+
+@instrument_service
+class AsyncConversationService:
+
+    @staticmethod
+    async def create_conversation(thread_id: str, title: str = "Untitled Conversation", description: Optional[str] = None) -> Dict:
+        data = {
+            "thread_id": thread_id,
+            "title": title,
+            "description": description,
+            "started_at": datetime.utcnow().isoformat()
+        }
+
+        result = await async_supabase.table("conversations").insert(data).execute()
+        return result.data[0] if result.data else None
+
+    @staticmethod
+    async def end_conversation(conversation_id: str, duration_seconds: int) -> Dict:
+        data = {
+            "ended_at": datetime.utcnow().isoformat(),
+            "duration_seconds": duration_seconds
+        }
+
+        result = await async_supabase.table("conversations").update(data).eq("id", conversation_id).execute()
+        return result.data[0] if result.data else None
+
+    @staticmethod
+    async def add_message(conversation_id: str, role: str, content: str, audio_url: Optional[str] = None) -> Dict:
+        data = {
+            "conversation_id": conversation_id,
+            "role": role,
+            "content": content,
+            "audio_url": audio_url,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+
+        result = await async_supabase.table("messages").insert(data).execute()
+        context_cache.invalidate_conversation(conversation_id)
+        return result.data[0] if result.data else None
+
+    @staticmethod
+    async def add_messages(messages: List[Dict]):
+        if not messages:
+            return
+
+        await async_supabase.table("messages").insert(messages, returning=ReturnMethod.minimal).execute()
+        for conversation_id in {message["conversation_id"] for message in messages}:
+            context_cache.invalidate_conversation(conversation_id)
+
+    @staticmethod
+    async def get_conversation_by_thread_id(thread_id: str) -> Optional[Dict]:
+        result = await async_supabase.table("conversations").select(CONVERSATION_COLUMNS).eq("thread_id", thread_id).maybe_single().execute()
+        return result.data if result else None
+
+    @staticmethod
+    async def get_conversation_messages(conversation_id: str) -> List[Dict]:
+        result = await async_supabase.table("messages").select("*").eq("conversation_id", conversation_id).order("timestamp").execute()
+        return result.data if result.data else []
+
+    @staticmethod
+    async def get_recent_messages_for_conversations(conversation_ids: List[str], messages_per_conversation: int = 4) -> Dict[str, List[Dict]]:
+        if not conversation_ids:
+            return {}
+
+        result = await async_supabase.rpc("get_recent_messages_for_conversations", {
+            "conversation_ids": conversation_ids,
+            "messages_per_conversation": messages_per_conversation
+        }).execute()
+        return ConversationService._group_by_conversation(result.data)
+
+    @staticmethod
+    async def refresh_conversation_embedding(conversation_id: str) -> bool:
+        result = await async_supabase.table("conversations").select(CONVERSATION_COLUMNS).eq("id", conversation_id).maybe_single().execute()
+        conversation = result.data if result else None
+        if not conversation:
+            return False
+
+        messages = (await AsyncConversationService.get_recent_messages_for_conversations(
+            [conversation_id],
+            messages_per_conversation=CONVERSATION_EMBEDDING_MESSAGES
+        )).get(conversation_id, [])
+
+        embedding = await AsyncEmbeddingService.generate_embedding(
+            ConversationService.build_embedding_text(conversation, messages)
+        )
+
+        await async_supabase.table("conversations").update({
+            "embedding": embedding,
+            "embedding_message_count": len(messages)
+        }, returning=ReturnMethod.minimal).eq("id", conversation_id).execute()
+        return True
+
+    @staticmethod
+    async def match_conversations(
+        query_embedding: List[float],
+        match_count: int = 5,
+        match_threshold: float = 0.3,
+        exclude_conversation_id: Optional[str] = None
+    ) -> List[Dict]:
+        result = await async_supabase.rpc("match_conversations", {
+            "query_embedding": query_embedding,
+            "match_count": match_count,
+            "match_threshold": match_threshold,
+            "exclude_conversation_id": exclude_conversation_id
+        }).execute()
+        return result.data if result.data else []
+
+    @staticmethod
+    async def get_recent_conversations(limit: int = 10, include_archived: bool = False) -> List[Dict]:
+        query = async_supabase.table("conversations").select(CONVERSATION_COLUMNS)
+
+        if not include_archived:
+            query = query.eq("is_archived", False)
+
+        result = await query.order("started_at", desc=True).limit(limit).execute()
+        return result.data if result.data else []
+
+    @staticmethod
+    async def search_conversations(query: str, limit: int = 20) -> List[Dict]:
+        result = await async_supabase.table("conversations").select(CONVERSATION_COLUMNS).ilike("title", f"%{query}%").eq("is_archived", False).order("started_at", desc=True).limit(limit).execute()
+        return result.data if result.data else []
+
+    @staticmethod
+    async def archive_conversation(conversation_id: str) -> Dict:
+        result = await async_supabase.table("conversations").update({"is_archived": True}).eq("id", conversation_id).execute()
+        context_cache.invalidate_conversation(conversation_id)
+        return result.data[0] if result.data else None
+
+    @staticmethod
+    async def delete_conversation(conversation_id: str) -> bool:
+        result = await async_supabase.table("conversations").delete().eq("id", conversation_id).execute()
+        context_cache.invalidate_conversation(conversation_id)
+        return len(result.data) > 0 if result.data else False
+
+    @staticmethod
+    async def update_conversation_title(conversation_id: str, title: str) -> Dict:
+        result = await async_supabase.table("conversations").update({"title": title}).eq("id", conversation_id).execute()
+        context_cache.invalidate_conversation(conversation_id)
+        return result.data[0] if result.data else None
+
+    @staticmethod
+    async def add_conversation_tags(conversation_id: str, tags: List[str]) -> Dict:
+        result = await async_supabase.table("conversations").update({"tags": tags}).eq("id", conversation_id).execute()
+        return result.data[0] if result.data else None
+
+    @staticmethod
+    async def get_conversations_by_tags(tags: List[str], limit: int = 20) -> List[Dict]:
+        result = await async_supabase.table("conversations").select(CONVERSATION_COLUMNS).contains("tags", tags).eq("is_archived", False).order("started_at", desc=True).limit(limit).execute()
+        return result.data if result.data else []
+
+    @staticmethod
+    async def import_conversation(thread_id: str, title: str, messages: List[Dict], started_at: Optional[str] = None) -> Dict:
+        conversation_data = {
+            "thread_id": thread_id,
+            "title": title,
+            "started_at": started_at or datetime.utcnow().isoformat()
+        }
+
+        conversation_result = await async_supabase.table("conversations").insert(conversation_data).execute()
+
+        if not conversation_result.data:
+            raise Exception("Failed to create conversation during import")
+
+        conversation = conversation_result.data[0]
+        conversation_id = conversation["id"]
+
+        for msg in messages:
+            msg["conversation_id"] = conversation_id
+            if "timestamp" not in msg:
+                msg["timestamp"] = datetime.utcnow().isoformat()
+
+        if messages:
+            await async_supabase.table("messages").insert(messages).execute()
+
+        return conversation
@@ -1,29 +1,74 @@
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Iterable, Iterator, Callable, Union
+import asyncio
+import hashlib
+import json
 import re
-from openai import OpenAI
-from db_client import supabase
+import time
+import unicodedata
+import uuid
+from openai import OpenAI, AsyncOpenAI
+from postgrest.types import ReturnMethod
+from db_client import supabase, async_supabase
+from utils.lru_cache import LRUCache
+from utils.vector_index import vector_index
+from utils.text_chunker import StructuredChunker, CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS
 import os
+from utils.metrics import instrument_service, openai_request, metrics
 
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))
+EMBEDDING_BATCH_MAX_TOKENS = int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", "100000"))
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "3"))
+CHUNK_INSERT_PAGE_SIZE = int(os.getenv("CHUNK_INSERT_PAGE_SIZE", "100"))
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "512"))
+CHUNK_HASH_LOOKUP_PAGE_SIZE = int(os.getenv("CHUNK_HASH_LOOKUP_PAGE_SIZE", "100"))
+CHUNK_SELECT_PAGE_SIZE = 1000
 
+query_embedding_cache = LRUCache(max_size=QUERY_EMBEDDING_CACHE_SIZE)
+_pending_query_embeddings: Dict[tuple, asyncio.Future] = {}
+
+chunk_embeddings = metrics.counter(
+    "elias_chunk_embeddings_total",
+    "Report chunk embeddings by source: reused from a stored chunk with the same hash, or generated.",
+    ("source",)
+)
+
+
+@instrument_service(methods=[
+    "generate_embedding",
+    "generate_embeddings",
+    "get_cached_embeddings",
+    "embed_chunks",
+    "insert_chunk_rows",
+    "process_and_store_chunks",
+    "reingest_chunks",
+    "get_chunks_for_report",
+    "delete_chunks_for_report"
+])
 class EmbeddingService:
 
-    @staticmethod
-    def chunk_text(text: str, chunk_size: int = 700, overlap: int = 100) -> List[Dict]:
-        words = text.split()
-        chunks = []
-        chunk_index = 0
+    _client: Optional[OpenAI] = None
 
-        for i in range(0, len(words), chunk_size - overlap):
-            chunk_words = words[i : i + chunk_size]
-            chunk_text = " ".join(chunk_words)
+    @staticmethod
+    def _get_client() -> OpenAI:
+        if EmbeddingService._client is None:
+            EmbeddingService._client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        return EmbeddingService._client
 
-            if len(chunk_text.strip()) > 50:
-                chunks.append(
-                    {"text": chunk_text, "index": chunk_index, "token_count": len(chunk_words)}
-                )
-                chunk_index += 1
+    @staticmethod
+    def chunk_text(
+        text: str,
+        max_tokens: int = CHUNK_MAX_TOKENS,
+        overlap_tokens: int = CHUNK_OVERLAP_TOKENS
+    ) -> List[Dict]:
+        return list(EmbeddingService.chunk_pages([text], max_tokens=max_tokens, overlap_tokens=overlap_tokens))
 
-        return chunks
+    @staticmethod
+    def chunk_pages(
+        pages: Iterable[str],
+        max_tokens: int = CHUNK_MAX_TOKENS,
+        overlap_tokens: int = CHUNK_OVERLAP_TOKENS
+    ) -> Iterator[Dict]:
+        return StructuredChunker(max_tokens, overlap_tokens).chunks(pages)
 
     @staticmethod
     def extract_metadata(chunk_text: str, report_title: str) -> Dict:
@@ -69,46 +114,185 @@ class EmbeddingService:
 
     @staticmethod
     def generate_embedding(text: str, model: str = "text-embedding-3-small") -> List[float]:
-        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        return EmbeddingService.generate_embeddings([text], model=model)[0]
 
+    @staticmethod
+    def generate_embeddings(texts: List[str], model: str = "text-embedding-3-small") -> List[List[float]]:
         try:
-            response = client.embeddings.create(input=text, model=model)
-            return response.data[0].embedding
+            with openai_request(model):
+                response = EmbeddingService._get_client().embeddings.create(input=texts, model=model)
+            return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
         except Exception as e:
-            print(f"Error generating embedding: {e}")
+            print(f"Error generating embeddings: {e}")
             raise
 
+    @staticmethod
+    def batch_chunks(
+        chunks: Iterable[Dict],
+        max_items: int = EMBEDDING_BATCH_SIZE,
+        max_tokens: int = EMBEDDING_BATCH_MAX_TOKENS
+    ) -> Iterator[List[Dict]]:
+        batch = []
+        batch_tokens = 0
+
+        for chunk in chunks:
+            # Word counts undercount model tokens, so budget on whichever of
+            # the stored count and a ~4 chars/token estimate is larger.
+            chunk_tokens = max(chunk["token_count"], len(chunk["text"]) // 4)
+
+            if batch and (len(batch) >= max_items or batch_tokens + chunk_tokens > max_tokens):
+                yield batch
+                batch = []
+                batch_tokens = 0
+
+            batch.append(chunk)
+            batch_tokens += chunk_tokens
+
+        if batch:
+            yield batch
+
+    @staticmethod
+    def _with_retries(operation, description: str, max_retries: int = EMBEDDING_MAX_RETRIES):
+        for attempt in range(max_retries + 1):
+            try:
+                return operation()
+            except Exception as e:
+                if attempt == max_retries:
+                    raise
+                delay = 2 ** attempt
+                print(f"Retrying {description} in {delay}s after error: {e}")
+                time.sleep(delay)
+
+    @staticmethod
+    def normalize_chunk_text(text: str) -> str:
+        return " ".join(unicodedata.normalize("NFKC", text).split())
+
+    @staticmethod
+    def chunk_hash(text: str, model: str = "text-embedding-3-small") -> str:
+        # The model is part of the key so switching models never reuses
+        # vectors from the old one.
+        normalized = EmbeddingService.normalize_chunk_text(text)
+        return hashlib.sha256(f"{model}\n{normalized}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def get_cached_embeddings(
+        content_hashes: List[str],
+        page_size: int = CHUNK_HASH_LOOKUP_PAGE_SIZE
+    ) -> Dict[str, List[float]]:
+        unique_hashes = list(dict.fromkeys(content_hashes))
+        cached = {}
+
+        for start in range(0, len(unique_hashes), page_size):
+            page = unique_hashes[start : start + page_size]
+            # One row per hash: boilerplate repeated across reports would
+            # otherwise return a 1536-d vector for every copy.
+            result = EmbeddingService._with_retries(
+                lambda: supabase.rpc("get_chunk_embeddings_by_hash", {"content_hashes": page}).execute(),
+                f"lookup of {len(page)} chunk hashes"
+            )
+
+            for row in result.data or []:
+                embedding = row.get("embedding")
+                if embedding is not None:
+                    cached[row["content_hash"]] = json.loads(embedding) if isinstance(embedding, str) else embedding
+
+        return cached
+
+    @staticmethod
+    def embed_chunks(chunks: List[Dict], model: str = "text-embedding-3-small") -> List[List[float]]:
+        for chunk in chunks:
+            chunk["content_hash"] = EmbeddingService.chunk_hash(chunk["text"], model)
+
+        embeddings = EmbeddingService.get_cached_embeddings([chunk["content_hash"] for chunk in chunks])
+
+        # Only text that has never been embedded goes to the API, once per
+        # distinct hash even if it repeats within the batch.
+        missing = {}
+        for chunk in chunks:
+            if chunk["content_hash"] not in embeddings:
+                missing.setdefault(chunk["content_hash"], chunk["text"])
+
+        if missing:
+            generated = EmbeddingService._with_retries(
+                lambda: EmbeddingService.generate_embeddings(list(missing.values()), model=model),
+                f"embedding of {len(missing)} chunks"
+            )
+            embeddings.update(zip(missing.keys(), generated))
+
+        chunk_embeddings.inc("generated", amount=len(missing))
+        chunk_embeddings.inc("reused", amount=len(chunks) - len(missing))
+
+        return [embeddings[chunk["content_hash"]] for chunk in chunks]
+
+    @staticmethod
+    def build_chunk_row(report_id: str, chunk: Dict, embedding: List[float], report_title: str = "") -> Dict:
+        metadata = EmbeddingService.extract_metadata(chunk["text"], report_title)
+
+        return {
+            "id": str(uuid.uuid4()),
+            "report_id": report_id,
+            "company": metadata["company"],
+            "section": chunk.get("section") or metadata["section"],
+            "chunk_text": chunk["text"],
+            "abstract": metadata["abstract"],
+            "fast_facts": metadata["fast_facts"] if metadata["fast_facts"] else None,
+            "quote": metadata["quote"],
+            "embedding": embedding,
+            "chunk_index": chunk["index"],
+            "token_count": chunk["token_count"],
+            "content_hash": chunk.get("content_hash"),
+        }
+
+    @staticmethod
+    def insert_chunk_rows(rows: List[Dict], page_size: int = CHUNK_INSERT_PAGE_SIZE) -> int:
+        inserted = 0
+
+        for start in range(0, len(rows), page_size):
+            page = rows[start : start + page_size]
+            EmbeddingService._with_retries(
+                lambda: supabase.table("document_chunks").insert(page, returning=ReturnMethod.minimal).execute(),
+                f"insert of {len(page)} chunks"
+            )
+            vector_index.add(page)
+            inserted += len(page)
+
+        return inserted
+
     @staticmethod
     def process_and_store_chunks(
-        report_id: str, content_text: str, report_title: str = ""
+        report_id: str,
+        content: Union[str, Iterable[str]],
+        report_title: str = "",
+        progress_callback: Optional[Callable[[int, Optional[int]], None]] = None
     ) -> int:
         try:
-            chunks = EmbeddingService.chunk_text(content_text, chunk_size=700, overlap=100)
+            # Pages may still be extracting while earlier batches embed, so
+            # the total is only known once the last page has been chunked.
+            pages = [content] if isinstance(content, str) else content
+            chunks = EmbeddingService.chunk_pages(pages)
 
             stored_count = 0
 
-            for chunk in chunks:
-                metadata = EmbeddingService.extract_metadata(chunk["text"], report_title)
+            if progress_callback:
+                progress_callback(0, None)
 
-                embedding = EmbeddingService.generate_embedding(chunk["text"])
+            for batch in EmbeddingService.batch_chunks(chunks):
+                embeddings = EmbeddingService.embed_chunks(batch)
 
-                chunk_data = {
-                    "report_id": report_id,
-                    "company": metadata["company"],
-                    "section": metadata["section"],
-                    "chunk_text": chunk["text"],
-                    "abstract": metadata["abstract"],
-                    "fast_facts": metadata["fast_facts"] if metadata["fast_facts"] else None,
-                    "quote": metadata["quote"],
-                    "embedding": embedding,
-                    "chunk_index": chunk["index"],
-                    "token_count": chunk["token_count"],
-                }
+                rows = [
+                    EmbeddingService.build_chunk_row(report_id, chunk, embedding, report_title)
+                    for chunk, embedding in zip(batch, embeddings)
+                ]
+
+                stored_count += EmbeddingService.insert_chunk_rows(rows)
 
-                result = supabase.table("document_chunks").insert(chunk_data).execute()
+                if progress_callback:
+                    progress_callback(stored_count, None)
 
-                if result.data:
-                    stored_count += 1
+            if progress_callback:
+                progress_callback(stored_count, stored_count)
+
+            vector_index.save()
 
             print(f"Stored {stored_count} chunks for report {report_id}")
             return stored_count
@@ -117,6 +301,137 @@ class EmbeddingService:
             print(f"Error processing chunks: {e}")
             raise
 
+    @staticmethod
+    def plan_reingest(new_chunks: Iterable[Dict], existing_chunks: List[Dict]) -> Dict:
+        # Chunk boundaries follow headings, paragraphs and sentences, so text
+        # that did not change chunks the same way again. Existing rows whose
+        # content hash reappears are kept; everything else is new or obsolete.
+        by_hash: Dict[str, List[Dict]] = {}
+        for chunk in existing_chunks:
+            content_hash = chunk.get("content_hash") or EmbeddingService.chunk_hash(chunk["chunk_text"])
+            by_hash.setdefault(content_hash, []).append(chunk)
+
+        kept = []
+        reindexed = []
+        fresh = []
+
+        for chunk in new_chunks:
+            chunk["content_hash"] = EmbeddingService.chunk_hash(chunk["text"])
+            matches = by_hash.get(chunk["content_hash"])
+
+            if not matches:
+                fresh.append(chunk)
+                continue
+
+            existing = matches.pop(0)
+            kept.append(existing)
+            if existing["chunk_index"] != chunk["index"] or not existing.get("content_hash"):
+                reindexed.append({**existing, "chunk_index": chunk["index"]})
+
+        return {
+            "kept": kept,
+            "reindexed": reindexed,
+            "new": fresh,
+            "obsolete": [chunk for chunks in by_hash.values() for chunk in chunks]
+        }
+
+    @staticmethod
+    def reingest_chunks(
+        report_id: str,
+        content: Union[str, Iterable[str]],
+        report_title: str = "",
+        progress_callback: Optional[Callable[[int, Optional[int]], None]] = None
+    ) -> Dict:
+        try:
+            pages = [content] if isinstance(content, str) else content
+
+            existing_chunks = []
+            start = 0
+            while True:
+                result = EmbeddingService._with_retries(
+                    lambda: supabase.table("document_chunks")
+                    .select("id, chunk_text, chunk_index, token_count, content_hash")
+                    .eq("report_id", report_id)
+                    .order("chunk_index")
+                    .range(start, start + CHUNK_SELECT_PAGE_SIZE - 1)
+                    .execute(),
+                    "load of existing chunks"
+                )
+                existing_chunks.extend(result.data or [])
+                if len(result.data or []) < CHUNK_SELECT_PAGE_SIZE:
+                    break
+                start += CHUNK_SELECT_PAGE_SIZE
+
+            plan = EmbeddingService.plan_reingest(EmbeddingService.chunk_pages(pages), existing_chunks)
+
+            # New rows go in before obsolete ones are removed, so the report is
+            # never missing from search mid-refresh. Re-running after a failure
+            # converges: rows inserted last time now match as kept.
+            embedded = 0
+            if progress_callback:
+                progress_callback(0, len(plan["new"]))
+
+            for batch in EmbeddingService.batch_chunks(plan["new"]):
+                embeddings = EmbeddingService.embed_chunks(batch)
+                rows = [
+                    EmbeddingService.build_chunk_row(report_id, chunk, embedding, report_title)
+                    for chunk, embedding in zip(batch, embeddings)
+                ]
+                embedded += EmbeddingService.insert_chunk_rows(rows)
+
+                if progress_callback:
+                    progress_callback(embedded, len(plan["new"]))
+
+            # Upserting only these columns leaves each kept row's embedding and
+            # metadata as they are.
+            reindex_rows = [
+                {
+                    "id": chunk["id"],
+                    "report_id": report_id,
+                    "chunk_text": chunk["chunk_text"],
+                    "chunk_index": chunk["chunk_index"],
+                    "token_count": chunk["token_count"],
+                    "content_hash": EmbeddingService.chunk_hash(chunk["chunk_text"])
+                }
+                for chunk in plan["reindexed"]
+            ]
+            for start in range(0, len(reindex_rows), CHUNK_INSERT_PAGE_SIZE):
+                page = reindex_rows[start : start + CHUNK_INSERT_PAGE_SIZE]
+                EmbeddingService._with_retries(
+                    lambda: supabase.table("document_chunks").upsert(
+                        page, on_conflict="id", returning=ReturnMethod.minimal
+                    ).execute(),
+                    f"reindex of {len(page)} chunks"
+                )
+
+            obsolete_ids = [chunk["id"] for chunk in plan["obsolete"]]
+            for start in range(0, len(obsolete_ids), CHUNK_INSERT_PAGE_SIZE):
+                page = obsolete_ids[start : start + CHUNK_INSERT_PAGE_SIZE]
+                EmbeddingService._with_retries(
+                    lambda: supabase.table("document_chunks").delete(
+                        returning=ReturnMethod.minimal
+                    ).in_("id", page).execute(),
+                    f"delete of {len(page)} obsolete chunks"
+                )
+            vector_index.remove_chunks(obsolete_ids)
+            vector_index.save()
+
+            stats = {
+                "kept": len(plan["kept"]),
+                "embedded": embedded,
+                "reindexed": len(plan["reindexed"]),
+                "deleted": len(obsolete_ids)
+            }
+            print(
+                f"Re-ingested report {report_id}: kept {stats['kept']}, embedded {stats['embedded']}, "
+                f"reindexed {stats['reindexed']}, deleted {stats['deleted']} chunks"
+            )
+            return stats
+
+        except Exception as e:
+            print(f"Error re-ingesting chunks: {e}")
+            raise
+
     @staticmethod
     def get_chunks_for_report(report_id: str) -> List[Dict]:
         try:
@@ -137,6 +452,105 @@ class EmbeddingService:
     def delete_chunks_for_report(report_id: str) -> bool:
         try:
             result = supabase.table("document_chunks").delete().eq("report_id", report_id).execute()
+            vector_index.remove_report(report_id)
+            return True
+        except Exception as e:
+            print(f"Error deleting chunks: {e}")
+            return False
+
+
+@instrument_service(methods=[
+    "generate_embedding",
+    "embed_query",
+    "match_document_chunks",
+    "get_chunks_for_report",
+    "delete_chunks_for_report"
+])
+class AsyncEmbeddingService:
+
+    _client: Optional[AsyncOpenAI] = None
+
+    @staticmethod
+    def _get_client() -> AsyncOpenAI:
+        if AsyncEmbeddingService._client is None:
+            AsyncEmbeddingService._client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        return AsyncEmbeddingService._client
+
+    @staticmethod
+    async def generate_embedding(text: str, model: str = "text-embedding-3-small") -> List[float]:
+        try:
+            with openai_request(model):
+                response = await AsyncEmbeddingService._get_client().embeddings.create(input=text, model=model)
+            return response.data[0].embedding
+        except Exception as e:
+            print(f"Error generating embedding: {e}")
+            raise
+
+    @staticmethod
+    def normalize_query(text: str) -> str:
+        return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+
+    @staticmethod
+    async def embed_query(text: str, model: str = "text-embedding-3-small") -> List[float]:
+        # Keyed on the normalized text so repeats that differ only in case,
+        # punctuation or spacing reuse the same embedding.
+        cache_key = (model, AsyncEmbeddingService.normalize_query(text))
+
+        embedding = query_embedding_cache.get(cache_key)
+        if embedding is not None:
+            return embedding
+
+        # Report and conversation retrieval embed the same transcript
+        # concurrently; share one request between them.
+        pending = _pending_query_embeddings.get(cache_key)
+        if pending is None:
+            async def embed_and_cache() -> List[float]:
+                # Cached here rather than by the caller, so a result that
+                # lands after the caller's timeout still serves the next turn.
+                result = await AsyncEmbeddingService.generate_embedding(text, model=model)
+                query_embedding_cache.set(cache_key, result)
+                return result
+
+            pending = asyncio.ensure_future(embed_and_cache())
+            _pending_query_embeddings[cache_key] = pending
+            pending.add_done_callback(lambda _: _pending_query_embeddings.pop(cache_key, None))
+
+        return await asyncio.shield(pending)
+
+    @staticmethod
+    async def match_document_chunks(
+        query_embedding: List[float],
+        match_count: int = 5,
+        match_threshold: float = 0.7
+    ) -> List[Dict]:
+        result = await async_supabase.rpc("match_document_chunks", {
+            "query_embedding": query_embedding,
+            "match_count": match_count,
+            "match_threshold": match_threshold
+        }).execute()
+        return result.data if result.data else []
+
+    @staticmethod
+    async def get_chunks_for_report(report_id: str) -> List[Dict]:
+        try:
+            result = await (
+                async_supabase.table("document_chunks")
+                .select("*")
+                .eq("report_id", report_id)
+                .order("chunk_index")
+                .execute()
+            )
+
+            return result.data if result.data else []
+        except Exception as e:
+            print(f"Error fetching chunks: {e}")
+            return []
+
+    @staticmethod
+    async def delete_chunks_for_report(report_id: str) -> bool:
+        try:
+            await async_supabase.table("document_chunks").delete().eq("report_id", report_id).execute()
+            await asyncio.to_thread(vector_index.remove_report, report_id)
             return True
         except Exception as e:
             print(f"Error deleting chunks: {e}")
@@ -0,0 +1,321 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from services.embedding_service import EmbeddingService
+from services.report_service import AsyncReportService
+from utils.file_processor import FileProcessor
+
+INGESTION_QUEUE_SIZE = int(os.getenv("INGESTION_QUEUE_SIZE", "32"))
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", "2"))
+INGESTION_MAX_RETRIES = int(os.getenv("INGESTION_MAX_RETRIES", "3"))
+INGESTION_RETRY_BASE_SECONDS = float(os.getenv("INGESTION_RETRY_BASE_SECONDS", "2"))
+INGESTION_PROGRESS_RETENTION_SECONDS = float(os.getenv("INGESTION_PROGRESS_RETENTION_SECONDS", "3600"))
+INGESTION_PROGRESS_WRITE_SECONDS = float(os.getenv("INGESTION_PROGRESS_WRITE_SECONDS", "1"))
+INGESTION_HEARTBEAT_SECONDS = float(os.getenv("INGESTION_HEARTBEAT_SECONDS", "30"))
+INGESTION_STALE_SECONDS = float(os.getenv("INGESTION_STALE_SECONDS", "120"))
+
+
+class IngestionQueueFull(Exception):
+    pass
+
+
+class IngestionInProgress(Exception):
+    pass
+
+
+class IngestionService:
+
+    def __init__(
+        self,
+        queue_size: int = INGESTION_QUEUE_SIZE,
+        workers: int = INGESTION_WORKERS,
+        max_retries: int = INGESTION_MAX_RETRIES,
+        retry_base_seconds: float = INGESTION_RETRY_BASE_SECONDS
+    ):
+        self.queue_size = queue_size
+        self.workers = workers
+        self.max_retries = max_retries
+        self.retry_base_seconds = retry_base_seconds
+        self.jobs: Dict[str, Dict] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._worker_tasks: List[asyncio.Task] = []
+        self._recovery_task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._worker_tasks:
+            return
+
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        # Ingestion gets its own threads so large uploads never queue ahead
+        # of the voice loop's work on the default executor.
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ingestion")
+        self._worker_tasks = [
+            asyncio.create_task(self._worker()) for _ in range(self.workers)
+        ]
+        self._recovery_task = asyncio.create_task(self._recovery_loop())
+
+    async def stop(self):
+        tasks = self._worker_tasks + ([self._recovery_task] if self._recovery_task else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._worker_tasks = []
+        self._recovery_task = None
+
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+        FileProcessor.shutdown_pool()
+
+    def is_full(self) -> bool:
+        return self._queue is not None and self._queue.full()
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    def submit(
+        self,
+        report_id: str,
+        file_path: str,
+        report_title: str = "",
+        report_file_id: Optional[str] = None,
+        incremental: bool = False
+    ) -> Dict:
+        if self._queue is None:
+            raise RuntimeError("Ingestion service has not been started")
+
+        # One job per report at a time: two jobs would plan against the same
+        # stored chunks and insert duplicates.
+        if self.is_active(report_id):
+            raise IngestionInProgress("This report is still being ingested, try again when it finishes")
+
+        job = {
+            "report_id": report_id,
+            "mode": "incremental" if incremental else "full",
+            "status": "pending",
+            "chunks_embedded": 0,
+            "chunks_total": None,
+            "attempts": 0,
+            "error": None,
+            "updated_at": time.time()
+        }
+
+        try:
+            self._queue.put_nowait((job, file_path, report_title, report_file_id))
+        except asyncio.QueueFull:
+            raise IngestionQueueFull("Ingestion queue is full, try again shortly")
+
+        self._prune_jobs()
+        self.jobs[report_id] = job
+        return job
+
+    async def resume(self, report: Dict, file_path: str, report_file_id: Optional[str] = None) -> bool:
+        # Restarts ingestion of a report no job is working on. A fresh
+        # pending/processing row means a job on another worker owns it.
+        report_id = report["id"]
+        status = report.get("processing_status")
+        if status == "completed" or self.is_active(report_id):
+            return False
+        if status in ("pending", "processing"):
+            updated_at = report.get("updated_at")
+            cutoff = datetime.now(timezone.utc) - timedelta(seconds=INGESTION_STALE_SECONDS)
+            if updated_at and datetime.fromisoformat(updated_at) >= cutoff:
+                return False
+            if updated_at and not await AsyncReportService.claim_report(report_id, updated_at):
+                return False
+
+        try:
+            self.submit(report_id, file_path, report.get("title") or "", report_file_id, incremental=True)
+        except IngestionInProgress:
+            return False
+        return True
+
+    def is_active(self, report_id: str) -> bool:
+        job = self.jobs.get(report_id)
+        return job is not None and job["status"] in ("pending", "processing")
+
+    def get_progress(self, report_id: str) -> Optional[Dict]:
+        job = self.jobs.get(report_id)
+        return dict(job) if job else None
+
+    async def _worker(self):
+        while True:
+            job, file_path, report_title, report_file_id = await self._queue.get()
+            try:
+                await self._run_job(job, file_path, report_title, report_file_id)
+            except Exception as e:
+                print(f"Ingestion worker error for report {job['report_id']}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _recovery_loop(self):
+        # Jobs live in memory, so a restart or crashed worker would leave its
+        # reports pending/processing forever. Live jobs keep their rows fresh;
+        # rows nobody has touched for INGESTION_STALE_SECONDS are re-queued.
+        while True:
+            try:
+                await self._heartbeat()
+                await self.recover_stale_reports()
+            except Exception as e:
+                print(f"Error recovering interrupted ingestions: {e}")
+            await asyncio.sleep(INGESTION_HEARTBEAT_SECONDS)
+
+    async def _heartbeat(self):
+        active = [report_id for report_id in self.jobs if self.is_active(report_id)]
+        if active:
+            await AsyncReportService.touch_reports(active)
+
+    async def recover_stale_reports(self):
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=INGESTION_STALE_SECONDS)
+        stale = await AsyncReportService.get_stale_reports(["pending", "processing"], cutoff.isoformat())
+
+        for report in stale:
+            report_id = report["id"]
+            if self.is_active(report_id) or self.is_full():
+                continue
+            if not await AsyncReportService.claim_report(report_id, report["updated_at"]):
+                continue
+
+            files = await AsyncReportService.get_report_files(report_id)
+            latest = files[0] if files else None
+            if not latest or not os.path.exists(latest["file_path"]):
+                print(f"Marking interrupted ingestion of report {report_id} failed: uploaded file is gone")
+                await AsyncReportService.update_report_status(report_id, "failed")
+                continue
+
+            # Incremental re-planning keeps whatever the interrupted run
+            # already stored instead of duplicating it.
+            print(f"Re-queueing interrupted ingestion of report {report_id}")
+            try:
+                self.submit(report_id, latest["file_path"], report.get("title") or "", latest["id"], incremental=True)
+            except (IngestionQueueFull, IngestionInProgress):
+                pass
+
+    async def _run_job(self, job: Dict, file_path: str, report_title: str, report_file_id: Optional[str]):
+        # Progress is mirrored onto the report row so any worker can answer
+        # GET /api/reports/{id}/progress, not just the one running the job.
+        publisher = asyncio.create_task(self._publish_progress(job))
+        try:
+            await self._ingest(job, file_path, report_title, report_file_id)
+        except Exception as e:
+            # Any failure, status writes included, must end the job so the
+            # report can be submitted again.
+            print(f"Ingestion failed for report {job['report_id']}: {e}")
+            job["error"] = str(e)
+            self._set_status(job, "failed")
+            try:
+                await AsyncReportService.update_report_status(job["report_id"], "failed")
+            except Exception as write_error:
+                print(f"Error marking report {job['report_id']} failed: {write_error}")
+        finally:
+            publisher.cancel()
+            await asyncio.gather(publisher, return_exceptions=True)
+            await self._write_progress(job)
+
+    async def _publish_progress(self, job: Dict):
+        written = None
+        while True:
+            await asyncio.sleep(INGESTION_PROGRESS_WRITE_SECONDS)
+            current = (job["chunks_embedded"], job["chunks_total"])
+            if current != written:
+                await self._write_progress(job)
+                written = current
+
+    async def _write_progress(self, job: Dict):
+        try:
+            await AsyncReportService.update_report(job["report_id"], {
+                "chunks_embedded": job["chunks_embedded"],
+                "chunks_total": job["chunks_total"]
+            })
+        except Exception as e:
+            print(f"Error storing ingestion progress for report {job['report_id']}: {e}")
+
+    async def _ingest(self, job: Dict, file_path: str, report_title: str, report_file_id: Optional[str]):
+        report_id = job["report_id"]
+        loop = asyncio.get_running_loop()
+
+        def on_progress(embedded: int, total: Optional[int]):
+            job["chunks_embedded"] = embedded
+            job["chunks_total"] = total
+            job["updated_at"] = time.time()
+
+        self._set_status(job, "processing")
+        await AsyncReportService.update_report_status(report_id, "processing")
+
+        while True:
+            job["attempts"] += 1
+            pages = []
+
+            def extracted_pages():
+                # Pages flow straight into chunking; a copy is kept so the
+                # full text can be stored with the report file afterwards.
+                for page in FileProcessor.iter_pages(file_path):
+                    if page:
+                        pages.append(page)
+                        yield page
+
+            try:
+                if job["mode"] == "incremental":
+                    job["stats"] = await loop.run_in_executor(
+                        self._executor,
+                        lambda: EmbeddingService.reingest_chunks(
+                            report_id, extracted_pages(), report_title, on_progress
+                        )
+                    )
+                else:
+                    await loop.run_in_executor(
+                        self._executor,
+                        lambda: EmbeddingService.process_and_store_chunks(
+                            report_id, extracted_pages(), report_title, on_progress
+                        )
+                    )
+                break
+            except Exception as e:
+                job["error"] = str(e)
+
+                # Partial batches were already inserted, so clear them to keep
+                # a retry from duplicating chunks. An incremental run keeps the
+                # previous version's chunks and simply re-plans against them.
+                if job["mode"] == "full":
+                    await loop.run_in_executor(
+                        self._executor, EmbeddingService.delete_chunks_for_report, report_id
+                    )
+
+                if job["attempts"] > self.max_retries:
+                    raise
+
+                delay = self.retry_base_seconds * (2 ** (job["attempts"] - 1))
+                print(f"Ingestion attempt {job['attempts']} failed for report {report_id}, retrying in {delay}s: {e}")
+                job["chunks_embedded"] = 0
+                await asyncio.sleep(delay)
+
+        try:
+            if report_file_id:
+                await AsyncReportService.set_report_file_text(report_file_id, "\n\n".join(pages))
+        except Exception as e:
+            print(f"Error storing extracted text for report {report_id}: {e}")
+
+        await AsyncReportService.update_report_status(report_id, "completed")
+        job["error"] = None
+        self._set_status(job, "completed")
+
+    def _set_status(self, job: Dict, status: str):
+        job["status"] = status
+        job["updated_at"] = time.time()
+
+    def _prune_jobs(self):
+        cutoff = time.time() - INGESTION_PROGRESS_RETENTION_SECONDS
+        for report_id in [
+            rid for rid, job in self.jobs.items()
+            if job["status"] in ("completed", "failed") and job["updated_at"] < cutoff
+        ]:
+            del self.jobs[report_id]
+
+
+ingestion_service = IngestionService()
@@ -0,0 +1,169 @@
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from services.conversation_service import AsyncConversationService
+
+MESSAGE_WRITER_BATCH_SIZE = int(os.getenv("MESSAGE_WRITER_BATCH_SIZE", "50"))
+MESSAGE_WRITER_FLUSH_SECONDS = float(os.getenv("MESSAGE_WRITER_FLUSH_SECONDS", "0.3"))
+MESSAGE_WRITER_MAX_RETRIES = int(os.getenv("MESSAGE_WRITER_MAX_RETRIES", "5"))
+MESSAGE_WRITER_RETRY_BASE_SECONDS = float(os.getenv("MESSAGE_WRITER_RETRY_BASE_SECONDS", "0.5"))
+
+# SQLSTATE classes PostgREST answers with a 4xx: data exceptions, integrity
+# violations (e.g. a foreign key to a deleted conversation) and
+# syntax/permission errors. PGRST1xx/2xx are PostgREST's own request errors.
+PERMANENT_ERROR_PREFIXES = ("22", "23", "42", "PGRST1", "PGRST2")
+
+
+def is_permanent_error(error: Exception) -> bool:
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None)
+    if isinstance(status, int):
+        return 400 <= status < 500 and status not in (408, 429)
+
+    code = getattr(error, "code", None)
+    return isinstance(code, str) and code.startswith(PERMANENT_ERROR_PREFIXES)
+
+
+class MessageWriter:
+
+    def __init__(
+        self,
+        batch_size: int = MESSAGE_WRITER_BATCH_SIZE,
+        flush_seconds: float = MESSAGE_WRITER_FLUSH_SECONDS,
+        max_retries: int = MESSAGE_WRITER_MAX_RETRIES,
+        retry_base_seconds: float = MESSAGE_WRITER_RETRY_BASE_SECONDS
+    ):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_retries = max_retries
+        self.retry_base_seconds = retry_base_seconds
+        self.written = 0
+        self.failed = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._writer is not None:
+            return
+
+        self._queue = asyncio.Queue()
+        self._writer = asyncio.create_task(self._write_behind())
+
+    async def stop(self):
+        if self._writer is None:
+            return
+
+        await self.flush()
+        self._writer.cancel()
+        await asyncio.gather(self._writer, return_exceptions=True)
+        self._writer = None
+        self._queue = None
+
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    def enqueue(self, conversation_id: str, role: str, content: str, audio_url: Optional[str] = None):
+        if self._queue is None:
+            raise RuntimeError("Message writer has not been started")
+
+        # The timestamp is taken here, so rows keep the order they were
+        # enqueued in no matter how they are batched.
+        self._queue.put_nowait({
+            "conversation_id": conversation_id,
+            "role": role,
+            "content": content,
+            "audio_url": audio_url,
+            "timestamp": datetime.utcnow().isoformat()
+        })
+
+    async def flush(self):
+        # Nothing would ever resolve the marker without a running writer.
+        if self._queue is None or self._writer is None:
+            return
+
+        # Everything enqueued before the marker is written before it resolves.
+        marker = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(marker)
+        await marker
+
+    async def _write_behind(self):
+        while True:
+            batch: List[Dict] = []
+            markers: List[asyncio.Future] = []
+
+            item = await self._queue.get()
+            deadline = time.monotonic() + self.flush_seconds
+
+            while True:
+                if isinstance(item, asyncio.Future):
+                    markers.append(item)
+                    break
+
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                await self._write(batch)
+            finally:
+                for marker in markers:
+                    if not marker.done():
+                        marker.set_result(None)
+
+    async def _write(self, batch: List[Dict]):
+        if not batch:
+            return
+
+        error = await self._insert(batch)
+        if error is None:
+            return
+
+        conversations: Dict[str, List[Dict]] = {}
+        for row in batch:
+            conversations.setdefault(row["conversation_id"], []).append(row)
+
+        if not is_permanent_error(error) or len(conversations) == 1:
+            self._drop(batch, error)
+            return
+
+        # One bad row (e.g. a conversation deleted mid-session) rejects the
+        # whole bulk insert; write each conversation on its own so only the
+        # offending one loses its messages.
+        for rows in conversations.values():
+            error = await self._insert(rows)
+            if error is not None:
+                self._drop(rows, error)
+
+    async def _insert(self, rows: List[Dict]) -> Optional[Exception]:
+        # A single writer retries a batch before taking the next one, which
+        # keeps every conversation's messages in order.
+        for attempt in range(self.max_retries + 1):
+            try:
+                await AsyncConversationService.add_messages(rows)
+                self.written += len(rows)
+                return None
+            except Exception as e:
+                if attempt == self.max_retries or is_permanent_error(e):
+                    return e
+                delay = self.retry_base_seconds * (2 ** attempt)
+                print(f"Error writing {len(rows)} messages, retrying in {delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
+
+    def _drop(self, rows: List[Dict], error: Exception):
+        self.failed += len(rows)
+        conversation_ids = sorted({row["conversation_id"] for row in rows})
+        print(f"Dropping {len(rows)} messages for conversations {conversation_ids}: {error}")
+
+
+message_writer = MessageWriter()
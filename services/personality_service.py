@@ -1,7 +1,12 @@
 from typing import List, Optional, Dict
 from datetime import datetime
-from db_client import supabase
+from db_client import supabase, async_supabase
+from utils.config_cache import config_cache
+from utils.metrics import instrument_service
 
+ACTIVE_PERSONALITY_KEY = "personality_config:active"
+
+@instrument_service
 class PersonalityService:
 
     @staticmethod
@@ -25,10 +30,15 @@ class PersonalityService:
         }
 
         result = supabase.table("personality_config").insert(data).execute()
+        config_cache.invalidate("personality_config")
         return result.data[0] if result.data else None
 
     @staticmethod
     def get_active_personality() -> Optional[Dict]:
+        return config_cache.get(ACTIVE_PERSONALITY_KEY, PersonalityService._fetch_active_personality)
+
+    @staticmethod
+    def _fetch_active_personality() -> Optional[Dict]:
         result = supabase.table("personality_config").select("*").eq("is_active", True).maybeSingle().execute()
         return result.data
 
@@ -45,6 +55,7 @@ class PersonalityService:
     @staticmethod
     def update_personality(personality_id: str, updates: Dict) -> Dict:
         result = supabase.table("personality_config").update(updates).eq("id", personality_id).execute()
+        config_cache.invalidate("personality_config")
         return result.data[0] if result.data else None
 
     @staticmethod
@@ -52,6 +63,7 @@ class PersonalityService:
         PersonalityService._deactivate_all_personalities()
 
         result = supabase.table("personality_config").update({"is_active": True}).eq("id", personality_id).execute()
+        config_cache.invalidate("personality_config")
         return result.data[0] if result.data else None
 
     @staticmethod
@@ -61,6 +73,7 @@ class PersonalityService:
     @staticmethod
     def delete_personality(personality_id: str) -> bool:
         result = supabase.table("personality_config").delete().eq("id", personality_id).execute()
+        config_cache.invalidate("personality_config")
         return len(result.data) > 0 if result.data else False
 
     @staticmethod
@@ -74,4 +87,90 @@ class PersonalityService:
         updates["version"] = new_version
 
         result = supabase.table("personality_config").update(updates).eq("id", personality_id).execute()
+        config_cache.invalidate("personality_config")
+        return result.data[0] if result.data else None
+
+
+@instrument_service
+class AsyncPersonalityService:
+
+    @staticmethod
+    async def create_personality(
+        name: str,
+        instructions: str,
+        speaking_style: Optional[Dict] = None,
+        knowledge_domains: Optional[List[str]] = None,
+        is_active: bool = False
+    ) -> Dict:
+        if is_active:
+            await AsyncPersonalityService._deactivate_all_personalities()
+
+        data = {
+            "name": name,
+            "instructions": instructions,
+            "speaking_style": speaking_style,
+            "knowledge_domains": knowledge_domains or [],
+            "is_active": is_active,
+            "version": 1
+        }
+
+        result = await async_supabase.table("personality_config").insert(data).execute()
+        config_cache.invalidate("personality_config")
+        return result.data[0] if result.data else None
+
+    @staticmethod
+    async def get_active_personality() -> Optional[Dict]:
+        return await config_cache.aget(ACTIVE_PERSONALITY_KEY, AsyncPersonalityService._fetch_active_personality)
+
+    @staticmethod
+    async def _fetch_active_personality() -> Optional[Dict]:
+        result = await async_supabase.table("personality_config").select("*").eq("is_active", True).maybe_single().execute()
+        return result.data if result else None
+
+    @staticmethod
+    async def get_all_personalities() -> List[Dict]:
+        result = await async_supabase.table("personality_config").select("*").order("created_at", desc=True).execute()
+        return result.data if result.data else []
+
+    @staticmethod
+    async def get_personality_by_id(personality_id: str) -> Optional[Dict]:
+        result = await async_supabase.table("personality_config").select("*").eq("id", personality_id).maybe_single().execute()
+        return result.data if result else None
+
+    @staticmethod
+    async def update_personality(personality_id: str, updates: Dict) -> Dict:
+        result = await async_supabase.table("personality_config").update(updates).eq("id", personality_id).execute()
+        config_cache.invalidate("personality_config")
+        return result.data[0] if result.data else None
+
+    @staticmethod
+    async def activate_personality(personality_id: str) -> Dict:
+        await AsyncPersonalityService._deactivate_all_personalities()
+
+        result = await async_supabase.table("personality_config").update({"is_active": True}).eq("id", personality_id).execute()
+        config_cache.invalidate("personality_config")
+        return result.data[0] if result.data else None
+
+    @staticmethod
+    async def _deactivate_all_personalities():
+        await async_supabase.table("personality_config").update({"is_active": False}).eq("is_active", True).execute()
+
+    @staticmethod
+    async def delete_personality(personality_id: str) -> bool:
+        result = await async_supabase.table("personality_config").delete().eq("id", personality_id).execute()
+        config_cache.invalidate("personality_config")
+        return len(result.data) > 0 if result.data else False
+
+    @staticmethod
+    async def create_personality_version(personality_id: str, updates: Dict) -> Dict:
+        current = await AsyncPersonalityService.get_personality_by_id(personality_id)
+
+        if not current:
+            raise ValueError(f"Personality {personality_id} not found")
+
+        new_version = current.get("version", 1) + 1
+        updates["version"] = new_version
+
+        result = await async_supabase.table("personality_config").update(updates).eq("id", personality_id).execute()
+        config_cache.invalidate("personality_config")
         return result.data[0] if result.data else None
@@ -1,7 +1,13 @@
 from typing import List, Optional, Dict
 from datetime import datetime
-from db_client import supabase
+from db_client import supabase, async_supabase
+from utils.config_cache import config_cache
+from utils.metrics import instrument_service
 
+REFERENCE_FREQUENCY_KEY = "system_settings:reference_frequency"
+MAX_CONTEXT_CONVERSATIONS_KEY = "system_settings:max_context_conversations"
+
+@instrument_service
 class ReferenceService:
 
     @staticmethod
@@ -32,6 +38,10 @@ class ReferenceService:
 
     @staticmethod
     def get_reference_frequency_setting() -> Dict:
+        return config_cache.get(REFERENCE_FREQUENCY_KEY, ReferenceService._fetch_reference_frequency_setting)
+
+    @staticmethod
+    def _fetch_reference_frequency_setting() -> Dict:
         result = supabase.table("system_settings").select("value").eq("key", "reference_frequency").maybeSingle().execute()
 
         if result.data:
@@ -55,10 +65,15 @@ class ReferenceService:
         }
 
         result = supabase.table("system_settings").update({"value": data}).eq("key", "reference_frequency").execute()
+        config_cache.invalidate(REFERENCE_FREQUENCY_KEY)
         return result.data[0] if result.data else None
 
     @staticmethod
     def get_max_context_conversations() -> int:
+        return config_cache.get(MAX_CONTEXT_CONVERSATIONS_KEY, ReferenceService._fetch_max_context_conversations)
+
+    @staticmethod
+    def _fetch_max_context_conversations() -> int:
         result = supabase.table("system_settings").select("value").eq("key", "max_context_conversations").maybeSingle().execute()
 
         if result.data:
@@ -74,23 +89,27 @@ class ReferenceService:
         data = {"count": count}
 
         result = supabase.table("system_settings").update({"value": data}).eq("key", "max_context_conversations").execute()
+        config_cache.invalidate(MAX_CONTEXT_CONVERSATIONS_KEY)
         return result.data[0] if result.data else None
 
     @staticmethod
     def get_reference_stats() -> Dict:
         all_refs = supabase.table("conversation_references").select("referenced_conversation_id").execute()
+        return ReferenceService._summarize_references(all_refs.data)
 
+    @staticmethod
+    def _summarize_references(references: Optional[List[Dict]]) -> Dict:
         stats = {
             "total_references": 0,
             "unique_conversations_referenced": 0,
             "most_referenced": []
         }
 
-        if all_refs.data:
-            stats["total_references"] = len(all_refs.data)
+        if references:
+            stats["total_references"] = len(references)
 
             ref_counts = {}
-            for ref in all_refs.data:
+            for ref in references:
                 conv_id = ref["referenced_conversation_id"]
                 ref_counts[conv_id] = ref_counts.get(conv_id, 0) + 1
 
@@ -103,3 +122,94 @@ class ReferenceService:
             ]
 
         return stats
+
+
+@instrument_service
+class AsyncReferenceService:
+
+    @staticmethod
+    async def add_reference(
+        source_conversation_id: str,
+        referenced_conversation_id: str,
+        reference_text: str
+    ) -> Dict:
+        data = {
+            "source_conversation_id": source_conversation_id,
+            "referenced_conversation_id": referenced_conversation_id,
+            "reference_text": reference_text,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+
+        result = await async_supabase.table("conversation_references").insert(data).execute()
+        return result.data[0] if result.data else None
+
+    @staticmethod
+    async def get_references_for_conversation(conversation_id: str) -> List[Dict]:
+        result = await async_supabase.table("conversation_references").select("*").eq("source_conversation_id", conversation_id).execute()
+        return result.data if result.data else []
+
+    @staticmethod
+    async def get_conversations_that_reference(conversation_id: str) -> List[Dict]:
+        result = await async_supabase.table("conversation_references").select("*").eq("referenced_conversation_id", conversation_id).execute()
+        return result.data if result.data else []
+
+    @staticmethod
+    async def get_reference_frequency_setting() -> Dict:
+        return await config_cache.aget(REFERENCE_FREQUENCY_KEY, AsyncReferenceService._fetch_reference_frequency_setting)
+
+    @staticmethod
+    async def _fetch_reference_frequency_setting() -> Dict:
+        result = await async_supabase.table("system_settings").select("value").eq("key", "reference_frequency").maybe_single().execute()
+
+        if result and result.data:
+            return result.data["value"]
+
+        return {"level": "sometimes", "weight": 0.5}
+
+    @staticmethod
+    async def update_reference_frequency(level: str, weight: float) -> Dict:
+        valid_levels = ["never", "rarely", "sometimes", "often", "always"]
+
+        if level not in valid_levels:
+            raise ValueError(f"Invalid level. Must be one of: {', '.join(valid_levels)}")
+
+        if not 0 <= weight <= 1:
+            raise ValueError("Weight must be between 0 and 1")
+
+        data = {
+            "level": level,
+            "weight": weight
+        }
+
+        result = await async_supabase.table("system_settings").update({"value": data}).eq("key", "reference_frequency").execute()
+        config_cache.invalidate(REFERENCE_FREQUENCY_KEY)
+        return result.data[0] if result.data else None
+
+    @staticmethod
+    async def get_max_context_conversations() -> int:
+        return await config_cache.aget(MAX_CONTEXT_CONVERSATIONS_KEY, AsyncReferenceService._fetch_max_context_conversations)
+
+    @staticmethod
+    async def _fetch_max_context_conversations() -> int:
+        result = await async_supabase.table("system_settings").select("value").eq("key", "max_context_conversations").maybe_single().execute()
+
+        if result and result.data:
+            return result.data["value"].get("count", 5)
+
+        return 5
+
+    @staticmethod
+    async def update_max_context_conversations(count: int) -> Dict:
+        if count < 0:
+            raise ValueError("Count must be non-negative")
+
+        data = {"count": count}
+
+        result = await async_supabase.table("system_settings").update({"value": data}).eq("key", "max_context_conversations").execute()
+        config_cache.invalidate(MAX_CONTEXT_CONVERSATIONS_KEY)
+        return result.data[0] if result.data else None
+
+    @staticmethod
+    async def get_reference_stats() -> Dict:
+        all_refs = await async_supabase.table("conversation_references").select("referenced_conversation_id").execute()
+        return ReferenceService._summarize_references(all_refs.data)
@@ -2,8 +2,13 @@ from typing import List, Optional, Dict
 from datetime import datetime
 import os
 from pathlib import Path
-from db_client import supabase
+from postgrest.types import ReturnMethod
+from db_client import supabase, async_supabase
+from utils.vector_index import vector_index
+import asyncio
+from utils.metrics import instrument_service
 
+@instrument_service
 class ReportService:
 
     @staticmethod
@@ -34,18 +39,30 @@ class ReportService:
         report_id: str,
         file_path: str,
         content_text: Optional[str] = None,
-        version: int = 1
+        version: int = 1,
+        content_hash: Optional[str] = None
     ) -> Dict:
         data = {
             "report_id": report_id,
             "file_path": file_path,
             "content_text": content_text,
-            "version": version
+            "version": version,
+            "content_hash": content_hash
         }
 
         result = supabase.table("report_files").insert(data).execute()
         return result.data[0] if result.data else None
 
+    @staticmethod
+    def delete_report_file(report_file_id: str):
+        supabase.table("report_files").delete(returning=ReturnMethod.minimal).eq("id", report_file_id).execute()
+
+    @staticmethod
+    def set_report_file_text(report_file_id: str, content_text: str):
+        supabase.table("report_files").update(
+            {"content_text": content_text}, returning=ReturnMethod.minimal
+        ).eq("id", report_file_id).execute()
+
     @staticmethod
     def update_report_status(report_id: str, status: str) -> Dict:
         result = supabase.table("reports").update({"processing_status": status}).eq("id", report_id).execute()
@@ -66,6 +83,11 @@ class ReportService:
         result = supabase.table("report_files").select("*").eq("report_id", report_id).order("version", desc=True).execute()
         return result.data if result.data else []
 
+    @staticmethod
+    def get_report_file_by_hash(content_hash: str) -> Optional[Dict]:
+        result = supabase.table("report_files").select("*").eq("content_hash", content_hash).order("created_at").limit(1).execute()
+        return result.data[0] if result.data else None
+
     @staticmethod
     def search_reports(query: str, limit: int = 20) -> List[Dict]:
         result = supabase.table("reports").select("*").or_(f"title.ilike.%{query}%,description.ilike.%{query}%").order("upload_date", desc=True).limit(limit).execute()
@@ -79,6 +101,7 @@ class ReportService:
     @staticmethod
     def delete_report(report_id: str) -> bool:
         result = supabase.table("reports").delete().eq("id", report_id).execute()
+        vector_index.remove_report(report_id)
         return len(result.data) > 0 if result.data else False
 
     @staticmethod
@@ -111,3 +134,153 @@ class ReportService:
                     stats[status] += 1
 
         return stats
+
+
+@instrument_service
+class AsyncReportService:
+
+    @staticmethod
+    async def create_report(
+        title: str,
+        file_type: str,
+        file_size_bytes: int,
+        description: Optional[str] = None,
+        tags: Optional[List[str]] = None,
+        openai_file_id: Optional[str] = None
+    ) -> Dict:
+        data = {
+            "title": title,
+            "description": description,
+            "file_type": file_type,
+            "file_size_bytes": file_size_bytes,
+            "upload_date": datetime.utcnow().isoformat(),
+            "tags": tags or [],
+            "openai_file_id": openai_file_id,
+            "processing_status": "pending"
+        }
+
+        result = await async_supabase.table("reports").insert(data).execute()
+        return result.data[0] if result.data else None
+
+    @staticmethod
+    async def create_report_file(
+        report_id: str,
+        file_path: str,
+        content_text: Optional[str] = None,
+        version: int = 1,
+        content_hash: Optional[str] = None
+    ) -> Dict:
+        data = {
+            "report_id": report_id,
+            "file_path": file_path,
+            "content_text": content_text,
+            "version": version,
+            "content_hash": content_hash
+        }
+
+        result = await async_supabase.table("report_files").insert(data).execute()
+        return result.data[0] if result.data else None
+
+    @staticmethod
+    async def delete_report_file(report_file_id: str):
+        await async_supabase.table("report_files").delete(returning=ReturnMethod.minimal).eq("id", report_file_id).execute()
+
+    @staticmethod
+    async def set_report_file_text(report_file_id: str, content_text: str):
+        await async_supabase.table("report_files").update(
+            {"content_text": content_text}, returning=ReturnMethod.minimal
+        ).eq("id", report_file_id).execute()
+
+    @staticmethod
+    async def update_report_status(report_id: str, status: str) -> Dict:
+        result = await async_supabase.table("reports").update({"processing_status": status}).eq("id", report_id).execute()
+        return result.data[0] if result.data else None
+
+    @staticmethod
+    async def get_stale_reports(statuses: List[str], updated_before: str) -> List[Dict]:
+        result = await async_supabase.table("reports").select("id, title, processing_status, updated_at").in_(
+            "processing_status", statuses
+        ).lt("updated_at", updated_before).execute()
+        return result.data if result.data else []
+
+    @staticmethod
+    async def claim_report(report_id: str, updated_at: str) -> bool:
+        # The updated_at trigger makes this a compare-and-set: only one
+        # worker's update can still match the timestamp it read.
+        result = await async_supabase.table("reports").update({"processing_status": "pending"}).eq(
+            "id", report_id
+        ).eq("updated_at", updated_at).execute()
+        return bool(result.data)
+
+    @staticmethod
+    async def touch_reports(report_ids: List[str]):
+        await async_supabase.table("reports").update(
+            {"updated_at": datetime.utcnow().isoformat()}, returning=ReturnMethod.minimal
+        ).in_("id", report_ids).execute()
+
+    @staticmethod
+    async def get_all_reports(limit: int = 50) -> List[Dict]:
+        result = await async_supabase.table("reports").select("*").order("upload_date", desc=True).limit(limit).execute()
+        return result.data if result.data else []
+
+    @staticmethod
+    async def get_report_by_id(report_id: str) -> Optional[Dict]:
+        result = await async_supabase.table("reports").select("*").eq("id", report_id).maybe_single().execute()
+        return result.data if result else None
+
+    @staticmethod
+    async def get_report_files(report_id: str) -> List[Dict]:
+        result = await async_supabase.table("report_files").select("*").eq("report_id", report_id).order("version", desc=True).execute()
+        return result.data if result.data else []
+
+    @staticmethod
+    async def get_report_file_by_hash(content_hash: str) -> Optional[Dict]:
+        result = await async_supabase.table("report_files").select("*").eq("content_hash", content_hash).order("created_at").limit(1).execute()
+        return result.data[0] if result.data else None
+
+    @staticmethod
+    async def search_reports(query: str, limit: int = 20) -> List[Dict]:
+        result = await async_supabase.table("reports").select("*").or_(f"title.ilike.%{query}%,description.ilike.%{query}%").order("upload_date", desc=True).limit(limit).execute()
+        return result.data if result.data else []
+
+    @staticmethod
+    async def get_reports_by_tags(tags: List[str], limit: int = 20) -> List[Dict]:
+        result = await async_supabase.table("reports").select("*").contains("tags", tags).order("upload_date", desc=True).limit(limit).execute()
+        return result.data if result.data else []
+
+    @staticmethod
+    async def delete_report(report_id: str) -> bool:
+        result = await async_supabase.table("reports").delete().eq("id", report_id).execute()
+        await asyncio.to_thread(vector_index.remove_report, report_id)
+        return len(result.data) > 0 if result.data else False
+
+    @staticmethod
+    async def update_report(report_id: str, updates: Dict) -> Dict:
+        result = await async_supabase.table("reports").update(updates).eq("id", report_id).execute()
+        return result.data[0] if result.data else None
+
+    @staticmethod
+    async def get_reports_by_type(file_type: str, limit: int = 20) -> List[Dict]:
+        result = await async_supabase.table("reports").select("*").eq("file_type", file_type).order("upload_date", desc=True).limit(limit).execute()
+        return result.data if result.data else []
+
+    @staticmethod
+    async def get_processing_stats() -> Dict:
+        all_reports = await async_supabase.table("reports").select("processing_status").execute()
+
+        stats = {
+            "total": 0,
+            "pending": 0,
+            "processing": 0,
+            "completed": 0,
+            "failed": 0
+        }
+
+        if all_reports.data:
+            stats["total"] = len(all_reports.data)
+            for report in all_reports.data:
+                status = report.get("processing_status", "pending")
+                if status in stats:
+                    stats[status] += 1
+
+        return stats
@@ -0,0 +1,203 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from postgrest.types import ReturnMethod
+
+from db_client import async_supabase
+from utils.lru_cache import LRUCache
+
+SESSION_STORE = os.getenv("SESSION_STORE", "memory").lower()
+SESSION_STORE_PATH = os.getenv("SESSION_STORE_PATH", "sessions.sqlite3")
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "7200"))
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "1024"))
+SESSION_CACHE_TTL_SECONDS = float(os.getenv("SESSION_CACHE_TTL_SECONDS", "30"))
+SESSION_CLEANUP_INTERVAL_SECONDS = float(os.getenv("SESSION_CLEANUP_INTERVAL_SECONDS", "600"))
+
+# A session state is a plain dict:
+#   {"session_id", "conversation_id", "summary", "messages", "revision"}
+
+
+class MemorySessionBackend:
+
+    def __init__(self):
+        self._sessions: Dict[str, tuple] = {}
+
+    async def load(self, session_id: str) -> Optional[Dict]:
+        entry = self._sessions.get(session_id)
+        if entry is None or entry[0] <= time.time():
+            return None
+        return entry[1]
+
+    async def save(self, session_id: str, state: Dict, ttl_seconds: int):
+        self._sessions[session_id] = (time.time() + ttl_seconds, state)
+
+    async def delete(self, session_id: str):
+        self._sessions.pop(session_id, None)
+
+    async def cleanup_expired(self):
+        now = time.time()
+        for session_id in [key for key, entry in self._sessions.items() if entry[0] <= now]:
+            del self._sessions[session_id]
+
+
+class SQLiteSessionBackend:
+
+    def __init__(self, path: str = SESSION_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        # WAL lets several worker processes on one host share the file.
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA busy_timeout=5000")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS session_state ("
+            "session_id TEXT PRIMARY KEY, state TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def _execute(self, sql: str, parameters: tuple = ()):
+        with self._lock:
+            return self._connection.execute(sql, parameters).fetchone()
+
+    async def load(self, session_id: str) -> Optional[Dict]:
+        row = await asyncio.to_thread(
+            self._execute,
+            "SELECT state FROM session_state WHERE session_id = ? AND expires_at > ?",
+            (session_id, time.time())
+        )
+        return json.loads(row[0]) if row else None
+
+    async def save(self, session_id: str, state: Dict, ttl_seconds: int):
+        await asyncio.to_thread(
+            self._execute,
+            "INSERT INTO session_state (session_id, state, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(session_id) DO UPDATE SET state = excluded.state, expires_at = excluded.expires_at",
+            (session_id, json.dumps(state), time.time() + ttl_seconds)
+        )
+
+    async def delete(self, session_id: str):
+        await asyncio.to_thread(self._execute, "DELETE FROM session_state WHERE session_id = ?", (session_id,))
+
+    async def cleanup_expired(self):
+        await asyncio.to_thread(self._execute, "DELETE FROM session_state WHERE expires_at <= ?", (time.time(),))
+
+
+class SupabaseSessionBackend:
+
+    async def load(self, session_id: str) -> Optional[Dict]:
+        result = await async_supabase.table("session_state").select(
+            "session_id, conversation_id, summary, recent_turns, revision"
+        ).eq("session_id", session_id).gt("expires_at", datetime.now(timezone.utc).isoformat()).maybe_single().execute()
+
+        row = result.data if result else None
+        if not row:
+            return None
+
+        return {
+            "session_id": row["session_id"],
+            "conversation_id": row.get("conversation_id"),
+            "summary": row.get("summary") or "",
+            "messages": row.get("recent_turns") or [],
+            "revision": row.get("revision") or 0
+        }
+
+    async def save(self, session_id: str, state: Dict, ttl_seconds: int):
+        await async_supabase.table("session_state").upsert({
+            "session_id": session_id,
+            "conversation_id": state.get("conversation_id"),
+            "summary": state.get("summary", ""),
+            "recent_turns": state.get("messages", []),
+            "revision": state.get("revision", 0),
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+            "expires_at": (datetime.now(timezone.utc) + timedelta(seconds=ttl_seconds)).isoformat()
+        }, on_conflict="session_id", returning=ReturnMethod.minimal).execute()
+
+    async def delete(self, session_id: str):
+        await async_supabase.table("session_state").delete(
+            returning=ReturnMethod.minimal
+        ).eq("session_id", session_id).execute()
+
+    async def cleanup_expired(self):
+        await async_supabase.rpc("cleanup_expired_sessions", {}).execute()
+
+
+class SessionStore:
+
+    def __init__(self, backend, ttl_seconds: int = SESSION_TTL_SECONDS):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        # Write-through: every save updates the local copy and the backend,
+        # so reads on this worker rarely leave the process.
+        self._cache = LRUCache(max_size=SESSION_CACHE_SIZE, ttl_seconds=SESSION_CACHE_TTL_SECONDS)
+        self._cleanup_task: Optional[asyncio.Task] = None
+
+    async def load(self, session_id: str, fresh: bool = False) -> Optional[Dict]:
+        if not fresh:
+            state = self._cache.get(session_id)
+            if state is not None:
+                return state
+
+        try:
+            state = await self.backend.load(session_id)
+        except Exception as e:
+            print(f"Error loading session {session_id}: {e}")
+            return None
+
+        if state is not None:
+            self._cache.set(session_id, state)
+        return state
+
+    async def save(self, session_id: str, state: Dict):
+        cached = self._cache.get(session_id)
+        if cached is not None and cached.get("revision", 0) > state.get("revision", 0):
+            # A newer turn was already written; never move the session back.
+            return
+
+        self._cache.set(session_id, state)
+        try:
+            await self.backend.save(session_id, state, self.ttl_seconds)
+        except Exception as e:
+            print(f"Error saving session {session_id}: {e}")
+
+    async def delete(self, session_id: str):
+        self._cache.delete(session_id)
+        try:
+            await self.backend.delete(session_id)
+        except Exception as e:
+            print(f"Error deleting session {session_id}: {e}")
+
+    def start(self):
+        if self._cleanup_task is None:
+            self._cleanup_task = asyncio.create_task(self._cleanup_periodically())
+
+    async def stop(self):
+        if self._cleanup_task is not None:
+            self._cleanup_task.cancel()
+            await asyncio.gather(self._cleanup_task, return_exceptions=True)
+            self._cleanup_task = None
+
+    async def _cleanup_periodically(self):
+        while True:
+            await asyncio.sleep(SESSION_CLEANUP_INTERVAL_SECONDS)
+            try:
+                await self.backend.cleanup_expired()
+            except Exception as e:
+                print(f"Error cleaning up expired sessions: {e}")
+
+
+def create_session_store(kind: str = SESSION_STORE) -> SessionStore:
+    if kind == "sqlite":
+        return SessionStore(SQLiteSessionBackend())
+    if kind == "supabase":
+        return SessionStore(SupabaseSessionBackend())
+    if kind != "memory":
+        print(f"Unknown SESSION_STORE '{kind}', using the in-process store")
+    return SessionStore(MemorySessionBackend())
+
+
+session_store = create_session_store()
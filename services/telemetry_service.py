@@ -0,0 +1,201 @@
+import asyncio
+import os
+import time
+from bisect import bisect_right
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from postgrest.types import ReturnMethod
+
+from db_client import async_supabase
+
+TELEMETRY_ENABLED = os.getenv("TELEMETRY_ENABLED", "true").lower() == "true"
+TELEMETRY_BATCH_SIZE = int(os.getenv("TELEMETRY_BATCH_SIZE", "50"))
+TELEMETRY_FLUSH_SECONDS = float(os.getenv("TELEMETRY_FLUSH_SECONDS", "5"))
+TELEMETRY_QUEUE_SIZE = int(os.getenv("TELEMETRY_QUEUE_SIZE", "1000"))
+TELEMETRY_WINDOW_SIZE = int(os.getenv("TELEMETRY_WINDOW_SIZE", "1000"))
+
+LATENCY_STAGES = ["stt_ms", "context_ms", "llm_first_token_ms", "tts_first_byte_ms", "first_audio_ms", "turn_ms"]
+
+HISTOGRAM_BUCKETS_MS = [50, 100, 250, 500, 750, 1000, 1500, 2000, 3000, 5000, 10000]
+
+
+class TurnTimer:
+
+    def __init__(self, session_id: str, conversation_id: Optional[str] = None):
+        self.session_id = session_id
+        self.conversation_id = conversation_id
+        self.turn_number = 0
+        self.marks: Dict[str, float] = {}
+
+    def mark(self, name: str, at: Optional[float] = None):
+        # Only the first occurrence counts, so "first token" stays first.
+        self.marks.setdefault(name, at if at is not None else time.perf_counter())
+
+    def _between(self, start: str, end: str) -> Optional[int]:
+        if start not in self.marks or end not in self.marks:
+            return None
+        # Speculation can finish a stage before the user stops talking;
+        # those stages cost the turn nothing.
+        return max(0, round((self.marks[end] - self.marks[start]) * 1000))
+
+    def stages(self) -> Dict[str, Optional[int]]:
+        return {
+            "stt_ms": self._between("audio_received", "stt_done"),
+            "context_ms": self._between("stt_done", "context_built"),
+            "llm_first_token_ms": self._between("context_built", "llm_first_token"),
+            "tts_first_byte_ms": self._between("llm_first_token", "tts_first_byte"),
+            "first_audio_ms": self._between("audio_received", "tts_first_byte"),
+            "turn_ms": self._between("audio_received", "turn_complete")
+        }
+
+    def to_row(self) -> Dict:
+        stages = self.stages()
+        return {
+            "session_id": self.session_id,
+            "conversation_id": self.conversation_id,
+            "turn_number": self.turn_number,
+            "stt_endpoint_ms": stages["stt_ms"],
+            "context_ms": stages["context_ms"],
+            "llm_first_token_ms": stages["llm_first_token_ms"],
+            "tts_first_frame_ms": stages["tts_first_byte_ms"],
+            "total_latency_ms": stages["first_audio_ms"],
+            "turn_complete_ms": stages["turn_ms"]
+        }
+
+
+class RollingHistogram:
+
+    def __init__(self, window_size: int = TELEMETRY_WINDOW_SIZE, buckets: List[int] = HISTOGRAM_BUCKETS_MS):
+        self.buckets = buckets
+        self.samples: Dict[str, Deque[int]] = {
+            stage: deque(maxlen=window_size) for stage in LATENCY_STAGES
+        }
+
+    def add(self, stages: Dict[str, Optional[int]]):
+        for stage, value in stages.items():
+            if value is not None and stage in self.samples:
+                self.samples[stage].append(value)
+
+    @staticmethod
+    def _percentile(ordered: List[int], fraction: float) -> int:
+        index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+        return ordered[index]
+
+    def summary(self) -> Dict[str, Dict]:
+        result = {}
+
+        for stage, samples in self.samples.items():
+            ordered = sorted(samples)
+            if not ordered:
+                result[stage] = {"count": 0}
+                continue
+
+            counts = {f"le_{bound}": bisect_right(ordered, bound) for bound in self.buckets}
+            counts["le_inf"] = len(ordered)
+
+            result[stage] = {
+                "count": len(ordered),
+                "mean": round(sum(ordered) / len(ordered), 1),
+                "p50": self._percentile(ordered, 0.5),
+                "p95": self._percentile(ordered, 0.95),
+                "p99": self._percentile(ordered, 0.99),
+                "max": ordered[-1],
+                "buckets": counts
+            }
+
+        return result
+
+
+class LatencyTelemetry:
+
+    def __init__(
+        self,
+        enabled: bool = TELEMETRY_ENABLED,
+        batch_size: int = TELEMETRY_BATCH_SIZE,
+        flush_seconds: float = TELEMETRY_FLUSH_SECONDS,
+        queue_size: int = TELEMETRY_QUEUE_SIZE
+    ):
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.queue_size = queue_size
+        self.histogram = RollingHistogram()
+        self.dropped = 0
+        self.written = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._batch: List[Dict] = []
+
+    def start(self):
+        if self._writer or not self.enabled:
+            return
+
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._writer = asyncio.create_task(self._write_behind())
+
+    async def stop(self):
+        if self._writer is None:
+            return
+
+        self._writer.cancel()
+        await asyncio.gather(self._writer, return_exceptions=True)
+        self._writer = None
+
+        # Flush the batch in progress and whatever is still queued.
+        rows, self._batch = self._batch, []
+        while not self._queue.empty():
+            rows.append(self._queue.get_nowait())
+        await self._insert(rows)
+
+    def record(self, timer: TurnTimer):
+        self.histogram.add(timer.stages())
+
+        if self._queue is None:
+            return
+
+        try:
+            self._queue.put_nowait(timer.to_row())
+        except asyncio.QueueFull:
+            # Telemetry must never slow a turn down; drop instead of waiting.
+            self.dropped += 1
+
+    def summary(self) -> Dict:
+        return {
+            "stages": self.histogram.summary(),
+            "pending_rows": self._queue.qsize() if self._queue else 0,
+            "written_rows": self.written,
+            "dropped_rows": self.dropped
+        }
+
+    async def _write_behind(self):
+        while True:
+            self._batch.append(await self._queue.get())
+            deadline = time.monotonic() + self.flush_seconds
+
+            while len(self._batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    self._batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            rows, self._batch = self._batch, []
+            await self._insert(rows)
+
+    async def _insert(self, rows: List[Dict]):
+        if not rows:
+            return
+
+        try:
+            await async_supabase.table("latency_telemetry").insert(
+                rows, returning=ReturnMethod.minimal
+            ).execute()
+            self.written += len(rows)
+        except Exception as e:
+            print(f"Error writing latency telemetry ({len(rows)} rows): {e}")
+
+
+latency_telemetry = LatencyTelemetry()
@@ -13,8 +13,13 @@ interface WebSocketMessage {
   message?: string;
   thread_id?: string;
   conversation_id?: string;
+  seq?: number;
+  resumed?: boolean;
 }
 
+const SEQUENCE_HEADER_BYTES = 4;
+const SESSION_STORAGE_KEY = 'elias_session_id';
+
 export default function VoiceChat() {
   const [isConnected, setIsConnected] = useState(false);
   const [isRecording, setIsRecording] = useState(false);
@@ -28,7 +33,10 @@ export default function VoiceChat() {
   const audioChunksRef = useRef<Blob[]>([]);
   const audioContextRef = useRef<AudioContext | null>(null);
   const audioQueueRef = useRef<ArrayBuffer[]>([]);
+  const segmentChunksRef = useRef<Map<number, Uint8Array[]>>(new Map());
   const isPlayingRef = useRef(false);
+  const currentSourceRef = useRef<AudioBufferSourceNode | null>(null);
+  const playbackGenerationRef = useRef(0);
   const transcriptBoxRef = useRef<HTMLDivElement>(null);
 
   useEffect(() => {
@@ -52,9 +60,12 @@ export default function VoiceChat() {
 
   const connectWebSocket = () => {
     const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
-    const wsUrl = `${protocol}//${window.location.host}/ws`;
+    const sessionId = sessionStorage.getItem(SESSION_STORAGE_KEY);
+    const query = sessionId ? `?session_id=${encodeURIComponent(sessionId)}` : '';
+    const wsUrl = `${protocol}//${window.location.host}/ws${query}`;
 
     const ws = new WebSocket(wsUrl);
+    ws.binaryType = 'arraybuffer';
     wsRef.current = ws;
 
     ws.onopen = () => {
@@ -66,9 +77,12 @@ export default function VoiceChat() {
     };
 
     ws.onmessage = async (event) => {
-      if (event.data instanceof Blob) {
-        const arrayBuffer = await event.data.arrayBuffer();
-        await queueAudioChunk(arrayBuffer);
+      if (event.data instanceof ArrayBuffer) {
+        const arrayBuffer = event.data;
+        const seq = new DataView(arrayBuffer).getUint32(0);
+        const chunks = segmentChunksRef.current.get(seq) ?? [];
+        chunks.push(new Uint8Array(arrayBuffer, SEQUENCE_HEADER_BYTES));
+        segmentChunksRef.current.set(seq, chunks);
         return;
       }
 
@@ -76,7 +90,10 @@ export default function VoiceChat() {
 
       switch (message.type) {
         case 'connected':
-          console.log('Thread ID:', message.thread_id);
+          console.log('Thread ID:', message.thread_id, message.resumed ? '(resumed)' : '');
+          if (message.thread_id) {
+            sessionStorage.setItem(SESSION_STORAGE_KEY, message.thread_id);
+          }
           break;
 
         case 'status':
@@ -139,10 +156,31 @@ export default function VoiceChat() {
           }
           break;
 
+        case 'audio_segment_end':
+          if (message.seq !== undefined) {
+            const chunks = segmentChunksRef.current.get(message.seq) ?? [];
+            segmentChunksRef.current.delete(message.seq);
+            const totalLength = chunks.reduce((sum, chunk) => sum + chunk.length, 0);
+            const segment = new Uint8Array(totalLength);
+            let offset = 0;
+            for (const chunk of chunks) {
+              segment.set(chunk, offset);
+              offset += chunk.length;
+            }
+            if (totalLength > 0) {
+              await queueAudioChunk(segment.buffer);
+            }
+          }
+          break;
+
         case 'audio_end':
           console.log('Audio streaming complete');
           break;
 
+        case 'turn_cancelled':
+          stopPlayback();
+          break;
+
         case 'error':
           setStatus(message.message || 'Error occurred');
           setStatusType('error');
@@ -190,6 +228,19 @@ export default function VoiceChat() {
     }
   };
 
+  const stopPlayback = () => {
+    playbackGenerationRef.current += 1;
+    audioQueueRef.current = [];
+    segmentChunksRef.current.clear();
+    isPlayingRef.current = false;
+
+    if (currentSourceRef.current) {
+      currentSourceRef.current.onended = null;
+      currentSourceRef.current.stop();
+      currentSourceRef.current = null;
+    }
+  };
+
   const playNextAudioChunk = async () => {
     if (audioQueueRef.current.length === 0) {
       isPlayingRef.current = false;
@@ -199,20 +250,27 @@ export default function VoiceChat() {
     isPlayingRef.current = true;
 
     const arrayBuffer = audioQueueRef.current.shift()!;
+    const generation = playbackGenerationRef.current;
 
     try {
       await initAudioContext();
 
       const audioBuffer = await audioContextRef.current!.decodeAudioData(arrayBuffer);
 
+      if (generation !== playbackGenerationRef.current) {
+        return;
+      }
+
       const source = audioContextRef.current!.createBufferSource();
       source.buffer = audioBuffer;
       source.connect(audioContextRef.current!.destination);
 
       source.onended = () => {
+        currentSourceRef.current = null;
         playNextAudioChunk();
       };
 
+      currentSourceRef.current = source;
       source.start(0);
     } catch (error) {
       console.error('Error playing audio chunk:', error);
@@ -221,6 +279,11 @@ export default function VoiceChat() {
   };
 
   const startRecording = async () => {
+    if (wsRef.current && wsRef.current.readyState === WebSocket.OPEN) {
+      wsRef.current.send(JSON.stringify({ type: 'interrupt' }));
+    }
+    stopPlayback();
+
     try {
       const stream = await navigator.mediaDevices.getUserMedia({ audio: true });
 
@@ -0,0 +1,46 @@
+/*
+  # Add batched recent-messages function for conversation context
+
+  ## Overview
+  Returns the last N messages of several conversations in one round trip, so
+  context assembly no longer fetches every past conversation's full history.
+
+  ## New Components
+
+  1. Function: get_recent_messages_for_conversations
+    - Parameters: conversation_ids (uuid[]), messages_per_conversation (int)
+    - Returns: The most recent messages of each conversation, oldest first
+    - Uses a window function over the existing messages(conversation_id) and
+      messages(timestamp) indexes
+*/
+
+CREATE OR REPLACE FUNCTION get_recent_messages_for_conversations(
+  conversation_ids uuid[],
+  messages_per_conversation int DEFAULT 4
+)
+RETURNS TABLE (
+  conversation_id uuid,
+  role text,
+  content text,
+  "timestamp" timestamptz
+)
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT ranked.conversation_id, ranked.role, ranked.content, ranked."timestamp"
+  FROM (
+    SELECT
+      messages.conversation_id,
+      messages.role,
+      messages.content,
+      messages."timestamp",
+      row_number() OVER (
+        PARTITION BY messages.conversation_id
+        ORDER BY messages."timestamp" DESC
+      ) AS position
+    FROM messages
+    WHERE messages.conversation_id = ANY(conversation_ids)
+  ) ranked
+  WHERE ranked.position <= messages_per_conversation
+  ORDER BY ranked.conversation_id, ranked."timestamp";
+$$;
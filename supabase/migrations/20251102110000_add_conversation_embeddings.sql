@@ -0,0 +1,65 @@
+/*
+  # Add conversation embeddings for semantic context selection
+
+  ## Overview
+  Stores one embedding per conversation (title, description, tags and a
+  rolling excerpt of the transcript) so past-conversation context can be
+  picked by vector similarity across the whole archive instead of keyword
+  matching over only the most recent episodes.
+
+  ## Changes
+
+  1. Columns on `conversations`
+    - `embedding` (vector(1536), nullable) - Embedding of the conversation summary
+    - `embedding_message_count` (integer) - Message count when the embedding was last refreshed
+
+  2. Indexes
+    - HNSW cosine index on conversations.embedding (no training step, so it
+      stays accurate as conversations are embedded one at a time)
+
+  3. Function: match_conversations
+    - Parameters: query_embedding (vector), match_count (int), match_threshold (float),
+      exclude_conversation_id (uuid)
+    - Returns: Non-archived conversations ordered by similarity
+*/
+
+ALTER TABLE conversations ADD COLUMN IF NOT EXISTS embedding vector(1536);
+ALTER TABLE conversations ADD COLUMN IF NOT EXISTS embedding_message_count integer DEFAULT 0;
+
+CREATE INDEX IF NOT EXISTS idx_conversations_embedding ON conversations USING hnsw (embedding vector_cosine_ops);
+
+CREATE OR REPLACE FUNCTION match_conversations(
+  query_embedding vector(1536),
+  match_count int DEFAULT 5,
+  match_threshold float DEFAULT 0.3,
+  exclude_conversation_id uuid DEFAULT NULL
+)
+RETURNS TABLE (
+  id uuid,
+  title text,
+  description text,
+  started_at timestamptz,
+  tags text[],
+  similarity float
+)
+LANGUAGE plpgsql
+STABLE
+AS $$
+BEGIN
+  RETURN QUERY
+  SELECT
+    conversations.id,
+    conversations.title,
+    conversations.description,
+    conversations.started_at,
+    conversations.tags,
+    1 - (conversations.embedding <=> query_embedding) as similarity
+  FROM conversations
+  WHERE conversations.embedding IS NOT NULL
+    AND conversations.is_archived = false
+    AND (exclude_conversation_id IS NULL OR conversations.id <> exclude_conversation_id)
+    AND 1 - (conversations.embedding <=> query_embedding) > match_threshold
+  ORDER BY conversations.embedding <=> query_embedding
+  LIMIT match_count;
+END;
+$$;
@@ -0,0 +1,39 @@
+/*
+  # Add per-stage turn latency columns
+
+  ## Overview
+  The Python voice loop now writes one latency_telemetry row per turn.
+  Besides the existing STT / first-token / first-frame stages it also
+  measures context retrieval and the time until the whole answer has been
+  sent, so both are stored alongside the existing columns.
+
+  ## Changes
+
+  1. Columns on `latency_telemetry`
+    - `context_ms` (integer, nullable) - Transcript ready to prompt built (context + report retrieval)
+    - `turn_complete_ms` (integer, nullable) - End of user audio to last audio frame sent
+
+  2. View: latency_stats
+    - Adds avg_context_ms and p95_turn_complete_ms (existing columns unchanged;
+      total_latency_ms remains time to first audio)
+*/
+
+ALTER TABLE latency_telemetry ADD COLUMN IF NOT EXISTS context_ms integer;
+ALTER TABLE latency_telemetry ADD COLUMN IF NOT EXISTS turn_complete_ms integer;
+
+CREATE OR REPLACE VIEW latency_stats AS
+SELECT
+  date_trunc('hour', created_at) as hour,
+  COUNT(*) as turn_count,
+  percentile_cont(0.5) WITHIN GROUP (ORDER BY total_latency_ms) as p50_latency_ms,
+  percentile_cont(0.95) WITHIN GROUP (ORDER BY total_latency_ms) as p95_latency_ms,
+  percentile_cont(0.99) WITHIN GROUP (ORDER BY total_latency_ms) as p99_latency_ms,
+  AVG(stt_endpoint_ms) as avg_stt_ms,
+  AVG(llm_first_token_ms) as avg_llm_ms,
+  AVG(tts_first_frame_ms) as avg_tts_ms,
+  AVG(context_ms) as avg_context_ms,
+  percentile_cont(0.95) WITHIN GROUP (ORDER BY turn_complete_ms) as p95_turn_complete_ms
+FROM latency_telemetry
+WHERE created_at > now() - interval '7 days'
+GROUP BY hour
+ORDER BY hour DESC;
@@ -0,0 +1,26 @@
+/*
+  # Extend session_state for resumable voice sessions
+
+  ## Overview
+  The Python voice loop keeps per-session state (conversation id, rolling
+  history summary and the recent turns) in session_state so several worker
+  processes can serve the same app and a reconnecting client can resume
+  its session on any of them.
+
+  ## Changes
+
+  1. Columns on `session_state`
+    - `conversation_id` (uuid, nullable) - Conversation the session is recording into
+    - `summary` (text) - Rolling summary of turns that no longer fit the prompt budget
+    - `revision` (integer) - Number of turns appended to the session so far
+    - `updated_at` (timestamptz) - Last write
+
+  2. recent_turns now holds the raw [{role, content}] turns that are still
+     sent verbatim; expires_at is pushed forward on every write and
+     cleanup_expired_sessions() is called periodically by the app.
+*/
+
+ALTER TABLE session_state ADD COLUMN IF NOT EXISTS conversation_id uuid REFERENCES conversations(id) ON DELETE SET NULL;
+ALTER TABLE session_state ADD COLUMN IF NOT EXISTS summary text DEFAULT '';
+ALTER TABLE session_state ADD COLUMN IF NOT EXISTS revision integer DEFAULT 0;
+ALTER TABLE session_state ADD COLUMN IF NOT EXISTS updated_at timestamptz DEFAULT now();
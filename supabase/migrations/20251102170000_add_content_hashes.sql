@@ -0,0 +1,25 @@
+/*
+  # Content hashes for report and chunk deduplication
+
+  ## Overview
+  Uploaded files and embedded chunks are keyed by a sha256 of their
+  content so the same report is never extracted or embedded twice.
+
+  ## Changes
+
+  1. Columns
+    - `report_files.content_hash` (text) - sha256 of the uploaded file bytes.
+      An upload whose hash matches an existing row reuses that report.
+    - `document_chunks.content_hash` (text) - sha256 of the embedding model
+      and the normalized chunk text. Chunks with a known hash copy the
+      stored embedding instead of calling the embeddings API.
+
+  2. Indexes
+    - Lookups by hash on both tables
+*/
+
+ALTER TABLE report_files ADD COLUMN IF NOT EXISTS content_hash text;
+ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS content_hash text;
+
+CREATE INDEX IF NOT EXISTS idx_report_files_content_hash ON report_files(content_hash);
+CREATE INDEX IF NOT EXISTS idx_document_chunks_content_hash ON document_chunks(content_hash);
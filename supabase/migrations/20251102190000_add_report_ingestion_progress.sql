@@ -0,0 +1,19 @@
+/*
+  # Ingestion progress on reports
+
+  ## Overview
+  The ingestion job runs on whichever worker accepted the upload. Its
+  chunk counts are mirrored onto the report row so a progress poll that
+  lands on another worker still sees them.
+
+  ## Changes
+
+  1. Columns
+    - `reports.chunks_embedded` (integer) - chunks embedded and stored so
+      far by the current ingestion job.
+    - `reports.chunks_total` (integer) - total chunks for the job, null
+      until the last page has been chunked.
+*/
+
+ALTER TABLE reports ADD COLUMN IF NOT EXISTS chunks_embedded integer;
+ALTER TABLE reports ADD COLUMN IF NOT EXISTS chunks_total integer;
@@ -0,0 +1,55 @@
+/*
+  # One row per content hash
+
+  ## Overview
+  Boilerplate that repeats across reports leaves many chunk rows with the
+  same content hash, and the embedding cache lookup only needs one vector
+  per hash. Two identical uploads at the same time could also both create
+  a report, because nothing made the file hash unique.
+
+  ## New Components
+
+  1. Function: get_chunk_embeddings_by_hash
+    - Parameters: content_hashes (text[])
+    - Returns: One (content_hash, embedding) row per known hash, via
+      DISTINCT ON over idx_document_chunks_content_hash
+
+  2. Index: idx_report_files_first_version_hash
+    - Unique content_hash across first versions, so only one report can be
+      created per file. Later versions may repeat any hash.
+    - Hashes of existing duplicate first versions are cleared first; only
+      the oldest row keeps its hash.
+*/
+
+CREATE OR REPLACE FUNCTION get_chunk_embeddings_by_hash(content_hashes text[])
+RETURNS TABLE (
+  content_hash text,
+  embedding vector(1536)
+)
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT DISTINCT ON (document_chunks.content_hash)
+    document_chunks.content_hash,
+    document_chunks.embedding
+  FROM document_chunks
+  WHERE document_chunks.content_hash = ANY(content_hashes)
+    AND document_chunks.embedding IS NOT NULL
+  ORDER BY document_chunks.content_hash;
+$$;
+
+UPDATE report_files
+SET content_hash = NULL
+WHERE version = 1
+  AND content_hash IS NOT NULL
+  AND EXISTS (
+    SELECT 1
+    FROM report_files earlier
+    WHERE earlier.version = 1
+      AND earlier.content_hash = report_files.content_hash
+      AND (earlier.created_at, earlier.id) < (report_files.created_at, report_files.id)
+  );
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_report_files_first_version_hash
+  ON report_files(content_hash)
+  WHERE version = 1;
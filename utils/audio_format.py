@@ -0,0 +1,41 @@
+from typing import Optional, Tuple
+
+# (extension, content type) Whisper accepts, keyed by what the container
+# header looks like.
+WEBM = ("webm", "audio/webm")
+OGG = ("ogg", "audio/ogg")
+WAV = ("wav", "audio/wav")
+MP3 = ("mp3", "audio/mpeg")
+MP4 = ("m4a", "audio/mp4")
+FLAC = ("flac", "audio/flac")
+
+
+def _is_mp3_frame(header: bytes) -> bool:
+    # A bare 11-bit sync word also matches plenty of raw PCM, so require a
+    # valid MPEG version, layer III, and usable bitrate and sample rate.
+    if len(header) < 3 or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return False
+    version = (header[1] >> 3) & 0x03
+    layer = (header[1] >> 1) & 0x03
+    bitrate = header[2] >> 4
+    sample_rate = (header[2] >> 2) & 0x03
+    return version != 1 and layer == 1 and bitrate not in (0, 15) and sample_rate != 3
+
+
+def detect_audio_format(data: bytes, default: Optional[Tuple[str, str]] = WEBM) -> Optional[Tuple[str, str]]:
+    header = bytes(data[:12])
+
+    if header.startswith(b"\x1a\x45\xdf\xa3"):
+        return WEBM
+    if header.startswith(b"OggS"):
+        return OGG
+    if header.startswith(b"RIFF") and header[8:12] == b"WAVE":
+        return WAV
+    if header.startswith(b"fLaC"):
+        return FLAC
+    if header[4:8] == b"ftyp":
+        return MP4
+    if header.startswith(b"ID3") or _is_mp3_frame(header):
+        return MP3
+
+    return default
@@ -0,0 +1,65 @@
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+class ConfigCache:
+
+    def __init__(self, ttl_seconds: float = 60.0):
+        self.ttl_seconds = ttl_seconds
+        self.version = 0
+        self._entries: Dict[str, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str, loader: Callable[[], Any]) -> Any:
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                return entry[1]
+            version = self.version
+
+        value = loader()
+
+        with self._lock:
+            # Drop the load if an invalidation raced with it, so a stale row
+            # read before a write is never cached after that write.
+            if version == self.version:
+                self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+
+        return value
+
+    async def aget(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                return entry[1]
+            version = self.version
+
+        value = await loader()
+
+        with self._lock:
+            if version == self.version:
+                self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+
+        return value
+
+    def limit_ttl(self, ttl_seconds: float):
+        with self._lock:
+            self.ttl_seconds = min(self.ttl_seconds, ttl_seconds)
+
+    def invalidate(self, prefix: Optional[str] = None):
+        with self._lock:
+            if prefix is None:
+                self._entries.clear()
+            else:
+                for key in [k for k in self._entries if k.startswith(prefix)]:
+                    del self._entries[key]
+            self.version += 1
+
+
+config_cache = ConfigCache(ttl_seconds=float(os.getenv("CONFIG_CACHE_TTL_SECONDS", "60")))
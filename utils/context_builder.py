@@ -1,8 +1,15 @@
-from typing import List, Dict, Optional
-from services.conversation_service import ConversationService
-from services.reference_service import ReferenceService
+from typing import List, Dict, Optional, Tuple
+from services.conversation_service import ConversationService, AsyncConversationService
+from services.reference_service import ReferenceService, AsyncReferenceService
+from services.embedding_service import EmbeddingService, AsyncEmbeddingService
+from utils.vector_index import vector_index
+from utils.token_counter import count_tokens
+import asyncio
+import os
 import random
 
+CONVERSATION_MATCH_THRESHOLD = float(os.getenv("CONVERSATION_MATCH_THRESHOLD", "0.3"))
+
 class ContextBuilder:
 
     @staticmethod
@@ -22,41 +29,75 @@ class ContextBuilder:
         if not should_include:
             return ""
 
+        relevant_conversations = ContextBuilder._find_relevant_conversations(
+            current_conversation_id,
+            user_message,
+            max_conversations
+        )
+
+        if not relevant_conversations:
+            return ""
+
+        recent_messages = ConversationService.get_recent_messages_for_conversations(
+            [conv.get("id") for conv in relevant_conversations],
+            messages_per_conversation=4
+        )
+
+        return ContextBuilder.format_conversation_context(relevant_conversations, recent_messages)
+
+    @staticmethod
+    def _find_relevant_conversations(
+        current_conversation_id: Optional[str],
+        user_message: str,
+        max_conversations: int
+    ) -> List[Dict]:
+        if user_message and len(user_message) >= 10:
+            try:
+                matches = ConversationService.match_conversations(
+                    EmbeddingService.generate_embedding(user_message),
+                    match_count=3,
+                    match_threshold=CONVERSATION_MATCH_THRESHOLD,
+                    exclude_conversation_id=current_conversation_id
+                )
+                if matches:
+                    return matches
+            except Exception as e:
+                print(f"Semantic conversation search failed, using recent conversations: {e}")
+
         recent_conversations = ConversationService.get_recent_conversations(
             limit=max_conversations,
             include_archived=False
         )
 
-        if not recent_conversations:
-            return ""
+        return ContextBuilder._select_from_recent(recent_conversations, current_conversation_id, user_message)
 
+    @staticmethod
+    def _select_from_recent(
+        recent_conversations: List[Dict],
+        current_conversation_id: Optional[str],
+        user_message: str
+    ) -> List[Dict]:
         if current_conversation_id:
             recent_conversations = [
                 c for c in recent_conversations
                 if c.get("id") != current_conversation_id
             ]
 
-        relevant_conversations = ContextBuilder._filter_relevant_conversations(
-            recent_conversations,
-            user_message
-        )
-
-        if not relevant_conversations:
-            return ""
+        return ContextBuilder._filter_relevant_conversations(recent_conversations, user_message)[:3]
 
+    @staticmethod
+    def format_conversation_context(conversations: List[Dict], recent_messages: Dict[str, List[Dict]]) -> str:
         context_parts = ["\n--- Context from Past Conversations ---"]
 
-        for conv in relevant_conversations[:3]:
-            conv_id = conv.get("id")
+        for conv in conversations:
             title = conv.get("title", "Untitled")
             started_at = conv.get("started_at", "")
-
-            messages = ConversationService.get_conversation_messages(conv_id)
+            messages = recent_messages.get(conv.get("id"), [])
 
             if messages:
                 context_parts.append(f"\nPast conversation: '{title}' (from {started_at[:10]})")
 
-                for msg in messages[-4:]:
+                for msg in messages:
                     role = msg.get("role", "")
                     content = msg.get("content", "")
                     speaker = "User" if role == "user" else "You"
@@ -123,6 +164,44 @@ class ContextBuilder:
 
         return relevant[:5]
 
+    @staticmethod
+    def format_report_chunks(chunks: List[Dict], token_budget: int = 600) -> str:
+        if not chunks:
+            return ""
+
+        context_parts = ["\n--- Relevant Report Excerpts ---"]
+        used_tokens = 0
+
+        for chunk in chunks:
+            source = " / ".join(part for part in [chunk.get("company"), chunk.get("section")] if part)
+            lines = [f"\n[{source or 'Report'}]"]
+
+            if chunk.get("abstract"):
+                lines.append(f"  Summary: {chunk['abstract']}")
+            for fact in (chunk.get("fast_facts") or [])[:3]:
+                lines.append(f"  Fact: {fact}")
+            if chunk.get("quote"):
+                lines.append(f"  Quote: \"{chunk['quote']}\"")
+
+            if len(lines) == 1:
+                continue
+
+            entry = "\n".join(lines)
+            entry_tokens = count_tokens(entry)
+
+            if used_tokens + entry_tokens > token_budget:
+                break
+
+            context_parts.append(entry)
+            used_tokens += entry_tokens
+
+        if len(context_parts) == 1:
+            return ""
+
+        context_parts.append("\n--- End of Report Excerpts ---\n")
+
+        return "\n".join(context_parts)
+
     @staticmethod
     def build_personality_instructions(base_instructions: str) -> str:
         from services.personality_service import PersonalityService
@@ -156,3 +235,103 @@ class ContextBuilder:
         enhanced_instructions += base_instructions
 
         return enhanced_instructions
+
+
+class AsyncContextBuilder:
+
+    @staticmethod
+    async def build_conversation_context(
+        current_conversation_id: Optional[str] = None,
+        user_message: str = "",
+        max_conversations: int = 5
+    ) -> str:
+        context, _ = await AsyncContextBuilder.build_conversation_context_with_sources(
+            current_conversation_id,
+            user_message,
+            max_conversations
+        )
+        return context
+
+    @staticmethod
+    async def build_conversation_context_with_sources(
+        current_conversation_id: Optional[str] = None,
+        user_message: str = "",
+        max_conversations: int = 5
+    ) -> Tuple[str, List[str]]:
+        reference_settings = await AsyncReferenceService.get_reference_frequency_setting()
+        level = reference_settings.get("level", "sometimes")
+        weight = reference_settings.get("weight", 0.5)
+
+        if level == "never" or weight == 0:
+            return "", []
+
+        should_include = ContextBuilder._should_include_context(level, weight)
+        if not should_include:
+            return "", []
+
+        relevant_conversations = await AsyncContextBuilder._find_relevant_conversations(
+            current_conversation_id,
+            user_message,
+            max_conversations
+        )
+
+        if not relevant_conversations:
+            return "", []
+
+        source_ids = [conv.get("id") for conv in relevant_conversations]
+        recent_messages = await AsyncConversationService.get_recent_messages_for_conversations(
+            source_ids,
+            messages_per_conversation=4
+        )
+
+        return ContextBuilder.format_conversation_context(relevant_conversations, recent_messages), source_ids
+
+    @staticmethod
+    async def _find_relevant_conversations(
+        current_conversation_id: Optional[str],
+        user_message: str,
+        max_conversations: int
+    ) -> List[Dict]:
+        if user_message and len(user_message) >= 10:
+            try:
+                matches = await AsyncConversationService.match_conversations(
+                    await AsyncEmbeddingService.embed_query(user_message),
+                    match_count=3,
+                    match_threshold=CONVERSATION_MATCH_THRESHOLD,
+                    exclude_conversation_id=current_conversation_id
+                )
+                if matches:
+                    return matches
+            except Exception as e:
+                print(f"Semantic conversation search failed, using recent conversations: {e}")
+
+        recent_conversations = await AsyncConversationService.get_recent_conversations(
+            limit=max_conversations,
+            include_archived=False
+        )
+
+        return ContextBuilder._select_from_recent(recent_conversations, current_conversation_id, user_message)
+
+    @staticmethod
+    async def build_report_context(
+        user_message: str,
+        top_k: int = 5,
+        match_threshold: float = 0.7,
+        token_budget: int = 600
+    ) -> str:
+        if not user_message or len(user_message.strip()) < 10:
+            return ""
+
+        query_embedding = await AsyncEmbeddingService.embed_query(user_message)
+        if vector_index.ready:
+            chunks = await asyncio.to_thread(
+                vector_index.search, query_embedding, top_k=top_k, threshold=match_threshold
+            )
+        else:
+            chunks = await AsyncEmbeddingService.match_document_chunks(
+                query_embedding,
+                match_count=top_k,
+                match_threshold=match_threshold
+            )
+
+        return ContextBuilder.format_report_chunks(chunks, token_budget)
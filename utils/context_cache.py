@@ -0,0 +1,71 @@
+import hashlib
+import os
+import threading
+from typing import Dict, Hashable, List, Optional, Set, Tuple
+
+from utils.config_cache import config_cache
+from utils.lru_cache import LRUCache
+
+CONTEXT_CACHE_SIZE = int(os.getenv("CONTEXT_CACHE_SIZE", "256"))
+CONTEXT_CACHE_TTL_SECONDS = float(os.getenv("CONTEXT_CACHE_TTL_SECONDS", "300"))
+
+
+class ContextCache:
+
+    def __init__(self, max_size: int = CONTEXT_CACHE_SIZE, ttl_seconds: float = CONTEXT_CACHE_TTL_SECONDS):
+        self._entries = LRUCache(max_size=max_size, ttl_seconds=ttl_seconds, on_evict=self._forget)
+        self._keys_by_source: Dict[str, Set[Hashable]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(conversation_id: str, user_message: str) -> Tuple[str, str, int]:
+        normalized = " ".join(user_message.lower().split())
+        digest = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+        # The settings/personality version is part of the key, so changing
+        # either retires every entry built under the old configuration.
+        return (conversation_id, digest, config_cache.version)
+
+    def get(self, conversation_id: str, user_message: str) -> Optional[str]:
+        entry = self._entries.get(self.make_key(conversation_id, user_message))
+        return entry[0] if entry else None
+
+    def set(self, conversation_id: str, user_message: str, context: str, source_conversation_ids: List[str]):
+        key = self.make_key(conversation_id, user_message)
+        sources = tuple(source_conversation_ids)
+
+        with self._lock:
+            for source_id in sources:
+                self._keys_by_source.setdefault(source_id, set()).add(key)
+
+        self._entries.set(key, (context, sources))
+
+    def invalidate_conversation(self, conversation_id: str):
+        with self._lock:
+            keys = self._keys_by_source.pop(conversation_id, set())
+
+        for key in keys:
+            self._entries.delete(key)
+
+    def limit_ttl(self, ttl_seconds: float):
+        if not self._entries.ttl_seconds or ttl_seconds < self._entries.ttl_seconds:
+            self._entries.ttl_seconds = ttl_seconds
+
+    def clear(self):
+        self._entries.clear()
+        with self._lock:
+            self._keys_by_source.clear()
+
+    def stats(self) -> dict:
+        return self._entries.stats()
+
+    def _forget(self, key: Hashable, entry: Tuple[str, Tuple[str, ...]]):
+        with self._lock:
+            for source_id in entry[1]:
+                keys = self._keys_by_source.get(source_id)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._keys_by_source[source_id]
+
+
+context_cache = ContextCache()
@@ -0,0 +1,123 @@
+import asyncio
+import os
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from utils.token_counter import count_tokens
+
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1500"))
+HISTORY_SUMMARY_MAX_TOKENS = int(os.getenv("HISTORY_SUMMARY_MAX_TOKENS", "300"))
+HISTORY_MIN_RECENT_MESSAGES = int(os.getenv("HISTORY_MIN_RECENT_MESSAGES", "4"))
+
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+class ConversationHistory:
+
+    def __init__(
+        self,
+        summarize: Optional[Callable[[str, List[Dict]], Awaitable[str]]] = None,
+        token_budget: int = HISTORY_TOKEN_BUDGET,
+        min_recent_messages: int = HISTORY_MIN_RECENT_MESSAGES
+    ):
+        self.summarize = summarize
+        self.token_budget = token_budget
+        self.min_recent_messages = min_recent_messages
+        self.summary = ""
+        # Raw turns only: the user's words and Elias's replies. Retrieved
+        # context is attached to the current question and never stored.
+        self.messages: List[Dict] = []
+        self.revision = 0
+        self._summarizing: Optional[asyncio.Task] = None
+
+    def add_user(self, text: str):
+        self._append("user", text)
+
+    def add_assistant(self, text: str):
+        if text:
+            self._append("assistant", text)
+
+    def build_messages(self, system_message: str, user_message: str, context: str = "") -> List[Dict]:
+        messages = [{"role": "system", "content": system_message}]
+
+        if self.summary:
+            messages.append({"role": "system", "content": f"Summary of the conversation so far:\n{self.summary}"})
+
+        messages.extend(self._recent_within_budget())
+
+        content = f"{context}\n\nCurrent question: {user_message}" if context else user_message
+        messages.append({"role": "user", "content": content})
+
+        return messages
+
+    def snapshot(self) -> Dict:
+        return {
+            "summary": self.summary,
+            "messages": [{"role": m["role"], "content": m["content"]} for m in self.messages],
+            "revision": self.revision
+        }
+
+    def restore(self, state: Dict):
+        self.summary = state.get("summary") or ""
+        self.messages = [
+            {"role": m["role"], "content": m["content"], "tokens": count_tokens(m["content"]) + MESSAGE_OVERHEAD_TOKENS}
+            for m in state.get("messages") or []
+        ]
+        self.revision = state.get("revision") or 0
+
+    def cancel(self):
+        if self._summarizing:
+            self._summarizing.cancel()
+            self._summarizing = None
+
+    def _append(self, role: str, text: str):
+        self.messages.append({"role": role, "content": text, "tokens": count_tokens(text) + MESSAGE_OVERHEAD_TOKENS})
+        self.revision += 1
+        self._maybe_summarize()
+
+    def _recent_count(self) -> int:
+        used = 0
+        kept = 0
+
+        for message in reversed(self.messages):
+            if used + message["tokens"] > self.token_budget and kept >= self.min_recent_messages:
+                break
+            used += message["tokens"]
+            kept += 1
+
+        return kept
+
+    def _recent_within_budget(self) -> List[Dict]:
+        kept = self._recent_count()
+        recent = self.messages[len(self.messages) - kept:]
+        return [{"role": m["role"], "content": m["content"]} for m in recent]
+
+    def _maybe_summarize(self):
+        if self.summarize is None or (self._summarizing and not self._summarizing.done()):
+            return
+
+        overflow = len(self.messages) - self._recent_count()
+        if overflow <= 0:
+            return
+
+        self._summarizing = asyncio.create_task(self._fold_into_summary(overflow))
+
+    async def _fold_into_summary(self, count: int):
+        folded = [{"role": m["role"], "content": m["content"]} for m in self.messages[:count]]
+
+        try:
+            summary = await self.summarize(self.summary, folded)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # The turns simply stay out of the prompt until the next attempt.
+            print(f"Error summarizing conversation history: {e}")
+            return
+
+        if summary:
+            self.summary = summary.strip()
+            # New turns are only ever appended, so the folded ones are still
+            # the oldest entries.
+            del self.messages[:count]
+
+        self._summarizing = None
+        self._maybe_summarize()
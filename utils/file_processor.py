@@ -1,6 +1,11 @@
+import hashlib
+import multiprocessing
 import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, Iterator, List, Optional
 import tempfile
 
 try:
@@ -13,13 +18,50 @@ try:
 except ImportError:
     Document = None
 
-try:
-    import markdown
-except ImportError:
-    markdown = None
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", str(min(4, os.cpu_count() or 1))))
+EXTRACTION_PAGES_PER_TASK = int(os.getenv("EXTRACTION_PAGES_PER_TASK", "16"))
+EXTRACTION_TEXT_BLOCK_BYTES = 64 * 1024
+DOCX_PARAGRAPHS_PER_BLOCK = 50
+
+
+_worker_reader = (None, None)
+
+
+def _extract_pdf_page_range(file_path: str, start: int, end: int) -> List[str]:
+    # Runs in a worker process. Each worker keeps its reader for the file it
+    # last saw, so the page tree is parsed once per worker, not per range.
+    global _worker_reader
+    cached_path, reader = _worker_reader
+    if cached_path != file_path:
+        reader = PdfReader(file_path)
+        _worker_reader = (file_path, reader)
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
 
 class FileProcessor:
 
+    _pool: Optional[ProcessPoolExecutor] = None
+    _pool_lock = threading.Lock()
+
+    @staticmethod
+    def _get_pool() -> ProcessPoolExecutor:
+        with FileProcessor._pool_lock:
+            if FileProcessor._pool is None:
+                # Spawned rather than forked: the server process has threads
+                # (ingestion, to_thread) that a fork would copy mid-flight.
+                FileProcessor._pool = ProcessPoolExecutor(
+                    max_workers=EXTRACTION_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return FileProcessor._pool
+
+    @staticmethod
+    def shutdown_pool():
+        with FileProcessor._pool_lock:
+            if FileProcessor._pool is not None:
+                FileProcessor._pool.shutdown(wait=False, cancel_futures=True)
+                FileProcessor._pool = None
+
     @staticmethod
     def process_file(file_path: str) -> Dict:
         path = Path(file_path)
@@ -34,93 +76,124 @@ class FileProcessor:
         }
 
         try:
-            if file_extension == '.txt':
-                result["content_text"] = FileProcessor._process_txt(file_path)
-                result["success"] = True
-
-            elif file_extension == '.md':
-                result["content_text"] = FileProcessor._process_markdown(file_path)
-                result["success"] = True
-
-            elif file_extension == '.pdf':
-                result["content_text"] = FileProcessor._process_pdf(file_path)
-                result["success"] = True
-
-            elif file_extension in ['.docx', '.doc']:
-                result["content_text"] = FileProcessor._process_docx(file_path)
-                result["success"] = True
-
-            else:
-                result["error"] = f"Unsupported file type: {file_extension}"
-
+            pages = [page for page in FileProcessor.iter_pages(file_path) if page]
+            result["content_text"] = "\n\n".join(pages)
+            result["success"] = True
         except Exception as e:
             result["error"] = str(e)
 
         return result
 
     @staticmethod
-    def _process_txt(file_path: str) -> str:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return f.read()
+    def iter_pages(file_path: str) -> Iterator[str]:
+        file_extension = Path(file_path).suffix.lower()
+
+        if file_extension in ['.txt', '.md']:
+            return FileProcessor._iter_text_blocks(file_path)
+        if file_extension == '.pdf':
+            return FileProcessor._iter_pdf_pages(file_path)
+        if file_extension in ['.docx', '.doc']:
+            return FileProcessor._iter_docx_blocks(file_path)
+
+        raise ValueError(f"Unsupported file type: {file_extension}")
 
     @staticmethod
-    def _process_markdown(file_path: str) -> str:
+    def _iter_text_blocks(file_path: str) -> Iterator[str]:
+        block = []
+        block_size = 0
+
         with open(file_path, 'r', encoding='utf-8') as f:
-            md_content = f.read()
+            for line in f:
+                block.append(line)
+                block_size += len(line)
+                if block_size >= EXTRACTION_TEXT_BLOCK_BYTES and not line.strip():
+                    yield "".join(block)
+                    block = []
+                    block_size = 0
 
-        if markdown:
-            html_content = markdown.markdown(md_content)
-            return md_content
-        else:
-            return md_content
+        if block:
+            yield "".join(block)
 
     @staticmethod
-    def _process_pdf(file_path: str) -> str:
+    def _iter_pdf_pages(file_path: str) -> Iterator[str]:
         if not PdfReader:
             raise ImportError("PyPDF2 is required to process PDF files. Install it with: pip install PyPDF2")
 
         reader = PdfReader(file_path)
-        text_content = []
+        page_count = len(reader.pages)
+        pages_per_task = max(1, EXTRACTION_PAGES_PER_TASK)
+
+        if page_count <= pages_per_task or EXTRACTION_WORKERS <= 1:
+            for page in reader.pages:
+                yield page.extract_text() or ""
+            return
+
+        del reader
+
+        # Page ranges are parsed in worker processes and yielded in order, so
+        # chunking starts on the first range while later ones are still being
+        # parsed. Only a few ranges are in flight to keep memory bounded.
+        pool = FileProcessor._get_pool()
+        ranges = deque(
+            (start, min(start + pages_per_task, page_count))
+            for start in range(0, page_count, pages_per_task)
+        )
+        in_flight = deque()
 
-        for page in reader.pages:
-            text = page.extract_text()
-            if text:
-                text_content.append(text)
+        try:
+            while ranges or in_flight:
+                while ranges and len(in_flight) < EXTRACTION_WORKERS * 2:
+                    start, end = ranges.popleft()
+                    in_flight.append(pool.submit(_extract_pdf_page_range, file_path, start, end))
 
-        return "\n\n".join(text_content)
+                for page in in_flight.popleft().result():
+                    yield page
+        finally:
+            for future in in_flight:
+                future.cancel()
 
     @staticmethod
-    def _process_docx(file_path: str) -> str:
+    def _iter_docx_blocks(file_path: str) -> Iterator[str]:
         if not Document:
             raise ImportError("python-docx is required to process Word documents. Install it with: pip install python-docx")
 
+        # python-docx has no notion of pages and parses the whole package up
+        # front, so paragraphs are handed on in blocks instead.
         doc = Document(file_path)
-        text_content = []
+        block = []
 
         for paragraph in doc.paragraphs:
             if paragraph.text.strip():
-                text_content.append(paragraph.text)
+                block.append(paragraph.text)
+            if len(block) >= DOCX_PARAGRAPHS_PER_BLOCK:
+                yield "\n\n".join(block)
+                block = []
 
-        return "\n\n".join(text_content)
+        if block:
+            yield "\n\n".join(block)
+
+    @staticmethod
+    def content_addressed_name(filename: str, sha256: str) -> str:
+        path = Path(Path(filename).name)
+        return f"{path.stem}_{sha256[:16]}{path.suffix.lower()}"
 
     @staticmethod
     def save_uploaded_file(file_data: bytes, filename: str, upload_dir: str = "uploads") -> str:
         upload_path = Path(upload_dir)
         upload_path.mkdir(parents=True, exist_ok=True)
 
-        file_path = upload_path / filename
-        counter = 1
-
-        while file_path.exists():
-            name_parts = filename.rsplit('.', 1)
-            if len(name_parts) == 2:
-                file_path = upload_path / f"{name_parts[0]}_{counter}.{name_parts[1]}"
-            else:
-                file_path = upload_path / f"{filename}_{counter}"
-            counter += 1
-
-        with open(file_path, 'wb') as f:
-            f.write(file_data)
+        descriptor, temp_path = tempfile.mkstemp(dir=upload_path, prefix=".upload-", suffix=".part")
+        try:
+            with os.fdopen(descriptor, 'wb') as f:
+                f.write(file_data)
+            file_path = upload_path / FileProcessor.content_addressed_name(
+                filename, hashlib.sha256(file_data).hexdigest()
+            )
+            os.replace(temp_path, file_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
 
         return str(file_path)
 
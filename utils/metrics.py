@@ -0,0 +1,305 @@
+import asyncio
+import functools
+import inspect
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+EVENT_LOOP_LAG_INTERVAL_SECONDS = float(os.getenv("EVENT_LOOP_LAG_INTERVAL_SECONDS", "0.5"))
+
+DEFAULT_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}"
+            for labels, value in items
+        ]
+
+
+class Histogram:
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = list(buckets)
+        # Per label set: [per-bucket counts (non-cumulative) + overflow, sum, count]
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(label_values)
+            if entry is None:
+                entry = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(labels, (list(entry[0]), entry[1], entry[2])) for labels, entry in self._values.items()]
+
+        lines = []
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + [float("inf")], counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {count}")
+        return lines
+
+
+class CallbackMetric:
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], Union[float, Dict[Tuple[str, ...], float]]],
+        label_names: Sequence[str] = (),
+        kind: str = "gauge"
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.label_names = tuple(label_names)
+        self.kind = kind
+
+    def render(self) -> List[str]:
+        # Evaluated only when /metrics is scraped, so it costs nothing on the
+        # request path.
+        try:
+            value = self.callback()
+        except Exception as e:
+            print(f"Error collecting metric {self.name}: {e}")
+            return []
+
+        if isinstance(value, dict):
+            return [
+                f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(v)}"
+                for labels, v in value.items()
+            ]
+        return [f"{self.name} {_format_value(value)}"]
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self._metrics: Dict[str, Union[Counter, Histogram, CallbackMetric]] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, label_names))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, label_names, buckets))
+
+    def callback(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable,
+        label_names: Sequence[str] = (),
+        kind: str = "gauge"
+    ) -> CallbackMetric:
+        with self._lock:
+            metric = CallbackMetric(name, documentation, callback, label_names, kind)
+            self._metrics[name] = metric
+            return metric
+
+    def render(self) -> str:
+        with self._lock:
+            registered = list(self._metrics.values())
+
+        lines = []
+        for metric in registered:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+service_calls = metrics.counter(
+    "elias_service_calls_total",
+    "Service method calls (Supabase and embedding services) by outcome.",
+    ("service", "method", "status")
+)
+service_call_duration = metrics.histogram(
+    "elias_service_call_duration_seconds",
+    "Service method call duration.",
+    ("service", "method")
+)
+openai_requests = metrics.counter(
+    "elias_openai_requests_total",
+    "OpenAI API requests by model and outcome.",
+    ("model", "status")
+)
+openai_request_duration = metrics.histogram(
+    "elias_openai_request_duration_seconds",
+    "OpenAI API request duration, including the streamed body for streaming calls.",
+    ("model",)
+)
+event_loop_lag = metrics.histogram(
+    "elias_event_loop_lag_seconds",
+    "How late the event loop woke a periodic timer.",
+    buckets=[0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0]
+)
+
+
+def _status_for(error: BaseException) -> str:
+    if isinstance(error, (asyncio.CancelledError, GeneratorExit)):
+        return "cancelled"
+    return "error"
+
+
+def instrument_service(cls=None, *, methods: Optional[Iterable[str]] = None):
+    # Every public staticmethod is timed unless the service passes an
+    # allowlist of its I/O methods; pure helpers (hashing, text building)
+    # called in hot loops would only pay the overhead and add noise.
+    if cls is None:
+        return functools.partial(instrument_service, methods=methods)
+
+    service = cls.__name__
+    allowed = set(methods) if methods is not None else None
+
+    if allowed is not None:
+        unknown = allowed - {name for name, attribute in vars(cls).items() if isinstance(attribute, staticmethod)}
+        if unknown:
+            raise AttributeError(f"{service} has no staticmethods {sorted(unknown)} to instrument")
+
+    for name, attribute in list(vars(cls).items()):
+        if name.startswith("_") or not isinstance(attribute, staticmethod):
+            continue
+        if allowed is not None and name not in allowed:
+            continue
+
+        function = attribute.__func__
+        if inspect.isgeneratorfunction(function) or inspect.isasyncgenfunction(function):
+            continue
+
+        setattr(cls, name, staticmethod(_instrument(function, service, name)))
+
+    return cls
+
+
+def _instrument(function: Callable, service: str, method: str) -> Callable:
+    if inspect.iscoroutinefunction(function):
+        @functools.wraps(function)
+        async def async_wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            status = "ok"
+            try:
+                return await function(*args, **kwargs)
+            except BaseException as e:
+                status = _status_for(e)
+                raise
+            finally:
+                service_call_duration.observe(time.perf_counter() - started, service, method)
+                service_calls.inc(service, method, status)
+
+        return async_wrapper
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        status = "ok"
+        try:
+            return function(*args, **kwargs)
+        except BaseException as e:
+            status = _status_for(e)
+            raise
+        finally:
+            service_call_duration.observe(time.perf_counter() - started, service, method)
+            service_calls.inc(service, method, status)
+
+    return wrapper
+
+
+class openai_request:
+
+    def __init__(self, model: str):
+        self.model = model
+        self.started = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        openai_request_duration.observe(time.perf_counter() - self.started, self.model)
+        openai_requests.inc(self.model, "ok" if exc is None else _status_for(exc))
+        return False
+
+
+async def monitor_event_loop_lag(interval: float = EVENT_LOOP_LAG_INTERVAL_SECONDS):
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        event_loop_lag.observe(max(0.0, loop.time() - expected))
@@ -0,0 +1,194 @@
+import asyncio
+import os
+import re
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional, Set, Tuple
+
+SPECULATION_ENABLED = os.getenv("SPECULATION_ENABLED", "true").lower() == "true"
+SPECULATION_STABLE_MS = int(os.getenv("SPECULATION_STABLE_MS", "250"))
+
+_PUNCTUATION = re.compile(r"[^\w\s']")
+
+
+def normalize_transcript(text: str) -> str:
+    return " ".join(_PUNCTUATION.sub(" ", text.lower()).split())
+
+
+class Speculation:
+
+    def __init__(self, text: str, key: str):
+        self.text = text
+        self.key = key
+        self.payload: Any = None
+        self.tokens: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.ready = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self._updated = asyncio.Event()
+
+    async def run(self, start: Callable[[str], Awaitable[Tuple[Any, AsyncIterator[str]]]]):
+        stream = None
+        try:
+            self.payload, stream = await start(self.text)
+            self.ready.set()
+            # Tokens are only buffered here; nothing reaches the client until
+            # the final transcript confirms this speculation.
+            async for token in stream:
+                self.tokens.append(token)
+                self._updated.set()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self.ready.set()
+            self._updated.set()
+            if stream is not None and hasattr(stream, "aclose"):
+                await stream.aclose()
+
+    async def stream(self) -> AsyncIterator[str]:
+        position = 0
+        while True:
+            if position < len(self.tokens):
+                yield self.tokens[position]
+                position += 1
+                continue
+
+            if self.done:
+                if self.error:
+                    raise self.error
+                return
+
+            self._updated.clear()
+            await self._updated.wait()
+
+    def cancel(self):
+        if self.task:
+            self.task.cancel()
+
+
+class SpeculativeResponder:
+
+    def __init__(
+        self,
+        start: Callable[[str], Awaitable[Tuple[Any, AsyncIterator[str]]]],
+        prefetch: Optional[Callable[[str], Awaitable[Any]]] = None,
+        stable_ms: int = SPECULATION_STABLE_MS,
+        enabled: bool = SPECULATION_ENABLED
+    ):
+        self.start = start
+        self.prefetch = prefetch
+        self.stable_ms = stable_ms
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+        self._utterances: Set["UtteranceSpeculation"] = set()
+
+    def utterance(self) -> "UtteranceSpeculation":
+        # Each utterance speculates on its own: the next one's partials may
+        # arrive while the last one is still being transcribed and must not
+        # cancel or take its speculation.
+        utterance = UtteranceSpeculation(self)
+        self._utterances.add(utterance)
+        return utterance
+
+    def cancel(self):
+        for utterance in list(self._utterances):
+            utterance.cancel()
+
+
+class UtteranceSpeculation:
+
+    def __init__(self, responder: SpeculativeResponder):
+        self.responder = responder
+
+        self._latest_key: Optional[str] = None
+        self._speculation: Optional[Speculation] = None
+        self._timer: Optional[asyncio.Task] = None
+        self._prefetches: Set[asyncio.Task] = set()
+
+    def on_partial(self, text: str):
+        if not self.responder.enabled:
+            return
+
+        key = normalize_transcript(text)
+        if not key or key == self._latest_key:
+            return
+
+        self._latest_key = key
+
+        if self._timer:
+            self._timer.cancel()
+
+        if self._speculation and self._speculation.key != key:
+            self._speculation.cancel()
+            self._speculation = None
+
+        if self.responder.prefetch:
+            task = asyncio.create_task(self._prefetch(text))
+            self._prefetches.add(task)
+            task.add_done_callback(self._prefetches.discard)
+
+        self._timer = asyncio.create_task(self._start_when_stable(text, key))
+
+    async def take(self, final_text: str) -> Optional[Speculation]:
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+
+        speculation = self._speculation
+        self._speculation = None
+        self._latest_key = None
+        self.responder._utterances.discard(self)
+
+        if speculation is None:
+            return None
+
+        if speculation.key != normalize_transcript(final_text):
+            speculation.cancel()
+            self.responder.misses += 1
+            return None
+
+        await speculation.ready.wait()
+
+        if speculation.payload is None:
+            self.responder.misses += 1
+            return None
+
+        self.responder.hits += 1
+        return speculation
+
+    def cancel(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+
+        if self._speculation:
+            self._speculation.cancel()
+            self._speculation = None
+
+        self._latest_key = None
+        self.responder._utterances.discard(self)
+
+        for task in list(self._prefetches):
+            task.cancel()
+
+    async def _start_when_stable(self, text: str, key: str):
+        await asyncio.sleep(self.responder.stable_ms / 1000)
+
+        if self._speculation is not None or self._latest_key != key:
+            return
+
+        speculation = Speculation(text, key)
+        speculation.task = asyncio.create_task(speculation.run(self.responder.start))
+        self._speculation = speculation
+
+    async def _prefetch(self, text: str):
+        try:
+            await self.responder.prefetch(text)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Error prefetching context: {e}")
@@ -0,0 +1,149 @@
+import asyncio
+import io
+import os
+import wave
+from typing import Awaitable, Callable, List, Optional
+
+import numpy as np
+
+STREAM_SAMPLE_RATE = int(os.getenv("STREAM_SAMPLE_RATE", "16000"))
+VAD_FRAME_MS = 20
+VAD_ENERGY_THRESHOLD = float(os.getenv("VAD_ENERGY_THRESHOLD", "500"))
+VAD_SEGMENT_SILENCE_MS = int(os.getenv("VAD_SEGMENT_SILENCE_MS", "300"))
+VAD_END_OF_UTTERANCE_MS = int(os.getenv("VAD_END_OF_UTTERANCE_MS", "800"))
+VAD_MAX_SEGMENT_SECONDS = float(os.getenv("VAD_MAX_SEGMENT_SECONDS", "8"))
+VAD_MIN_SPEECH_MS = 200
+SUPPORTED_SAMPLE_RATES = (8000, 16000, 24000, 48000)
+
+
+def is_supported_sample_rate(sample_rate) -> bool:
+    # Rates outside the list give a zero or odd VAD frame size, which either
+    # never drains the buffer or cannot be read as 16-bit samples.
+    return type(sample_rate) is int and sample_rate in SUPPORTED_SAMPLE_RATES
+
+
+def pcm_to_wav(pcm: bytes, sample_rate: int = STREAM_SAMPLE_RATE) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm)
+    return buffer.getvalue()
+
+
+def frame_energy(frame: bytes) -> float:
+    samples = np.frombuffer(frame, dtype=np.int16)
+    if not samples.size:
+        return 0.0
+    # Square in float64: int16 products overflow.
+    return float(np.sqrt(np.mean(np.square(samples, dtype=np.float64))))
+
+
+class StreamingTranscriber:
+
+    def __init__(
+        self,
+        transcribe: Callable[[bytes, str], Awaitable[str]],
+        on_partial: Callable[[str], Awaitable[None]],
+        sample_rate: int = STREAM_SAMPLE_RATE
+    ):
+        if not is_supported_sample_rate(sample_rate):
+            raise ValueError(f"Unsupported sample rate: {sample_rate!r}")
+
+        self.transcribe = transcribe
+        self.on_partial = on_partial
+        self.sample_rate = sample_rate
+        self.frame_bytes = sample_rate * 2 * VAD_FRAME_MS // 1000
+
+        self._pending = bytearray()
+        self._segment = bytearray()
+        self._speech_ms = 0
+        self._silence_ms = 0
+        self._heard_speech = False
+        self._texts: List[Optional[str]] = []
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def heard_speech(self) -> bool:
+        return self._heard_speech
+
+    @property
+    def end_of_utterance(self) -> bool:
+        return self._heard_speech and self._silence_ms >= VAD_END_OF_UTTERANCE_MS
+
+    def feed(self, pcm: bytes):
+        self._pending.extend(pcm)
+
+        while len(self._pending) >= self.frame_bytes:
+            frame = bytes(self._pending[:self.frame_bytes])
+            del self._pending[:self.frame_bytes]
+            self._process_frame(frame)
+
+    async def finish(self) -> str:
+        self._close_segment()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        return self.text
+
+    def cancel(self):
+        for task in self._tasks:
+            task.cancel()
+
+    @property
+    def text(self) -> str:
+        return " ".join(t.strip() for t in self._texts if t and t.strip())
+
+    def _contiguous_text(self) -> str:
+        done = []
+        for t in self._texts:
+            if t is None:
+                break
+            done.append(t)
+        return " ".join(t.strip() for t in done if t.strip())
+
+    def _process_frame(self, frame: bytes):
+        is_speech = frame_energy(frame) >= VAD_ENERGY_THRESHOLD
+
+        if is_speech:
+            self._heard_speech = True
+            self._speech_ms += VAD_FRAME_MS
+            self._silence_ms = 0
+            self._segment.extend(frame)
+        elif self._segment:
+            # Keep trailing silence inside the segment so words are not clipped.
+            self._silence_ms += VAD_FRAME_MS
+            self._segment.extend(frame)
+            if self._silence_ms >= VAD_SEGMENT_SILENCE_MS:
+                self._close_segment()
+        else:
+            self._silence_ms += VAD_FRAME_MS
+
+        if len(self._segment) >= VAD_MAX_SEGMENT_SECONDS * self.sample_rate * 2:
+            self._close_segment()
+
+    def _close_segment(self):
+        segment = bytes(self._segment)
+        speech_ms = self._speech_ms
+        self._segment.clear()
+        self._speech_ms = 0
+
+        if not segment or speech_ms < VAD_MIN_SPEECH_MS:
+            return
+
+        position = len(self._texts)
+        self._texts.append(None)
+        prompt = self._contiguous_text()
+        self._tasks.append(asyncio.create_task(self._transcribe_segment(position, segment, prompt)))
+
+    async def _transcribe_segment(self, position: int, segment: bytes, prompt: str):
+        try:
+            self._texts[position] = await self.transcribe(pcm_to_wav(segment, self.sample_rate), prompt)
+        except Exception as e:
+            print(f"Error transcribing segment {position}: {e}")
+            self._texts[position] = ""
+            return
+
+        # Partials only cover the contiguous run of finished segments, so the
+        # text the client sees never has holes or reorders.
+        if all(t is not None for t in self._texts[: position + 1]):
+            await self.on_partial(self._contiguous_text())
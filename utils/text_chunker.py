@@ -0,0 +1,203 @@
+import os
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from utils.token_counter import count_tokens, split_tokens, EMBEDDING_ENCODING
+
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "512"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "64"))
+HEADING_MAX_CHARS = 80
+# "\n\n" and " " between units each cost at most one token.
+SEPARATOR_TOKENS = 1
+
+MARKDOWN_HEADING = re.compile(r"^\s{0,3}#{1,6}\s+(.+?)\s*#*\s*$")
+NUMBERED_HEADING = re.compile(r"^(?:(?:section|chapter|part)\s+)?\d{1,2}(?:\.\d{1,2})*[.):]?\s+(.+)$", re.IGNORECASE)
+BULLET = re.compile(r"^\s*(?:[-•*▪]|\(?\d{1,2}[.)])\s+")
+SENTENCE_BREAK = re.compile(r"(?<=[.!?])[\"')\]]*\s+(?=[\"'(\[]?[A-Z0-9])")
+MINOR_WORDS = {"a", "an", "and", "as", "at", "by", "for", "from", "in", "of", "on", "or", "the", "to", "vs", "with"}
+
+
+def _looks_like_title(text: str) -> bool:
+    # Title Case or ALL CAPS, short, and not ending like a sentence, e.g.
+    # "Regional Performance" but not "Revenue rose 4% in Europe".
+    words = text.split()
+    if not 1 <= len(words) <= 10 or len(text) > HEADING_MAX_CHARS or text[-1] in ".,;:!?":
+        return False
+    significant = [w for w in words if w.lower() not in MINOR_WORDS and w[0].isalpha()]
+    return bool(significant) and all(w[0].isupper() for w in significant)
+
+
+def _looks_like_heading(line: str) -> bool:
+    # Lines that introduce a section even without a blank line around them,
+    # which is how PDF text usually arrives.
+    if len(line) > HEADING_MAX_CHARS or line.endswith((".", ",", ";")):
+        return False
+
+    numbered = NUMBERED_HEADING.match(line)
+    if numbered:
+        return _looks_like_title(numbered.group(1))
+    if line.endswith(":"):
+        return _looks_like_title(line[:-1])
+
+    letters = [c for c in line if c.isalpha()]
+    return len(letters) >= 4 and line.isupper() and len(line.split()) <= 10
+
+
+class StructuredChunker:
+    """Packs sentences into token-bounded chunks that never cross a heading.
+
+    Pages are consumed as a stream and only the current chunk is held, so
+    time is linear in the text and memory is bounded by max_tokens. Each
+    unit is tokenized once; chunk sizes are summed from the per-unit counts.
+    """
+
+    def __init__(self, max_tokens: int = CHUNK_MAX_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS):
+        self.max_tokens = max_tokens
+        self.overlap_tokens = min(overlap_tokens, max_tokens // 2)
+
+    def chunks(self, pages: Iterable[str]) -> Iterator[Dict]:
+        self._section: Optional[str] = None
+        # (text, tokens, starts_paragraph)
+        self._units: List[Tuple[str, int, bool]] = []
+        self._units_size = 0
+        self._headings: List[Tuple[str, int, bool]] = []
+        self._fresh_body = 0
+        self._index = 0
+        paragraph: List[str] = []
+
+        for page in pages:
+            for raw_line in page.splitlines():
+                line = raw_line.strip()
+
+                if not line:
+                    yield from self._paragraph(paragraph)
+                    paragraph = []
+                    continue
+
+                markdown_heading = MARKDOWN_HEADING.match(line)
+                if markdown_heading or _looks_like_heading(line):
+                    yield from self._paragraph(paragraph)
+                    paragraph = []
+                    yield from self._heading(markdown_heading.group(1) if markdown_heading else line)
+                    continue
+
+                if BULLET.match(line) and paragraph:
+                    yield from self._paragraph(paragraph)
+                    paragraph = []
+
+                paragraph.append(line)
+
+        yield from self._paragraph(paragraph)
+        yield from self._emit()
+
+    def _heading(self, text: str) -> Iterator[Dict]:
+        # Sections start a fresh chunk with no overlap from the previous one.
+        # Headings with no body yet (e.g. "Financials" right before
+        # "Revenue") are carried into the next section rather than lost.
+        yield from self._emit()
+        heading = text.strip()
+        self._section = heading.rstrip(":").strip() or None
+        self._headings.append((heading, count_tokens(heading, EMBEDDING_ENCODING), True))
+        while len(self._headings) > 1 and self._size(self._headings) > self.max_tokens:
+            self._headings.pop(0)
+        self._set_units(list(self._headings))
+
+    def _paragraph(self, lines: List[str]) -> Iterator[Dict]:
+        if not lines:
+            return
+
+        text = lines[0]
+        for line in lines[1:]:
+            # Rejoin words a PDF line break hyphenated ("finan-" + "cial").
+            if text.endswith("-") and line[:1].islower():
+                text = text[:-1] + line
+            else:
+                text = f"{text} {line}"
+
+        if len(lines) == 1 and _looks_like_title(text):
+            yield from self._heading(text)
+            return
+
+        starts_paragraph = True
+        for sentence in SENTENCE_BREAK.split(text):
+            if sentence:
+                yield from self._sentence(sentence, starts_paragraph)
+                starts_paragraph = False
+
+    def _sentence(self, sentence: str, starts_paragraph: bool) -> Iterator[Dict]:
+        tokens = count_tokens(sentence, EMBEDDING_ENCODING)
+        if tokens <= self.max_tokens:
+            yield from self._pack(sentence, tokens, starts_paragraph)
+            return
+
+        # A run-on "sentence" (tables, lists without punctuation) is cut on
+        # word boundaries instead.
+        for piece in split_tokens(sentence, self.max_tokens, EMBEDDING_ENCODING):
+            yield from self._pack(piece, count_tokens(piece, EMBEDDING_ENCODING), starts_paragraph)
+            starts_paragraph = False
+
+    def _pack(self, text: str, tokens: int, starts_paragraph: bool) -> Iterator[Dict]:
+        unit = (text, tokens, starts_paragraph)
+        if not self._fits([unit]):
+            if self._fresh_body:
+                yield from self._emit()
+                self._carry_overlap()
+            if not self._fits([unit]):
+                self._set_units([])
+
+        self._units_size += tokens + (SEPARATOR_TOKENS if self._units else 0)
+        self._units.append(unit)
+        self._fresh_body += 1
+
+    def _fits(self, extra: List[Tuple[str, int, bool]]) -> bool:
+        if not self._units:
+            return self._size(extra) <= self.max_tokens
+        return self._units_size + SEPARATOR_TOKENS + self._size(extra) <= self.max_tokens
+
+    def _set_units(self, units: List[Tuple[str, int, bool]]):
+        self._units = units
+        self._units_size = self._size(units)
+
+    @staticmethod
+    def _size(units: List[Tuple[str, int, bool]]) -> int:
+        # An upper bound on the joined text: merges across a separator only
+        # ever save tokens.
+        if not units:
+            return 0
+        return sum(unit[1] for unit in units) + SEPARATOR_TOKENS * (len(units) - 1)
+
+    def _carry_overlap(self):
+        carried = []
+        carried_tokens = 0
+        for unit in reversed(self._units):
+            if carried_tokens + unit[1] > self.overlap_tokens:
+                break
+            carried.append(unit)
+            carried_tokens += unit[1]
+
+        self._set_units(carried[::-1])
+
+    @staticmethod
+    def _join(units: List[Tuple[str, int, bool]]) -> str:
+        parts = []
+        for text, _, starts_paragraph in units:
+            if parts:
+                parts.append("\n\n" if starts_paragraph else " ")
+            parts.append(text)
+        return "".join(parts)
+
+    def _emit(self) -> Iterator[Dict]:
+        if not self._fresh_body:
+            return
+
+        text = self._join(self._units)
+        self._fresh_body = 0
+        self._headings = []
+
+        yield {
+            "text": text,
+            "index": self._index,
+            "token_count": count_tokens(text, EMBEDDING_ENCODING),
+            "section": self._section
+        }
+        self._index += 1
@@ -0,0 +1,68 @@
+from typing import Dict, List, Optional
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# text-embedding-3 models tokenize with cl100k_base, the gpt-4o family with
+# o200k_base.
+EMBEDDING_ENCODING = "cl100k_base"
+CHAT_ENCODING = "o200k_base"
+
+_encodings: Dict[str, Optional[object]] = {}
+
+
+def _get_encoding(name: str):
+    if name not in _encodings:
+        _encodings[name] = None
+        if tiktoken is not None:
+            try:
+                _encodings[name] = tiktoken.get_encoding(name)
+            except Exception as e:
+                print(f"tiktoken encoding {name} unavailable, estimating token counts: {e}")
+    return _encodings[name]
+
+
+def count_tokens(text: str, encoding: str = CHAT_ENCODING) -> int:
+    enc = _get_encoding(encoding)
+    if enc is not None:
+        return len(enc.encode(text))
+    return (len(text) + 3) // 4
+
+
+def split_tokens(text: str, max_tokens: int, encoding: str = CHAT_ENCODING) -> List[str]:
+    # Encode once and slice the ids, backing each cut up to the nearest
+    # word start so words and multi-byte characters are never split.
+    enc = _get_encoding(encoding)
+    pieces = []
+    if enc is None:
+        step = max_tokens * 4
+        start = 0
+        while start < len(text):
+            end = start + step
+            if end < len(text):
+                cut = text.rfind(" ", start + 1, end + 1)
+                if cut > start:
+                    end = cut
+            piece = text[start:end].strip()
+            if piece:
+                pieces.append(piece)
+            start = end
+        return pieces
+
+    ids = enc.encode(text)
+    start = 0
+    while start < len(ids):
+        end = min(start + max_tokens, len(ids))
+        if end < len(ids):
+            cut = end
+            while cut > start + 1 and not enc.decode_single_token_bytes(ids[cut])[:1].isspace():
+                cut -= 1
+            if cut > start + 1:
+                end = cut
+        piece = enc.decode(ids[start:end]).strip()
+        if piece:
+            pieces.append(piece)
+        start = end
+    return pieces
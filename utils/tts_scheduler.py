@@ -0,0 +1,112 @@
+import asyncio
+import struct
+import time
+from typing import AsyncIterator, Callable, Optional
+
+from fastapi import WebSocket
+
+SEQUENCE_HEADER = struct.Struct(">I")
+
+
+class _Segment:
+
+    def __init__(self, seq: int, text: str):
+        self.seq = seq
+        self.text = text
+        self.chunks: asyncio.Queue = asyncio.Queue()
+        self.task: Optional[asyncio.Task] = None
+
+
+class TTSScheduler:
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        synthesize: Callable[[str], AsyncIterator[bytes]],
+        max_parallel: int = 3,
+        max_pending: int = 6
+    ):
+        self.websocket = websocket
+        self.synthesize = synthesize
+        self._semaphore = asyncio.Semaphore(max(1, max_parallel))
+        self._segments: asyncio.Queue = asyncio.Queue(maxsize=max(1, max_pending))
+        self._next_seq = 0
+        self._sender: Optional[asyncio.Task] = None
+        self.first_audio_sent_at: Optional[float] = None
+
+    async def submit(self, text: str) -> int:
+        if self._sender is None:
+            self._sender = asyncio.create_task(self._send_in_order())
+
+        segment = _Segment(self._next_seq, text)
+        self._next_seq += 1
+
+        # Blocks once max_pending segments are waiting to be sent, which
+        # throttles the LLM stream when the client cannot keep up.
+        await self._segments.put(segment)
+        segment.task = asyncio.create_task(self._synthesize_segment(segment))
+
+        return segment.seq
+
+    async def finish(self):
+        if self._sender is None:
+            return
+
+        await self._segments.put(None)
+        sender, self._sender = self._sender, None
+        await sender
+
+        await self.websocket.send_json({"type": "audio_end"})
+
+    async def cancel(self):
+        tasks = []
+
+        if self._sender is not None:
+            tasks.append(self._sender)
+            self._sender = None
+
+        while not self._segments.empty():
+            segment = self._segments.get_nowait()
+            if segment is not None and segment.task is not None:
+                tasks.append(segment.task)
+
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _synthesize_segment(self, segment: _Segment):
+        try:
+            async with self._semaphore:
+                async for chunk in self.synthesize(segment.text):
+                    if chunk:
+                        segment.chunks.put_nowait(chunk)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Error synthesizing segment {segment.seq}: {e}")
+        finally:
+            segment.chunks.put_nowait(None)
+
+    async def _send_in_order(self):
+        while True:
+            segment = await self._segments.get()
+            if segment is None:
+                return
+
+            header = SEQUENCE_HEADER.pack(segment.seq)
+
+            try:
+                while True:
+                    chunk = await segment.chunks.get()
+                    if chunk is None:
+                        break
+                    await self.websocket.send_bytes(header + chunk)
+                    if self.first_audio_sent_at is None:
+                        self.first_audio_sent_at = time.perf_counter()
+            except asyncio.CancelledError:
+                if segment.task is not None:
+                    segment.task.cancel()
+                raise
+
+            await self.websocket.send_json({"type": "audio_segment_end", "seq": segment.seq})
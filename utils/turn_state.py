@@ -0,0 +1,37 @@
+import asyncio
+from typing import Coroutine, Optional, Set
+
+
+class TurnState:
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.transcript = ""
+        self.spoken_text = ""
+        self.count = 0
+        self.background_tasks: Set[asyncio.Task] = set()
+
+    @property
+    def active(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def start(self, transcript: str, turn: Coroutine) -> asyncio.Task:
+        self.transcript = transcript
+        self.spoken_text = ""
+        self.task = asyncio.create_task(turn)
+        return self.task
+
+    async def cancel(self) -> bool:
+        if not self.active:
+            return False
+
+        task = self.task
+        task.cancel()
+        # Wait for the turn to unwind so its LLM stream and TTS requests are
+        # closed before anything else is sent on the socket.
+        await asyncio.gather(task, return_exceptions=True)
+        return task.cancelled()
+
+    def track(self, task: asyncio.Task):
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
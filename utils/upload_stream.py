@@ -0,0 +1,206 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional
+
+import multipart
+from multipart.exceptions import FormParserError
+from multipart.multipart import parse_options_header
+from starlette.requests import Request
+
+from utils.file_processor import FileProcessor
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(200 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+UPLOAD_MAX_FIELD_BYTES = int(os.getenv("UPLOAD_MAX_FIELD_BYTES", str(64 * 1024)))
+
+# Room for the multipart boundaries and the small form fields around the file.
+MULTIPART_OVERHEAD_BYTES = 1024 * 1024
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class InvalidUpload(Exception):
+    pass
+
+
+class StreamedUpload:
+
+    def __init__(self, upload_dir: str, max_bytes: int):
+        self.upload_dir = Path(upload_dir)
+        self.max_bytes = max_bytes
+        self.fields: Dict[str, str] = {}
+        self.filename: Optional[str] = None
+        self.file_path: Optional[str] = None
+        self.size_bytes = 0
+        self.sha256: Optional[str] = None
+
+        self._hash = hashlib.sha256()
+        self._temp_path: Optional[str] = None
+        self._temp_file = None
+        self._buffer = bytearray()
+
+        self._part_name: Optional[str] = None
+        self._part_is_file = False
+        self._part_data = bytearray()
+        self._disposition = b""
+        self._header_name = b""
+        self._header_value = b""
+        self._file_done = False
+
+    def on_part_begin(self):
+        self._part_name = None
+        self._part_is_file = False
+        self._part_data = bytearray()
+        self._disposition = b""
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        if self._header_name.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._disposition)
+        if b"name" not in options:
+            raise InvalidUpload("Multipart part is missing a field name")
+        self._part_name = options[b"name"].decode("utf-8", "replace")
+
+        if b"filename" not in options:
+            return
+
+        if self.filename is not None:
+            raise InvalidUpload("Only one file can be uploaded at a time")
+
+        # Reject unsupported types from the part headers, before any of the
+        # file body has been read.
+        filename = Path(options[b"filename"].decode("utf-8", "replace")).name
+        extension = Path(filename).suffix.lower().lstrip(".")
+        if extension not in FileProcessor.supported_file_types():
+            raise InvalidUpload(f"Unsupported file type: .{extension}" if extension else "File has no extension")
+
+        self.filename = filename
+        self._part_is_file = True
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if self._part_is_file:
+            self.size_bytes += end - start
+            if self.size_bytes > self.max_bytes:
+                raise UploadTooLarge(f"File exceeds the {self.max_bytes} byte upload limit")
+            self._buffer += data[start:end]
+            return
+
+        self._part_data += data[start:end]
+        if len(self._part_data) > UPLOAD_MAX_FIELD_BYTES:
+            raise UploadTooLarge(f"Form field '{self._part_name}' is too large")
+
+    def on_part_end(self):
+        if self._part_is_file:
+            self._file_done = True
+        elif self._part_name is not None:
+            self.fields[self._part_name] = self._part_data.decode("utf-8", "replace")
+
+    def _open(self):
+        self.upload_dir.mkdir(parents=True, exist_ok=True)
+        descriptor, self._temp_path = tempfile.mkstemp(dir=self.upload_dir, prefix=".upload-", suffix=".part")
+        self._temp_file = os.fdopen(descriptor, "wb")
+
+    def _write(self, data: bytes):
+        if self._temp_file is None:
+            self._open()
+        self._hash.update(data)
+        self._temp_file.write(data)
+
+    def _commit(self) -> str:
+        if self._temp_file is None:
+            self._open()
+        self._temp_file.close()
+        self._temp_file = None
+
+        self.sha256 = self._hash.hexdigest()
+        # The name carries the content hash, so it is unique without probing
+        # the directory; an existing file with that name has the same bytes
+        # and is safe to replace.
+        final_path = self.upload_dir / FileProcessor.content_addressed_name(self.filename, self.sha256)
+        os.replace(self._temp_path, final_path)
+        self._temp_path = None
+        return str(final_path)
+
+    def _discard(self):
+        if self._temp_file is not None:
+            self._temp_file.close()
+            self._temp_file = None
+        if self._temp_path is not None:
+            try:
+                os.unlink(self._temp_path)
+            except FileNotFoundError:
+                pass
+            self._temp_path = None
+
+    async def _drain(self, minimum: int):
+        if len(self._buffer) < minimum or not self._buffer:
+            return
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        await asyncio.to_thread(self._write, data)
+
+    async def receive(self, request: Request):
+        content_type = request.headers.get("content-type", "")
+        _, params = parse_options_header(content_type)
+        if not content_type.startswith("multipart/form-data") or b"boundary" not in params:
+            raise InvalidUpload("Expected a multipart/form-data upload")
+
+        content_length = request.headers.get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_bytes + MULTIPART_OVERHEAD_BYTES:
+            raise UploadTooLarge(f"Upload exceeds the {self.max_bytes} byte limit")
+
+        parser = multipart.MultipartParser(params[b"boundary"], {
+            "on_part_begin": self.on_part_begin,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished
+        })
+
+        try:
+            async for chunk in request.stream():
+                parser.write(chunk)
+                # Disk writes and hashing run in a thread, a chunk at a time,
+                # so memory per upload stays around UPLOAD_CHUNK_BYTES.
+                await self._drain(UPLOAD_CHUNK_BYTES)
+            parser.finalize()
+            await self._drain(1)
+
+            if self.filename is None or not self._file_done:
+                raise InvalidUpload("No file was uploaded")
+
+            self.file_path = await asyncio.to_thread(self._commit)
+        except FormParserError as e:
+            await asyncio.to_thread(self._discard)
+            raise InvalidUpload(f"Malformed multipart upload: {e}")
+        except BaseException:
+            await asyncio.to_thread(self._discard)
+            raise
+
+        return self
+
+
+async def receive_upload(
+    request: Request,
+    upload_dir: str = UPLOAD_DIR,
+    max_bytes: int = UPLOAD_MAX_BYTES
+) -> StreamedUpload:
+    return await StreamedUpload(upload_dir, max_bytes).receive(request)
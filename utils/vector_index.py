@@ -0,0 +1,325 @@
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+VECTOR_INDEX_ENABLED = os.getenv("VECTOR_INDEX_ENABLED", "false").lower() == "true"
+VECTOR_INDEX_PATH = os.getenv("VECTOR_INDEX_PATH", "vector_index")
+VECTOR_INDEX_REFRESH_SECONDS = float(os.getenv("VECTOR_INDEX_REFRESH_SECONDS", "5"))
+VECTOR_INDEX_DIMENSIONS = 1536
+VECTOR_INDEX_ID_PAGE_SIZE = 5000
+VECTOR_INDEX_ROW_PAGE_SIZE = 500
+
+METADATA_FIELDS = ["id", "report_id", "company", "section", "abstract", "fast_facts", "quote"]
+
+
+class VectorIndex:
+
+    def __init__(self, index_dir: str = VECTOR_INDEX_PATH, dimensions: int = VECTOR_INDEX_DIMENSIONS):
+        self.index_dir = Path(index_dir)
+        self.dimensions = dimensions
+        self.enabled = False
+        self.ready = False
+        # Matrix and rows are swapped together as one tuple so searches can
+        # read them without taking the writer lock.
+        self._state = (None, [])
+        self._ids = set()
+        # Changes since the snapshot this process last loaded or wrote; they
+        # are replayed onto a newer snapshot written by another worker.
+        self._added = set()
+        self._removed = set()
+        self._version: Optional[str] = None
+        self._lock = threading.Lock()
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.index_dir / "manifest.json"
+
+    @property
+    def snapshots_dir(self) -> Path:
+        return self.index_dir / "snapshots"
+
+    def __len__(self) -> int:
+        return len(self._state[1])
+
+    def load(self, db_client):
+        if np is None:
+            raise ImportError("numpy is required for the local vector index. Install it with: pip install numpy")
+
+        self.enabled = True
+
+        with self._lock:
+            self._merge_snapshot()
+            if self._sync_with_database(db_client):
+                self._save_snapshot()
+            self.ready = True
+
+        print(f"Vector index ready with {len(self)} chunks")
+
+    def refresh(self):
+        # Cheap when nothing changed: one small manifest read.
+        if not self.ready or self._read_manifest() == self._version:
+            return
+
+        with self._lock:
+            self._merge_snapshot()
+
+    def search(self, query_embedding: List[float], top_k: int = 5, threshold: float = 0.7) -> List[Dict]:
+        matrix, rows = self._state
+
+        if matrix is None or not rows:
+            return []
+
+        query = self._normalize(np.asarray(query_embedding, dtype=np.float32).reshape(1, -1))[0]
+        scores = matrix @ query
+
+        k = min(top_k, len(rows))
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        candidates = candidates[np.argsort(-scores[candidates])]
+
+        return [
+            {**rows[i], "similarity": float(scores[i])}
+            for i in candidates
+            if scores[i] > threshold
+        ]
+
+    def add(self, rows: List[Dict]):
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._add(rows)
+
+    def remove_report(self, report_id: str):
+        if not self.enabled:
+            return
+
+        with self._lock:
+            _, rows = self._state
+            keep = [i for i, row in enumerate(rows) if row["report_id"] != report_id]
+            if len(keep) != len(rows):
+                self._removed.update(row["id"] for row in rows if row["report_id"] == report_id)
+                self._retain(keep)
+                self._save_snapshot()
+
+    def remove_chunks(self, chunk_ids: List[str]):
+        if not self.enabled or not chunk_ids:
+            return
+
+        doomed = set(chunk_ids)
+        with self._lock:
+            _, rows = self._state
+            keep = [i for i, row in enumerate(rows) if row["id"] not in doomed]
+            self._removed.update(doomed)
+            self._added.difference_update(doomed)
+            if len(keep) != len(rows):
+                self._retain(keep)
+
+    def save(self):
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._save_snapshot()
+
+    def _add(self, rows: List[Dict]) -> bool:
+        rows = [
+            row for row in rows
+            if row.get("id") and row.get("embedding") is not None and row["id"] not in self._ids
+        ]
+        if not rows:
+            return False
+
+        vectors = self._normalize(np.asarray(
+            [self._parse_embedding(row["embedding"]) for row in rows],
+            dtype=np.float32
+        ))
+
+        matrix, current_rows = self._state
+        matrix = vectors if matrix is None else np.vstack([matrix, vectors])
+        self._state = (matrix, current_rows + [self._metadata(row) for row in rows])
+        self._ids.update(row["id"] for row in rows)
+        self._added.update(row["id"] for row in rows)
+        self._removed.difference_update(row["id"] for row in rows)
+        return True
+
+    def _retain(self, positions: List[int]):
+        matrix, rows = self._state
+        rows = [rows[i] for i in positions]
+        matrix = np.ascontiguousarray(matrix[positions]) if positions else None
+        self._state = (matrix, rows)
+        self._ids = {row["id"] for row in rows}
+
+    def _read_manifest(self) -> Optional[str]:
+        try:
+            with open(self.manifest_path, "r") as f:
+                return json.load(f)["version"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _read_snapshot(self, version: str):
+        snapshot_dir = self.snapshots_dir / version
+        try:
+            with open(snapshot_dir / "metadata.json", "r") as f:
+                rows = json.load(f)
+            matrix = np.load(snapshot_dir / "embeddings.npy", mmap_mode="r")
+        except Exception as e:
+            print(f"Ignoring unreadable vector index snapshot {version}: {e}")
+            return None
+
+        if matrix.shape != (len(rows), self.dimensions):
+            print(f"Ignoring vector index snapshot {version} with mismatched shape")
+            return None
+
+        return matrix, rows
+
+    def _merge_snapshot(self):
+        # Take the current snapshot as the base and replay this process's
+        # own unsaved additions and removals on top of it.
+        version = self._read_manifest()
+        if version is None or version == self._version:
+            return
+
+        snapshot = self._read_snapshot(version)
+        if snapshot is None:
+            return
+
+        disk_matrix, disk_rows = snapshot
+        keep = [i for i, row in enumerate(disk_rows) if row["id"] not in self._removed]
+        disk_ids = {disk_rows[i]["id"] for i in keep}
+
+        matrix, rows = self._state
+        own = [i for i, row in enumerate(rows) if row["id"] in self._added and row["id"] not in disk_ids]
+
+        merged_rows = [disk_rows[i] for i in keep] + [rows[i] for i in own]
+        if not merged_rows:
+            merged_matrix = None
+        elif not own and len(keep) == len(disk_rows):
+            merged_matrix = disk_matrix
+        else:
+            parts = [np.asarray(disk_matrix[keep])]
+            if own:
+                parts.append(matrix[own])
+            merged_matrix = np.ascontiguousarray(np.vstack(parts))
+
+        self._state = (merged_matrix, merged_rows)
+        self._ids = {row["id"] for row in merged_rows}
+        self._added = {rows[i]["id"] for i in own}
+        self._version = version
+
+    def _sync_with_database(self, db_client) -> bool:
+        # Only ids are listed up front; embeddings are fetched just for rows
+        # the snapshot is missing, so a warm restart transfers very little.
+        live_ids = set()
+        start = 0
+        while True:
+            result = (
+                db_client.table("document_chunks")
+                .select("id")
+                .order("id")
+                .range(start, start + VECTOR_INDEX_ID_PAGE_SIZE - 1)
+                .execute()
+            )
+            page = result.data or []
+            live_ids.update(row["id"] for row in page)
+            if len(page) < VECTOR_INDEX_ID_PAGE_SIZE:
+                break
+            start += len(page)
+
+        changed = False
+
+        _, rows = self._state
+        keep = [i for i, row in enumerate(rows) if row["id"] in live_ids]
+        if len(keep) != len(rows):
+            self._retain(keep)
+            changed = True
+
+        missing = sorted(live_ids - self._ids)
+        for start in range(0, len(missing), VECTOR_INDEX_ROW_PAGE_SIZE):
+            result = (
+                db_client.table("document_chunks")
+                .select(",".join(METADATA_FIELDS + ["embedding"]))
+                .in_("id", missing[start : start + VECTOR_INDEX_ROW_PAGE_SIZE])
+                .execute()
+            )
+            changed = self._add(result.data or []) or changed
+
+        return changed
+
+    def _save_snapshot(self):
+        self.snapshots_dir.mkdir(parents=True, exist_ok=True)
+
+        with open(self.index_dir / "lock", "a") as lock_file:
+            # Workers serialise read-merge-write so none of them overwrites
+            # chunks another worker ingested since its last load.
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._merge_snapshot()
+
+                matrix, rows = self._state
+                if matrix is None:
+                    matrix = np.zeros((0, self.dimensions), dtype=np.float32)
+
+                # Each snapshot is written to its own directory and published
+                # by swapping the manifest, so readers never see a matrix and
+                # metadata from different writes.
+                version = f"{time.time_ns()}-{os.getpid()}"
+                snapshot_dir = self.snapshots_dir / version
+                snapshot_dir.mkdir()
+                np.save(snapshot_dir / "embeddings.npy", matrix)
+                with open(snapshot_dir / "metadata.json", "w") as f:
+                    json.dump(rows, f)
+
+                manifest_tmp = self.index_dir / f"manifest.{os.getpid()}.tmp"
+                with open(manifest_tmp, "w") as f:
+                    json.dump({"version": version, "count": len(rows)}, f)
+                previous = self._version
+                os.replace(manifest_tmp, self.manifest_path)
+
+                self._version = version
+                self._added = set()
+                self._removed = set()
+                self._prune_snapshots(keep={version, previous})
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _prune_snapshots(self, keep):
+        # The previous snapshot stays for workers that are still reading it.
+        for snapshot_dir in self.snapshots_dir.iterdir():
+            if snapshot_dir.name not in keep:
+                shutil.rmtree(snapshot_dir, ignore_errors=True)
+
+    @staticmethod
+    def _metadata(row: Dict) -> Dict:
+        return {field: row.get(field) for field in METADATA_FIELDS}
+
+    @staticmethod
+    def _parse_embedding(embedding) -> List[float]:
+        # pgvector columns come back from PostgREST as "[0.1,0.2,...]" strings.
+        if isinstance(embedding, str):
+            return json.loads(embedding)
+        return embedding
+
+    @staticmethod
+    def _normalize(vectors):
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+vector_index = VectorIndex()